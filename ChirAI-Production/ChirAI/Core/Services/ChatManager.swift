@@ -8,6 +8,8 @@ class ChatManager: ObservableObject {
     @Published var isLoading: Bool = false
     
     private let ollamaService = OllamaService()
+    // What is sent to Ollama: bounded by a token budget, unlike `messages`, which is only displayed
+    private var history = HistoryCompactor(systemPrompt: "あなたはChirAIの親切な日本語アシスタントです。簡潔に答えてください。")
     
     init() {
         addWelcomeMessage()
@@ -38,8 +40,11 @@ class ChatManager: ObservableObject {
         inputText = ""
         isLoading = true
         
+        history.add(role: "user", content: userInput)
+        
         do {
-            let aiResponse = try await ollamaService.sendMessage(userInput)
+            let aiResponse = try await ollamaService.sendChat(history.messages())
+            history.add(role: "assistant", content: aiResponse)
             let aiMessage = ChatMessage(
                 id: UUID(),
                 content: aiResponse,
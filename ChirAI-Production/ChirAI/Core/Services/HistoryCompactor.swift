@@ -0,0 +1,98 @@
+import Foundation
+
+/// Bounded chat history: pinned system prompt, running summary, recent-turn window.
+/// Same rules and token estimate as history_compaction.py, so compaction_benchmark.py
+/// results carry over to the app.
+struct HistoryCompactor {
+    static let summaryHeader = "これまでの会話の要約:"
+    static let sentenceEnds: Set<Character> = ["。", "．", "！", "？", "!", "?"]
+    static let roleLabels = ["user": "ユーザー", "assistant": "AI"]
+    
+    let systemPrompt: String
+    let budget: Int
+    let reserve: Int
+    let summaryBudget: Int
+    
+    private let systemTokens: Int
+    private var window: [(role: String, content: String, tokens: Int)] = []
+    private var windowTokens = 0
+    private var summary: [(line: String, tokens: Int)] = []
+    private var summaryTokens = 0
+    
+    init(systemPrompt: String, budget: Int = 2048, reserve: Int = 512, summaryBudget: Int = 256) {
+        self.systemPrompt = systemPrompt
+        self.budget = budget
+        self.reserve = reserve
+        self.summaryBudget = summaryBudget
+        self.systemTokens = HistoryCompactor.approxTokens(systemPrompt)
+    }
+    
+    /// One token per CJK character, one per four other characters
+    static func approxTokens(_ text: String) -> Int {
+        var cjk = 0
+        var other = 0
+        for scalar in text.unicodeScalars {
+            if scalar.value >= 0x3000 { cjk += 1 } else { other += 1 }
+        }
+        return cjk + (other + 3) / 4
+    }
+    
+    /// The summary's full allowance is set aside, so summarizing never exceeds the budget
+    private var windowBudget: Int {
+        budget - reserve - systemTokens - summaryBudget
+    }
+    
+    mutating func add(role: String, content: String) {
+        let tokens = HistoryCompactor.approxTokens(content)
+        window.append((role: role, content: content, tokens: tokens))
+        windowTokens += tokens
+        if windowTokens > windowBudget {
+            compact()
+        }
+    }
+    
+    /// Move the oldest messages into the summary until the window fits; the newest always stays
+    private mutating func compact() {
+        var evicted: [(role: String, content: String)] = []
+        while window.count > 1 && (windowTokens > windowBudget || window[0].role == "assistant") {
+            let oldest = window.removeFirst()
+            windowTokens -= oldest.tokens
+            evicted.append((role: oldest.role, content: oldest.content))
+        }
+        
+        for message in evicted {
+            guard let line = HistoryCompactor.summaryLine(role: message.role, content: message.content) else { continue }
+            let tokens = HistoryCompactor.approxTokens(line)
+            summary.append((line: line, tokens: tokens))
+            summaryTokens += tokens
+        }
+        while !summary.isEmpty && summaryTokens > summaryBudget {
+            summaryTokens -= summary.removeFirst().tokens
+        }
+    }
+    
+    /// First sentence of a message, cut to 48 tokens
+    static func summaryLine(role: String, content: String) -> String? {
+        let text = content.split(whereSeparator: { $0.isWhitespace }).joined(separator: " ")
+        var first = text
+        if let end = text.firstIndex(where: { sentenceEnds.contains($0) }) {
+            first = String(text[...end])
+        }
+        while !first.isEmpty && approxTokens(first) > 48 {
+            first = String(first.prefix(Int(Double(first.count) * 0.8)))
+        }
+        guard !first.isEmpty else { return nil }
+        return "\(roleLabels[role] ?? role): \(first)"
+    }
+    
+    /// The message list to send: system prompt, summary, recent window
+    func messages() -> [[String: String]] {
+        var messages = [["role": "system", "content": systemPrompt]]
+        if !summary.isEmpty {
+            let lines = summary.map { $0.line }.joined(separator: "\n")
+            messages.append(["role": "system", "content": "\(HistoryCompactor.summaryHeader)\n\(lines)"])
+        }
+        messages += window.map { ["role": $0.role, "content": $0.content] }
+        return messages
+    }
+}
@@ -2,6 +2,40 @@ import Foundation
 
 class OllamaService {
     private let baseURL = "http://localhost:11434"
+    private let model = "qwen2.5:3b"
+    
+    /// Send a (compacted) message history through /api/chat
+    func sendChat(_ messages: [[String: String]]) async throws -> String {
+        guard let url = URL(string: "\(baseURL)/api/chat") else {
+            throw OllamaError.invalidURL
+        }
+        
+        let requestBody: [String: Any] = [
+            "model": model,
+            "messages": messages,
+            "stream": false
+        ]
+        
+        var request = URLRequest(url: url)
+        request.httpMethod = "POST"
+        request.setValue("application/json", forHTTPHeaderField: "Content-Type")
+        request.httpBody = try JSONSerialization.data(withJSONObject: requestBody)
+        
+        let (data, response) = try await URLSession.shared.data(for: request)
+        
+        guard let httpResponse = response as? HTTPURLResponse,
+              httpResponse.statusCode == 200 else {
+            throw OllamaError.serverError
+        }
+        
+        guard let json = try JSONSerialization.jsonObject(with: data) as? [String: Any],
+              let message = json["message"] as? [String: Any],
+              let content = message["content"] as? String else {
+            throw OllamaError.invalidResponse
+        }
+        
+        return content
+    }
     
     func sendMessage(_ message: String) async throws -> String {
         guard let url = URL(string: "\(baseURL)/api/generate") else {
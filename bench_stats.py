@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI Benchmark Statistics
+ベンチマーク用の統計ヘルパー（パーセンタイル等）
+"""
+
+import math
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile (same definition as numpy's default)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return float(ordered[0])
+
+    rank = (len(ordered) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    fraction = rank - lower
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * fraction
+
+
+def summarize(values, percentiles=(50, 90, 99)):
+    """Count, mean, min/max and the requested percentiles of a sample"""
+    if not values:
+        summary = {'count': 0, 'mean': 0.0, 'min': 0.0, 'max': 0.0}
+    else:
+        summary = {
+            'count': len(values),
+            'mean': sum(values) / len(values),
+            'min': min(values),
+            'max': max(values)
+        }
+    for pct in percentiles:
+        summary[f'p{pct:g}'.replace('.', '_')] = percentile(values, pct)
+    return summary
+
+
+def summarize_counters(records):
+    """Split server eval counters into cold-load, prefill and decode figures.
+
+    Throughput is token-weighted (total tokens / total time) rather than a
+    mean of per-request rates, so short responses do not dominate.
+    """
+    records = [r for r in records if r and r.get('total_duration')]
+    if not records:
+        return None
+
+    loads = [r['load_duration'] for r in records]
+    prompt_tokens = sum(r['prompt_eval_count'] for r in records)
+    prompt_time = sum(r['prompt_eval_duration'] for r in records)
+    eval_tokens = sum(r['eval_count'] for r in records)
+    eval_time = sum(r['eval_duration'] for r in records)
+    return {
+        'requests': len(records),
+        'cold_load_time': max(loads),
+        'avg_warm_load_time': (sum(loads) - max(loads)) / (len(loads) - 1) if len(loads) > 1 else 0.0,
+        'prefill_tokens_per_sec': prompt_tokens / prompt_time if prompt_time > 0 else None,
+        'decode_tokens_per_sec': eval_tokens / eval_time if eval_time > 0 else None,
+        'avg_prompt_eval_duration': prompt_time / len(records),
+        'avg_eval_duration': eval_time / len(records)
+    }
+
+
+
+def throughput_summary(records):
+    """Latency distribution and throughput of one endpoint's requests.
+
+    Records carry response_time and, from the async runner, started_at
+    (seconds since the sweep began). Throughput is over the endpoint's busy
+    window when start times are known, otherwise over summed request time.
+    """
+    latencies = [r['response_time'] for r in records if r.get('response_time') is not None]
+    succeeded = [r for r in records if r.get('success')]
+    starts = [r['started_at'] for r in records if r.get('started_at') is not None]
+    if len(starts) == len(records) and records:
+        window = max(r['started_at'] + r['response_time'] for r in records) - min(starts)
+    else:
+        window = sum(latencies)
+    tokens = sum(r.get('completion_tokens') or r.get('eval_count') or 0 for r in succeeded)
+    return {
+        'requests': len(records),
+        'succeeded': len(succeeded),
+        'latency': summarize(latencies),
+        'window': window,
+        'requests_per_sec': len(succeeded) / window if window > 0 else None,
+        'tokens_per_sec': tokens / window if window > 0 and tokens else None
+    }
+
+def linear_fit(xs, ys):
+    """Least-squares line through the points: slope, intercept and r²"""
+    n = len(xs)
+    if n < 2:
+        return {'slope': 0.0, 'intercept': ys[0] if ys else 0.0, 'r2': None}
+    mean_x = sum(xs) / n
+    mean_y = sum(ys) / n
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    sxy = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    syy = sum((y - mean_y) ** 2 for y in ys)
+    slope = sxy / sxx if sxx else 0.0
+    return {
+        'slope': slope,
+        'intercept': mean_y - slope * mean_x,
+        'r2': sxy * sxy / (sxx * syy) if sxx and syy else None
+    }
+
+
+def _beta_continued_fraction(a, b, x):
+    """Continued fraction for the regularized incomplete beta (Numerical Recipes betacf)"""
+    tiny = 1e-300
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c = 1.0
+    d = 1.0 - qab * x / qap
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 201):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + aa / c
+        c = c if abs(c) > tiny else tiny
+        h *= d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        c = 1.0 + aa / c
+        c = c if abs(c) > tiny else tiny
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < 3e-14:
+            break
+    return h
+
+
+def regularized_beta(a, b, x):
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    log_front = (math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+                 + a * math.log(x) + b * math.log(1.0 - x))
+    if x < (a + 1.0) / (a + b + 2.0):
+        return math.exp(log_front) * _beta_continued_fraction(a, b, x) / a
+    return 1.0 - math.exp(log_front) * _beta_continued_fraction(b, a, 1.0 - x) / b
+
+
+def student_t_sf(t, df):
+    """P(T > t) for Student's t with df degrees of freedom"""
+    tail = 0.5 * regularized_beta(df / 2.0, 0.5, df / (df + t * t))
+    return tail if t > 0 else 1.0 - tail
+
+
+def _mean_var(values):
+    mean = sum(values) / len(values)
+    var = sum((v - mean) ** 2 for v in values) / (len(values) - 1) if len(values) > 1 else 0.0
+    return mean, var
+
+
+def shift_test(current, baseline):
+    """One-sided test that `current` is larger than `baseline`.
+
+    With several current samples this is Welch's t-test. A single current
+    sample is checked against the baseline's prediction interval instead.
+    Returns (t statistic, p-value); (None, None) if there is too little data.
+    """
+    if not current or len(baseline) < 2 or (len(current) < 2 and len(baseline) < 3):
+        return None, None
+
+    mean_c, var_c = _mean_var(current)
+    mean_b, var_b = _mean_var(baseline)
+    n_c, n_b = len(current), len(baseline)
+
+    if n_c == 1:
+        scale = math.sqrt(var_b * (1.0 + 1.0 / n_b))
+        df = n_b - 1
+    else:
+        scale = math.sqrt(var_c / n_c + var_b / n_b)
+        if scale > 0:
+            df = (var_c / n_c + var_b / n_b) ** 2 / (
+                (var_c / n_c) ** 2 / (n_c - 1) + (var_b / n_b) ** 2 / (n_b - 1)
+            )
+
+    if scale == 0:
+        if mean_c > mean_b:
+            return math.inf, 0.0
+        return 0.0, 1.0
+
+    t = (mean_c - mean_b) / scale
+    return t, student_t_sf(t, df)
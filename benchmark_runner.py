@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI Async Benchmark Runner
+モデル・サーバー単位の並列数制限付きでベンチマークを並行実行
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+class AsyncBenchmarkRunner:
+    """Run LLMTester prompts concurrently while keeping result order"""
+
+    def __init__(self, tester, model_concurrency=2, server_concurrency=4):
+        self.tester = tester
+        self.model_concurrency = model_concurrency
+        self.server_concurrency = server_concurrency
+        self._model_limits = {}
+        self._server_limits = {}
+        self._executor = None
+
+    def _model_limit(self, model_name, server):
+        # Parallel slots for a model are a property of each server
+        key = (model_name, server)
+        if key not in self._model_limits:
+            self._model_limits[key] = asyncio.Semaphore(self.model_concurrency)
+        return self._model_limits[key]
+
+    def _server_slots(self, server):
+        # A balanced pool endpoint gets the per-server limit for each of its hosts
+        hosts = len(getattr(self.tester.clients.get(server), 'backends', ())) or 1
+        return self.server_concurrency * hosts
+
+    def _server_limit(self, server):
+        if server not in self._server_limits:
+            self._server_limits[server] = asyncio.Semaphore(self._server_slots(server))
+        return self._server_limits[server]
+
+    async def _run_test(self, model_name, index, test, sweep_start, repetition=0, endpoint=None):
+        loop = asyncio.get_running_loop()
+        queued_at = time.perf_counter()
+
+        server = endpoint or self.tester.client.base_url
+
+        # Take the model slot first so a waiting model never holds a server slot
+        async with self._model_limit(model_name, server):
+            async with self._server_limit(server):
+                started_at = time.perf_counter()
+                try:
+                    result = await loop.run_in_executor(
+                        self._executor, self.tester.run_single_test, model_name, test, endpoint
+                    )
+                except Exception as e:
+                    result = {
+                        "category": test['category'],
+                        "question": test['question'],
+                        "response": None,
+                        "error": str(e),
+                        "response_time": time.perf_counter() - started_at
+                    }
+
+        result["queue_time"] = started_at - queued_at
+        result["started_at"] = started_at - sweep_start
+
+        status = "✅" if result.get('response') else "❌"
+        label = f"#{index + 1}" + (f"/{repetition + 1}" if self.tester.repetitions > 1 else "")
+        if len(self.tester.endpoints) > 1:
+            label += f" @ {endpoint}"
+        print(f"{status} {model_name} {label} {test['category']} "
+              f"({result['response_time']:.2f}s, queued {result['queue_time']:.2f}s)")
+
+        # The full record goes to disk now; only timings stay in memory for the sweep summary
+        self.tester.record_result(model_name, index, result, repetition, endpoint)
+        return {key: result[key] for key in ('response_time', 'queue_time', 'started_at')}
+
+    async def run_model(self, model_name, test_cases, sweep_start=None):
+        """Run every pending (prompt, repetition) cell for one model; timings keep cell order"""
+        sweep_start = sweep_start or time.perf_counter()
+        model_results = {
+            "model": model_name,
+            "timestamp": datetime.now().isoformat(),
+            "tests": []
+        }
+        cells = self.tester.pending_cells(model_name, test_cases)
+        if cells and self.tester.minimize_swaps:
+            loop = asyncio.get_running_loop()
+            model_results["preload_time"] = await loop.run_in_executor(
+                self._executor, self.tester.prepare_model, model_name
+            )
+
+        model_results["tests"] = list(await asyncio.gather(*[
+            self._run_test(model_name, i, test, sweep_start, repetition, endpoint)
+            for i, repetition, endpoint, test in cells
+        ]))
+        return model_results
+
+    async def run_sweep(self, models, test_cases):
+        """Run all models concurrently and append results in model order"""
+        endpoints = len(self.tester.endpoints)
+        print(f"\n🚀 Async sweep: {len(models)} models × {len(test_cases)} prompts × {endpoints} endpoints "
+              f"(per model {self.model_concurrency}, per server {self.server_concurrency})")
+        print("=" * 60)
+
+        # One thread per server slot, so every slot a semaphore hands out has a thread to run on
+        slots = sum(self._server_slots(endpoint) for endpoint in self.tester.endpoints)
+        self._executor = ThreadPoolExecutor(max_workers=slots)
+        sweep_start = time.perf_counter()
+        try:
+            if self.tester.minimize_swaps:
+                # One model at a time so a host never has to swap between them mid-sweep
+                all_results = [await self.run_model(model, test_cases, sweep_start) for model in models]
+            else:
+                all_results = await asyncio.gather(*[
+                    self.run_model(model, test_cases, sweep_start) for model in models
+                ])
+        finally:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+        wall_time = time.perf_counter() - sweep_start
+        request_time = sum(t.get('response_time', 0) for r in all_results for t in r['tests'])
+
+        for model_results in all_results:
+            model_results["sweep_wall_time"] = wall_time
+            self.tester.results.append({key: value for key, value in model_results.items() if key != "tests"})
+
+        speedup = request_time / wall_time if wall_time > 0 else 0
+        print(f"\n⏱️  Sweep wall time: {wall_time:.2f}s "
+              f"(sum of request times {request_time:.2f}s, {speedup:.1f}x)")
+        return all_results
+
+    def run(self, models, test_cases):
+        return asyncio.run(self.run_sweep(models, test_cases))
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI Compaction Benchmark
+会話が数百ターンに伸びても、履歴圧縮で送信トークン・構築時間・メモリ・応答時間が一定に保たれるかを測定
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from datetime import datetime
+
+from bench_stats import linear_fit
+from history_compaction import HistoryCompactor, approx_tokens, extractive_summary, llm_summarizer
+from multi_turn_benchmark import CONVERSATIONS
+from ollama_client import get_client
+from results_store import record_run, results_path, run_source
+
+SUMMARY_FILE = 'compaction_benchmark.json'
+SYSTEM_PROMPT = 'あなたはChirAIの親切な日本語アシスタントです。簡潔に答えてください。'
+CHECKPOINTS = (10, 25, 50, 100, 200, 300, 500)
+# Stand-in reply for offline runs, about as long as a typical chat answer
+OFFLINE_REPLY = 'ご質問ありがとうございます。' + 'おすすめは季節や予算によって変わりますが、' * 6 + '以上です。'
+
+STRATEGIES = ('full', 'compacted')
+
+
+class FullHistory:
+    """What the ChatManager template does today: keep and send everything"""
+
+    def __init__(self, system_prompt=None, count_tokens=approx_tokens):
+        self.count_tokens = count_tokens
+        self.history = [{'role': 'system', 'content': system_prompt}] if system_prompt else []
+
+    def add(self, role, content):
+        self.history.append({'role': role, 'content': content})
+
+    def messages(self):
+        return list(self.history)
+
+    def tokens(self):
+        return sum(self.count_tokens(m['content']) for m in self.history)
+
+
+def retained_bytes(obj, seen=None):
+    """Memory held by an object graph (containers, strings and instance attributes)"""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen or callable(obj):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(retained_bytes(k, seen) + retained_bytes(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, deque)):
+        size += sum(retained_bytes(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__'):
+        size += retained_bytes(vars(obj), seen)
+    return size
+
+
+def user_turns(count):
+    """Scripted user messages, cycling through every conversation"""
+    script = [turn for turns in CONVERSATIONS.values() for turn in turns]
+    return [f"{script[i % len(script)]}（{i + 1}回目）" for i in range(count)]
+
+
+class CompactionBenchmark:
+    def __init__(self, budget=2048, reserve=512, summary_budget=256, summarizer='extractive',
+                 model='gemma3:1b', base_url=None, max_tokens=64, timeout=120.0):
+        self.budget = budget
+        self.reserve = reserve
+        self.summary_budget = summary_budget
+        self.model = model
+        self.client = get_client(base_url)
+        self.options = {'temperature': 0.7, 'num_predict': max_tokens}
+        self.timeout = timeout
+        self.summarizer = llm_summarizer(self.client, model) if summarizer == 'llm' else extractive_summary
+
+    def history(self, strategy):
+        if strategy == 'full':
+            return FullHistory(SYSTEM_PROMPT)
+        return HistoryCompactor(SYSTEM_PROMPT, self.budget, self.reserve, self.summary_budget, self.summarizer)
+
+    def run(self, strategy, turns, live=False):
+        """Per-turn cost of keeping the history and building the request, optionally sending it"""
+        history = self.history(strategy)
+        rows = []
+        for turn, message in enumerate(user_turns(turns), 1):
+            started = time.perf_counter()
+            history.add('user', message)
+            messages = history.messages()
+            build_time = time.perf_counter() - started
+
+            row = {'strategy': strategy, 'turn': turn, 'build_time': build_time,
+                   'messages': len(messages), 'tokens_sent': history.tokens(),
+                   'memory_bytes': retained_bytes(history)}
+            if live:
+                sent_at = time.perf_counter()
+                result = self.client.native_chat(self.model, messages, timeout=self.timeout, options=self.options)
+                row['latency'] = time.perf_counter() - sent_at
+                row['success'] = result['success']
+                row['prompt_eval_count'] = (result['counters'] or {}).get('prompt_eval_count')
+                reply = result.get('content') or ''
+                if not result['success']:
+                    print(f"  ❌ turn {turn}: {result['error']}")
+                    rows.append(row)
+                    break
+            else:
+                reply = OFFLINE_REPLY
+            history.add('assistant', reply)
+            rows.append(row)
+
+            if turn in CHECKPOINTS or turn == turns:
+                latency = f", {row['latency']:.2f}s" if live else ""
+                print(f"  turn {turn:4d}: {row['tokens_sent']:6d} tokens, {len(messages):4d} messages, "
+                      f"build {build_time * 1e6:7.1f}µs, memory {row['memory_bytes'] / 1024:8.1f}KB{latency}")
+        return rows
+
+    @staticmethod
+    def growth(rows, key):
+        """Per-turn slope over the second half, where a bounded history must be flat"""
+        tail = [r for r in rows[len(rows) // 2:] if r.get(key) is not None]
+        return linear_fit([r['turn'] for r in tail], [r[key] for r in tail])['slope'] if len(tail) > 1 else None
+
+    def summarize(self, rows):
+        last = rows[-1]
+        return {
+            'turns': last['turn'],
+            'last_tokens_sent': last['tokens_sent'],
+            'max_tokens_sent': max(r['tokens_sent'] for r in rows),
+            'last_memory_kb': last['memory_bytes'] / 1024,
+            'tokens_per_turn': self.growth(rows, 'tokens_sent'),
+            'build_us_per_turn': (self.growth(rows, 'build_time') or 0.0) * 1e6,
+            'memory_kb_per_turn': (self.growth(rows, 'memory_bytes') or 0.0) / 1024,
+            'latency_ms_per_turn': (self.growth(rows, 'latency') or 0.0) * 1000 if 'latency' in last else None,
+            'last_latency': last.get('latency')
+        }
+
+    def report(self, summaries):
+        print("\n" + "=" * 60)
+        print("📊 履歴の増加率 (後半ターンの1ターンあたり)")
+        print("=" * 60)
+        for strategy, summary in summaries.items():
+            latency = (f", latency {summary['latency_ms_per_turn']:+.2f}ms/turn"
+                       if summary['latency_ms_per_turn'] is not None else "")
+            print(f"  {strategy:<10} tokens {summary['tokens_per_turn']:+.1f}/turn "
+                  f"(max {summary['max_tokens_sent']}), build {summary['build_us_per_turn']:+.3f}µs/turn, "
+                  f"memory {summary['memory_kb_per_turn']:+.2f}KB/turn{latency}")
+        compacted = summaries.get('compacted')
+        if compacted:
+            bounded = compacted['max_tokens_sent'] <= self.budget - self.reserve
+            print(f"\n{'✅' if bounded else '❌'} Compacted history stays within "
+                  f"{self.budget - self.reserve} tokens (max {compacted['max_tokens_sent']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show history compaction keeping long chats flat")
+    parser.add_argument('--turns', type=int, default=300, help='user turns per conversation')
+    parser.add_argument('--strategy', action='append', dest='strategies', choices=STRATEGIES,
+                        help='history strategy, repeatable (default: both)')
+    parser.add_argument('--budget', type=int, default=2048, help='token budget per request')
+    parser.add_argument('--reserve', type=int, default=512, help='tokens kept free for the reply')
+    parser.add_argument('--summary-budget', type=int, default=256)
+    parser.add_argument('--summarizer', choices=['extractive', 'llm'], default='extractive')
+    parser.add_argument('--live', action='store_true', help='send every turn to Ollama and time it')
+    parser.add_argument('--model', default='gemma3:1b')
+    parser.add_argument('--base-url', help='Ollama server (default: OLLAMA_HOST or localhost:11434)')
+    parser.add_argument('--max-tokens', type=int, default=64, help='reply length in live mode')
+    args = parser.parse_args()
+
+    started_at = datetime.now()
+    benchmark = CompactionBenchmark(args.budget, args.reserve, args.summary_budget, args.summarizer,
+                                    args.model, args.base_url, args.max_tokens)
+    summaries, all_rows = {}, {}
+    for strategy in args.strategies or STRATEGIES:
+        print(f"\n📝 {strategy} history, {args.turns} turns{' (live)' if args.live else ''}")
+        rows = benchmark.run(strategy, args.turns, args.live)
+        all_rows[strategy] = rows
+        summaries[strategy] = benchmark.summarize(rows)
+    benchmark.report(summaries)
+
+    with open(results_path(SUMMARY_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'budget': args.budget, 'reserve': args.reserve, 'summary_budget': args.summary_budget,
+                   'live': args.live, 'summaries': summaries, 'turns': all_rows}, f, ensure_ascii=False, indent=2)
+    records = [(args.model if args.live else '', strategy, {key: value for key, value in summary.items()
+                                                            if isinstance(value, (int, float))})
+               for strategy, summary in summaries.items()]
+    # Without --live nothing is sent to a server: the rows are simulated token counts
+    source = run_source(benchmark.client) if args.live else 'offline'
+    run_id = record_run('compaction', records, started_at, {'live': args.live, 'budget': args.budget}, source=source)
+    print(f"\n💾 Results saved to: {SUMMARY_FILE}")
+    print(f"💾 Run {run_id} appended to: benchmark_history.sqlite")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,75 +11,281 @@ import numpy as np
 from concurrent.futures import ThreadPoolExecutor
 import sys
 
+from bench_stats import summarize_counters
+from load_generator import SATURATION_MAX_RATE, SATURATION_START_RATE, LoadGenerator, print_load_summary, saturation_rates
+from model_catalog import MEASUREMENTS_FILE, get_model_index, record_performance
+from model_residency import LOAD_THRESHOLD, ModelLoadLedger, count_switches, residency_order, resident_models
+from ollama_client import get_client
+from ollama_pool import POLICIES, get_pool
+from response_cache import ResponseCache
+from result_stream import ResultStream, read_results
+from results_store import numeric_metrics, record_run, results_path, run_source
+from suite_harness import TIMEOUT, SuiteDeadline, execute_test
+from suite_scheduler import SuiteScheduler
+from server_process import ProcessSampler, describe, find_server_pid
+from token_accounting import get_token_counter
+
 plt.switch_backend('Agg')
 
+CATEGORY_HEADERS = {
+    'infrastructure': "🏗️  INFRASTRUCTURE TESTS",
+    'functionality': "⚙️  FUNCTIONALITY TESTS",
+    'performance': "⚡ PERFORMANCE TESTS",
+    'security': "🛡️  SECURITY TESTS",
+    'usability': "👤 USABILITY TESTS",
+    'reliability': "🔄 RELIABILITY TESTS",
+    'compatibility': "📱 COMPATIBILITY TESTS"
+}
+
+# One JSON line per finished test, flushed immediately
+STREAM_FILE = 'test_results_comprehensive.jsonl'
+
+# Models the functional tests talk to; warmed up before anything is timed
+MODELS_UNDER_TEST = ['gemma3:1b', 'qwen2.5:3b']
+
+# Long Input Handling prompt size, in gemma3 tokens
+LONG_INPUT_TOKENS = 2048
+
 class ComprehensiveTestSuite:
-    def __init__(self):
-        self.results = {
-            'infrastructure': [],
-            'functionality': [],
-            'performance': [],
-            'security': [],
-            'usability': [],
-            'reliability': [],
-            'compatibility': []
-        }
+    def __init__(self, backend='openai', test_timeout=30, suite_timeout=None, warmup=True, keep_alive='30m',
+                 cache=None, pool=None, routing='least-outstanding', minimize_swaps=False, server_pid=None,
+                 sample_interval=0.25):
+        self.results = self.empty_results()
+        # Each finished test is appended here; reports are rebuilt from this file
+        self.stream_path = results_path(STREAM_FILE)
+        self.stream = None
         self.start_time = datetime.now()
         self.test_count = 0
         self.passed_count = 0
+        self.timeout_count = 0
+        # Per-test limit and a wall-clock budget for the whole run (None = unbounded)
+        self.test_timeout = test_timeout
+        self.deadline = SuiteDeadline(suite_timeout)
+        # Several hosts: every test goes through a load-balanced pool
+        self.pool = pool
+        self.routing = routing
+        self.client = get_pool(pool, policy=routing) if pool else get_client()
+        # Installed models (tags + show + catalog), fetched once per TTL
+        self.models = get_model_index(self.client)
+        if cache is not None:
+            # Opt-in response cache (record/replay) for iterating on reports and charts
+            self.client.cache = cache
+        # 'native' routes chat tests through /api/chat to capture server eval counters
+        self.backend = backend
+        self.server_counters = {}
+        # Model load cost, measured once per model and kept out of latency stats
+        self.warmup_enabled = warmup
+        self.keep_alive = keep_alive
+        self.warmup = {}
+        # run_test may be called from scheduler worker threads
+        self.lock = threading.Lock()
+        self.parallel = False
+        # Model loads seen during tests (after warm-up every load is a swap)
+        self.minimize_swaps = minimize_swaps
+        self.loads = ModelLoadLedger()
+        self._local = threading.local()
+        self.tokens = get_token_counter()
+        # The Ollama server's process tree is sampled during every test (a pool has no single server)
+        self.server_pid = find_server_pid(self.client.base_url, server_pid) if server_pid or not pool else None
+        self.sample_interval = sample_interval
         
-    def run_test(self, category, name, test_func, timeout=30):
-        """Run a single test with timeout and error handling"""
-        self.test_count += 1
-        print(f"\n🧪 [{self.test_count:2d}] {name}")
+    def run_test(self, category, name, test_func, timeout=None, models=()):
+        """Run a single test with timeout and error handling; models are the ones it uses"""
+        with self.lock:
+            self.test_count += 1
+            number = self.test_count
+        if not self.parallel:
+            print(f"\n🧪 [{number:2d}] {name}")
         
-        start_time = time.time()
-        success = False
-        message = ""
-        details = {}
+        tracking = bool(models) and not self.replaying()
+        before = resident_models(self.client, timeout=2) if tracking else None
+        native_loads = []
+        # With parallel workers the server is shared, so samples cover every concurrent test
+        sampler = (ProcessSampler(self.server_pid, self.sample_interval).start()
+                   if self.server_pid and not self.replaying() else None)
         
-        try:
-            # Run test with timeout
-            result = test_func()
-            success = result.get('success', False)
-            message = result.get('message', '')
-            details = result.get('details', {})
+        def tracked():
+            # _test_chat_completion reports loads from server counters here
+            self._local.loads = native_loads
+            return test_func()
+        
+        # Run test with timeout; on expiry its in-flight requests are cancelled
+        outcome = execute_test(tracked, timeout or self.test_timeout, self.deadline)
+        success = outcome['success']
+        message = outcome['message']
+        if outcome['exception'] is not None:
+            message = f"Exception: {message}"
+        duration = outcome['duration']
+        server_process = sampler.stop() if sampler else None
+        loads = self.observe_loads(name, models, before, native_loads) if tracking else None
+        if loads and loads['model_loads']:
+            message += f" 🔁 {loads['model_loads']} model loads ({loads['model_load_time']:.2f}s)"
+        
+        with self.lock:
+            if self.parallel:
+                # Interleaved start lines would be unreadable; report name and outcome together
+                print(f"🧪 [{number:2d}] {name}")
+            if success:
+                self.passed_count += 1
+                print(f"✅ PASS ({duration:.2f}s) - {message}")
+            elif outcome['status'] == TIMEOUT:
+                self.timeout_count += 1
+                print(f"⏰ TIMEOUT ({duration:.2f}s) - {message}")
+            else:
+                print(f"❌ FAIL ({duration:.2f}s) - {message}")
             
-        except Exception as e:
-            success = False
-            message = f"Exception: {str(e)}"
+            if self.stream is None:
+                self.stream = ResultStream(self.stream_path)
+            self.stream.write({
+                'category': category,
+                'name': name,
+                'success': success,
+                'status': outcome['status'],
+                'duration': duration,
+                'message': message,
+                'details': outcome['details'],
+                'models': list(models),
+                'server_process': server_process,
+                **(loads or {}),
+                'timestamp': datetime.now().isoformat()
+            })
         
-        duration = time.time() - start_time
+        return success
+    
+    def observe_loads(self, name, models, before, native_loads):
+        """Count the model loads a test caused and record them in the load ledger.
         
-        if success:
-            self.passed_count += 1
-            print(f"✅ PASS ({duration:.2f}s) - {message}")
-        else:
-            print(f"❌ FAIL ({duration:.2f}s) - {message}")
+        Native-backend server counters give exact load times; otherwise a
+        model that became resident during the test counts as one load, timed
+        with its warm-up cold load. In parallel mode attribution is approximate.
+        """
+        after = resident_models(self.client, timeout=2)
+        newly_resident = [m for m in models if before is not None and after is not None
+                          and m in after and m not in before]
         
-        self.results[category].append({
-            'name': name,
-            'success': success,
-            'duration': duration,
-            'message': message,
-            'details': details,
-            'timestamp': datetime.now().isoformat()
-        })
+        for model, load_time in native_loads:
+            self.loads.record(model, load_time, name)
+        measured = {model for model, _ in native_loads}
+        estimated = [m for m in newly_resident if m not in measured]
+        for model in estimated:
+            load = self.warmup.get(model) or {}
+            self.loads.record(model, load.get('cold_load_time') or 0.0, name, measured=False)
         
-        return success
+        count = len(native_loads) + len(estimated)
+        load_time = sum(t for _, t in native_loads) + sum(
+            (self.warmup.get(m) or {}).get('cold_load_time') or 0.0 for m in estimated)
+        return {
+            'model_loads': count,
+            'model_load_time': load_time,
+            # Several models in one test, or any reload after warm-up, means swapping
+            'swap_heavy': len(models) > 1 or count > 0
+        }
+    
+    @staticmethod
+    def plan_models(options):
+        """Models a planned test uses, from its "model:<name>" resources"""
+        return [r.split(':', 1)[1] for r in options.get('resources', []) if r.startswith('model:')]
+
+    # MARK: - Result stream
+    
+    @staticmethod
+    def empty_results():
+        return {
+            'infrastructure': [],
+            'functionality': [],
+            'performance': [],
+            'security': [],
+            'usability': [],
+            'reliability': [],
+            'compatibility': []
+        }
+    
+    def load_results(self, path=None):
+        """Rebuild results_by_category from the JSONL stream (also usable after an interrupted run)"""
+        results = self.empty_results()
+        for record in read_results(path or self.stream_path):
+            category = record.pop('category')
+            results.setdefault(category, []).append(record)
+        # Keep report order independent of completion order (load tests are not in the plan)
+        order = {name: i for i, (_, name, _, _) in enumerate(self.test_plan())}
+        for tests in results.values():
+            tests.sort(key=lambda t: order.get(t['name'], len(order)))
+        return results
+    
+    def finish_stream(self):
+        """Close the stream and load it back for reports and charts"""
+        if self.stream is not None:
+            self.stream.close()
+        self.results = self.load_results()
+        tests = [t for category in self.results.values() for t in category]
+        self.test_count = len(tests)
+        self.passed_count = sum(1 for t in tests if t['success'])
+        self.timeout_count = sum(1 for t in tests if t.get('status') == TIMEOUT)
+    
+    def report_from_stream(self, path=None):
+        """Regenerate reports from a saved stream without running any test"""
+        if path:
+            self.stream_path = path
+        self.finish_stream()
+        print(f"📂 {self.test_count} results loaded from {self.stream_path}")
+        self.generate_comprehensive_report()
+        self.create_visualizations()
+        self.save_results()
+
+    # MARK: - Warm-up
+    
+    def ensure_warm(self, model):
+        """Preload a model with keep-alive once, recording its cold-load time"""
+        if model in self.warmup:
+            return self.warmup[model]
+        
+        loaded = resident_models(self.client) or []
+        
+        start = time.time()
+        result = self.client.preload(model, keep_alive=self.keep_alive, timeout=self.deadline.budget(300))
+        record = {
+            'success': result['success'],
+            'cold_load_time': result['load_time'],
+            'warmup_time': time.time() - start,
+            # Already resident means the load cost was paid before this run
+            'already_loaded': model in loaded,
+            'error': result['error']
+        }
+        self.warmup[model] = record
+        return record
+    
+    def replaying(self):
+        """Replay mode never talks to Ollama, so there is nothing to warm up"""
+        return self.client.cache is not None and self.client.cache.mode == 'replay'
+    
+    def warm_up_models(self, models=MODELS_UNDER_TEST):
+        """Load every model under test before timed tests run"""
+        print("\n🔥 WARM-UP")
+        print("-" * 40)
+        # An empty index means the server is unreachable; the warm-up reports that itself
+        missing = self.models.missing(models) if self.models.refresh().models else []
+        for model in models:
+            if model in missing:
+                print(f"⚠️  {model}: not installed - skipped")
+                continue
+            record = self.ensure_warm(model)
+            if not record['success']:
+                print(f"❌ {model}: warm-up failed - {record['error']}")
+            elif record['already_loaded']:
+                print(f"♻️  {model}: already resident ({record['warmup_time']:.2f}s)")
+            else:
+                print(f"✅ {model}: cold load {record['cold_load_time']:.2f}s "
+                      f"(warm-up {record['warmup_time']:.2f}s, keep_alive {self.keep_alive})")
 
     # MARK: - Infrastructure Tests
     
     def test_ollama_connectivity(self):
         """Test Ollama service connectivity"""
         try:
-            result = subprocess.run(
-                ['curl', '-s', '--connect-timeout', '5', 'http://localhost:11434/api/tags'],
-                capture_output=True, text=True, timeout=10
-            )
+            result = self.client.tags(timeout=10)
             
-            if result.returncode == 0:
-                data = json.loads(result.stdout)
+            if result['success']:
+                data = result['data']
                 model_count = len(data.get('models', []))
                 return {
                     'success': True,
@@ -95,9 +301,9 @@ class ComprehensiveTestSuite:
     def test_api_endpoints(self):
         """Test all API endpoints"""
         endpoints = [
-            'http://localhost:11434/api/tags',
-            'http://localhost:11434/api/version',
-            'http://localhost:11434/v1/chat/completions'
+            '/api/tags',
+            '/api/version',
+            '/v1/chat/completions'
         ]
         
         failed_endpoints = []
@@ -106,19 +312,13 @@ class ComprehensiveTestSuite:
             try:
                 if 'completions' in endpoint:
                     # POST request for chat completions
-                    result = subprocess.run([
-                        'curl', '-s', '-X', 'POST', endpoint,
-                        '-H', 'Content-Type: application/json',
-                        '-d', '{"model":"gemma3:1b","messages":[{"role":"user","content":"test"}]}',
-                        '--connect-timeout', '5'
-                    ], capture_output=True, text=True, timeout=15)
+                    result = self.client.chat('gemma3:1b', 'test', timeout=15)
                 else:
                     # GET request
-                    result = subprocess.run([
-                        'curl', '-s', '--connect-timeout', '5', endpoint
-                    ], capture_output=True, text=True, timeout=10)
+                    result = self.client.get(endpoint, timeout=10)
                 
-                if result.returncode != 0:
+                # Any HTTP response means the endpoint is reachable
+                if result['status'] is None:
                     failed_endpoints.append(endpoint)
                     
             except Exception:
@@ -134,30 +334,23 @@ class ComprehensiveTestSuite:
         required_models = ['gemma3:1b', 'qwen2.5:3b']
         
         try:
-            result = subprocess.run(
-                ['curl', '-s', 'http://localhost:11434/api/tags'],
-                capture_output=True, text=True, timeout=10
-            )
+            self.models.refresh()
+            if not self.models.models:
+                return {'success': False, 'message': 'Failed to fetch model list'}
             
-            if result.returncode == 0:
-                data = json.loads(result.stdout)
-                available_models = [m['name'] for m in data.get('models', [])]
-                
-                missing_models = []
-                for model in required_models:
-                    if not any(model in available for available in available_models):
-                        missing_models.append(model)
-                
-                if not missing_models:
-                    return {
-                        'success': True,
-                        'message': 'All required models available',
-                        'details': {'available_models': available_models}
+            missing_models = self.models.missing(required_models)
+            if not missing_models:
+                return {
+                    'success': True,
+                    'message': 'All required models available',
+                    'details': {
+                        'available_models': list(self.models.models),
+                        'required': {m: self.models.get(m) for m in required_models},
+                        'index_stale': self.models.stale
                     }
-                else:
-                    return {'success': False, 'message': f'Missing models: {missing_models}'}
+                }
             else:
-                return {'success': False, 'message': 'Failed to fetch model list'}
+                return {'success': False, 'message': f'Missing models: {missing_models}'}
                 
         except Exception as e:
             return {'success': False, 'message': f'Model check failed: {str(e)}'}
@@ -198,40 +391,33 @@ class ComprehensiveTestSuite:
     def _test_chat_completion(self, model, message, test_type):
         """Helper method for chat completion tests"""
         try:
-            start_time = time.time()
-            
-            data = {
-                'model': model,
-                'messages': [{'role': 'user', 'content': message}],
-                'stream': False
-            }
-            
-            result = subprocess.run([
-                'curl', '-s', '-X', 'POST',
-                'http://localhost:11434/v1/chat/completions',
-                '-H', 'Content-Type: application/json',
-                '-d', json.dumps(data),
-                '--connect-timeout', '10'
-            ], capture_output=True, text=True, timeout=30)
-            
-            response_time = time.time() - start_time
+            if self.backend == 'native':
+                result = self.client.native_chat(model, message, timeout=30, keep_alive=self.keep_alive)
+            else:
+                result = self.client.chat(model, message, timeout=30)
+            timing = result['timing']
             
-            if result.returncode == 0:
-                try:
-                    response_data = json.loads(result.stdout)
-                    if 'choices' in response_data and response_data['choices']:
-                        content = response_data['choices'][0]['message']['content']
-                        return {
-                            'success': True,
-                            'message': f'{test_type} chat successful',
-                            'details': {
-                                'response_time': response_time,
-                                'response_length': len(content),
-                                'model': model
-                            }
-                        }
-                except json.JSONDecodeError:
-                    pass
+            if result['success']:
+                content = result['content']
+                details = {
+                    'response_time': timing['total'],
+                    'model_time': timing['model'],
+                    'client_overhead': timing['client_overhead'],
+                    'response_length': len(content),
+                    'model': model
+                }
+                details.update(self.tokens.usage(model, message, content, result.get('counters') or result.get('usage')))
+                if result.get('counters'):
+                    details['server_counters'] = result['counters']
+                    self.server_counters.setdefault(model, []).append(result['counters'])
+                    if result['counters']['load_duration'] > LOAD_THRESHOLD:
+                        # Only the test's own thread has a load list; helper threads are not attributed
+                        getattr(self._local, 'loads', []).append((model, result['counters']['load_duration']))
+                return {
+                    'success': True,
+                    'message': f'{test_type} chat successful',
+                    'details': details
+                }
             
             return {'success': False, 'message': f'{test_type} chat failed'}
             
@@ -243,20 +429,37 @@ class ComprehensiveTestSuite:
     def test_response_time(self):
         """Test average response time"""
         times = []
+        counters = []
+        # Steady-state latency only: the model load is measured by the warm-up
+        load = self.ensure_warm('gemma3:1b') if self.warmup_enabled and not self.replaying() else None
         
         for i in range(5):
             start = time.time()
             result = self._test_chat_completion('gemma3:1b', f'Test message {i+1}', 'Performance')
             if result['success']:
                 times.append(time.time() - start)
+                counters.append(result['details'].get('server_counters'))
         
         if times:
             avg_time = sum(times) / len(times)
+            details = {'average_time': avg_time, 'all_times': times}
+            message = f'Average response time: {avg_time:.2f}s'
+            if load and load['success']:
+                details['cold_load_time'] = load['cold_load_time']
+                if not load['already_loaded']:
+                    message += f" (model load {load['cold_load_time']:.2f}s excluded)"
+            summary = summarize_counters(counters)
+            if summary:
+                details['server_counters'] = summary
+                load_text = '' if load else f"load {summary['cold_load_time']:.2f}s, "
+                message += (f" ({load_text}"
+                            f"prefill {summary['prefill_tokens_per_sec'] or 0:.0f} tok/s, "
+                            f"decode {summary['decode_tokens_per_sec'] or 0:.0f} tok/s)")
             if avg_time < 5.0:
                 return {
                     'success': True,
-                    'message': f'Average response time: {avg_time:.2f}s',
-                    'details': {'average_time': avg_time, 'all_times': times}
+                    'message': message,
+                    'details': details
                 }
             else:
                 return {'success': False, 'message': f'Slow response time: {avg_time:.2f}s'}
@@ -287,27 +490,22 @@ class ComprehensiveTestSuite:
             return {'success': False, 'message': f'Only {successful}/3 concurrent requests succeeded'}
     
     def test_memory_usage(self):
-        """Test memory usage"""
-        try:
-            # Simple memory check
-            process = subprocess.run(['ps', '-o', 'rss=', '-p', str(os.getpid())], 
-                                   capture_output=True, text=True)
-            if process.returncode == 0:
-                memory_kb = int(process.stdout.strip())
-                memory_mb = memory_kb / 1024
-                
-                if memory_mb < 500:  # Less than 500MB
-                    return {
-                        'success': True,
-                        'message': f'Memory usage: {memory_mb:.1f}MB',
-                        'details': {'memory_mb': memory_mb}
-                    }
-                else:
-                    return {'success': False, 'message': f'High memory usage: {memory_mb:.1f}MB'}
-            else:
-                return {'success': False, 'message': 'Could not measure memory'}
-        except:
-            return {'success': True, 'message': 'Memory test skipped (not available)'}
+        """Test server memory while answering: RSS, CPU and threads of the Ollama process tree"""
+        if not self.server_pid:
+            return {'success': True, 'message': 'Memory test skipped (Ollama server process not found)'}
+        
+        with ProcessSampler(self.server_pid, interval=min(self.sample_interval, 0.1)) as sampler:
+            result = self._test_chat_completion('gemma3:1b', '日本の四季について簡単に説明してください。', 'Memory')
+        summary = sampler.summary()
+        if summary is None:
+            return {'success': False, 'message': f'Could not read server process {self.server_pid}'}
+        if not result['success']:
+            return {'success': False, 'message': f"{result['message']} ({describe(summary)})"}
+        return {
+            'success': True,
+            'message': describe(summary),
+            'details': {**{k: v for k, v in summary.items() if k not in ('pid', 'samples')}, 'model': 'gemma3:1b'}
+        }
 
     # MARK: - Security Tests
     
@@ -363,13 +561,15 @@ class ComprehensiveTestSuite:
     
     def test_long_input_handling(self):
         """Test long input handling"""
-        long_input = "Tell me about AI. " * 100  # Very long input
+        # Sized in the model's own tokens, not characters, and mixed-script like real prompts
+        long_input, tokens = self.tokens.fit("Tell me about AI. 人工知能について教えてください。", LONG_INPUT_TOKENS, 'gemma3:1b')
         result = self._test_chat_completion('gemma3:1b', long_input, 'Long')
         
         if result['success']:
-            return {'success': True, 'message': 'Long input handled successfully'}
+            return {'success': True, 'message': f'Long input handled successfully ({tokens} tokens)',
+                    'details': result['details']}
         else:
-            return {'success': True, 'message': 'Long input rejected appropriately'}
+            return {'success': True, 'message': f'Long input rejected appropriately ({tokens} tokens)'}
 
     # MARK: - Reliability Tests
     
@@ -405,77 +605,200 @@ class ComprehensiveTestSuite:
         """Test under various network conditions"""
         # Test with timeout
         try:
-            result = subprocess.run([
-                'curl', '-s', '--connect-timeout', '1', '--max-time', '2',
-                'http://localhost:11434/api/tags'
-            ], capture_output=True, text=True, timeout=5)
+            result = self.client.get('/api/tags', timeout=(1, 2))
             
-            if result.returncode == 0:
+            if result['success']:
                 return {'success': True, 'message': 'Network conditions test passed'}
             else:
                 return {'success': True, 'message': 'Network timeout handled appropriately'}
         except:
             return {'success': True, 'message': 'Network test completed (timeout expected)'}
 
-    def run_all_tests(self):
-        """Run complete test suite"""
-        print("🚀 Wisbee iOS 完全版テストスイート")
+    # MARK: - Load Tests
+    
+    def test_load(self, rate, duration=30, arrival='poisson', model='gemma3:1b', p99_target=10.0):
+        """Open-loop load at a fixed arrival rate"""
+        generator = LoadGenerator(model=model, base_url=self.pool, backend=self.backend, routing=self.routing)
+        summary = generator.run(rate, duration, arrival)
+        print_load_summary(summary)
+        
+        latency = summary['latency']
+        success = latency['p99'] <= p99_target and summary['error_rate'] <= 0.05
+        return {
+            'success': success,
+            'message': f"{summary['throughput']:.2f} req/s, p99 {latency['p99']:.2f}s, "
+                       f"errors {summary['error_rate'] * 100:.1f}%",
+            'details': summary
+        }
+    
+    def test_saturation(self, duration=30, arrival='poisson', model='gemma3:1b', p99_target=10.0,
+                        start_rate=SATURATION_START_RATE, max_rate=SATURATION_MAX_RATE):
+        """Ramp the arrival rate until latency or error targets break"""
+        generator = LoadGenerator(model=model, base_url=self.pool, backend=self.backend, routing=self.routing)
+        result = generator.find_saturation(
+            start_rate=start_rate, max_rate=max_rate, duration=duration,
+            arrival=arrival, p99_target=p99_target
+        )
+        
+        if result['sustainable_rate'] is None:
+            return {
+                'success': False,
+                'message': f'Latency targets broken at the starting rate {start_rate:g} req/s',
+                'details': result
+            }
+        if result['saturation_rate'] is None:
+            message = f"No saturation up to {result['sustainable_rate']:.2f} req/s"
+        else:
+            message = (f"Sustainable {result['sustainable_rate']:.2f} req/s, "
+                       f"saturates at {result['saturation_rate']:.2f} req/s")
+        return {'success': True, 'message': message, 'details': result}
+    
+    def run_load_tests(self, rate=None, duration=30, arrival='poisson', model='gemma3:1b',
+                       p99_target=10.0, find_saturation=False):
+        """Run load-generation mode instead of the functional suite"""
+        print("🚀 Wisbee iOS 負荷テスト")
         print("=" * 60)
         print(f"開始時刻: {self.start_time.strftime('%Y-%m-%d %H:%M:%S')}")
-        print("")
+        print(f"モデル: {model} / 到着過程: {arrival} / 計測時間: {duration}s / p99目標: {p99_target}s")
         
-        # Infrastructure Tests
-        print("\n🏗️  INFRASTRUCTURE TESTS")
-        print("-" * 40)
-        self.run_test('infrastructure', 'Ollama Connectivity', self.test_ollama_connectivity)
-        self.run_test('infrastructure', 'API Endpoints', self.test_api_endpoints)
-        self.run_test('infrastructure', 'Model Availability', self.test_model_availability)
+        if self.warmup_enabled and not self.replaying():
+            self.warm_up_models([model])
         
-        # Functionality Tests
-        print("\n⚙️  FUNCTIONALITY TESTS")
-        print("-" * 40)
-        self.run_test('functionality', 'English Chat', self.test_english_chat)
-        self.run_test('functionality', 'Japanese Chat', self.test_japanese_chat)
-        self.run_test('functionality', 'Mathematical Reasoning', self.test_mathematical_reasoning)
-        self.run_test('functionality', 'Code Generation', self.test_code_generation)
-        self.run_test('functionality', 'Multilingual Support', self.test_multilingual_support)
-        
-        # Performance Tests
-        print("\n⚡ PERFORMANCE TESTS")
+        print("\n⚡ LOAD TESTS")
         print("-" * 40)
-        self.run_test('performance', 'Response Time', self.test_response_time)
-        self.run_test('performance', 'Concurrent Requests', self.test_concurrent_requests)
-        self.run_test('performance', 'Memory Usage', self.test_memory_usage)
+        if rate:
+            # Allow the request timeout for the tail of the run
+            self.run_test('performance', f'Load Test ({rate:g} req/s)',
+                          lambda: self.test_load(rate, duration, arrival, model, p99_target),
+                          timeout=duration + 90)
+        if find_saturation:
+            self.run_test('performance', 'Saturation Search',
+                          lambda: self.test_saturation(duration, arrival, model, p99_target),
+                          timeout=len(saturation_rates()) * (duration + 90))
         
-        # Security Tests
-        print("\n🛡️  SECURITY TESTS")
-        print("-" * 40)
-        self.run_test('security', 'Input Sanitization', self.test_input_sanitization)
-        self.run_test('security', 'Rate Limiting', self.test_rate_limiting)
+        self.finish_stream()
+        self.generate_comprehensive_report()
+        self.save_results()
+        self.save_run()
+
+    def test_plan(self):
+        """Declared tests: (category, name, func, options) in report order.
         
-        # Usability Tests
-        print("\n👤 USABILITY TESTS")
-        print("-" * 40)
-        self.run_test('usability', 'Error Handling', self.test_error_handling)
-        self.run_test('usability', 'Empty Input Handling', self.test_empty_input_handling)
-        self.run_test('usability', 'Long Input Handling', self.test_long_input_handling)
+        options are SuiteScheduler settings: depends_on, resources
+        ("model:<name>" groups) and exclusive for tests whose timings
+        would be skewed by concurrent traffic.
+        """
+        gemma = 'model:gemma3:1b'
+        qwen = 'model:qwen2.5:3b'
+        connected = {'depends_on': ['Ollama Connectivity']}
+        models_ready = {'depends_on': ['Model Availability']}
+        return [
+            ('infrastructure', 'Ollama Connectivity', self.test_ollama_connectivity, {}),
+            ('infrastructure', 'API Endpoints', self.test_api_endpoints, {**connected, 'resources': [gemma]}),
+            ('infrastructure', 'Model Availability', self.test_model_availability, connected),
+            
+            ('functionality', 'English Chat', self.test_english_chat, {**models_ready, 'resources': [gemma]}),
+            ('functionality', 'Japanese Chat', self.test_japanese_chat, {**models_ready, 'resources': [qwen]}),
+            ('functionality', 'Mathematical Reasoning', self.test_mathematical_reasoning,
+             {**models_ready, 'resources': [gemma]}),
+            ('functionality', 'Code Generation', self.test_code_generation, {**models_ready, 'resources': [gemma]}),
+            ('functionality', 'Multilingual Support', self.test_multilingual_support,
+             {**models_ready, 'resources': [gemma, qwen]}),
+            
+            ('performance', 'Response Time', self.test_response_time,
+             {**models_ready, 'resources': [gemma], 'exclusive': True}),
+            ('performance', 'Concurrent Requests', self.test_concurrent_requests,
+             {**models_ready, 'resources': [gemma], 'exclusive': True}),
+            ('performance', 'Memory Usage', self.test_memory_usage,
+             {**models_ready, 'resources': [gemma], 'exclusive': True}),
+            
+            ('security', 'Input Sanitization', self.test_input_sanitization, {**models_ready, 'resources': [gemma]}),
+            ('security', 'Rate Limiting', self.test_rate_limiting, {**models_ready, 'resources': [gemma]}),
+            
+            ('usability', 'Error Handling', self.test_error_handling, connected),
+            ('usability', 'Empty Input Handling', self.test_empty_input_handling, {**models_ready, 'resources': [gemma]}),
+            ('usability', 'Long Input Handling', self.test_long_input_handling, {**models_ready, 'resources': [gemma]}),
+            
+            ('reliability', 'Service Recovery', self.test_service_recovery, {}),
+            ('reliability', 'Data Consistency', self.test_data_consistency, {**models_ready, 'resources': [qwen]}),
+            
+            ('compatibility', 'iOS Compatibility', self.test_ios_compatibility, {}),
+            ('compatibility', 'Network Conditions', self.test_network_conditions, {**connected, 'exclusive': True})
+        ]
+
+    def run_all_tests(self, workers=1, model_slots=2):
+        """Run complete test suite; workers > 1 schedules independent tests in parallel"""
+        print("🚀 Wisbee iOS 完全版テストスイート")
+        print("=" * 60)
+        print(f"開始時刻: {self.start_time.strftime('%Y-%m-%d %H:%M:%S')}")
+        print("")
         
-        # Reliability Tests
-        print("\n🔄 RELIABILITY TESTS")
-        print("-" * 40)
-        self.run_test('reliability', 'Service Recovery', self.test_service_recovery)
-        self.run_test('reliability', 'Data Consistency', self.test_data_consistency)
+        if self.warmup_enabled and not self.replaying():
+            self.warm_up_models()
         
-        # Compatibility Tests
-        print("\n📱 COMPATIBILITY TESTS")
-        print("-" * 40)
-        self.run_test('compatibility', 'iOS Compatibility', self.test_ios_compatibility)
-        self.run_test('compatibility', 'Network Conditions', self.test_network_conditions)
+        plan = self.test_plan()
+        if self.minimize_swaps:
+            plan = self.residency_plan(plan)
+        if workers > 1:
+            self.run_scheduled(plan, workers, model_slots)
+        else:
+            category = None
+            for test_category, name, func, options in plan:
+                if test_category != category:
+                    category = test_category
+                    print(f"\n{CATEGORY_HEADERS[category]}")
+                    print("-" * 40)
+                self.run_test(category, name, func, models=self.plan_models(options))
         
         # Generate comprehensive report
+        self.finish_stream()
         self.generate_comprehensive_report()
         self.create_visualizations()
         self.save_results()
+        self.save_run()
+
+    def residency_plan(self, plan):
+        """Reorder the plan so work for the resident model runs before switching"""
+        resident = [] if self.replaying() else resident_models(self.client) or []
+        models_of = lambda entry: self.plan_models(entry[3])
+        ordered = residency_order(plan, models_of, resident)
+        before = count_switches(m for entry in plan for m in models_of(entry))
+        after = count_switches(m for entry in ordered for m in models_of(entry))
+        print(f"\n🧭 Residency-ordered plan: {after} model switches (declared order {before}), "
+              f"resident at start: {', '.join(resident) or 'none'}")
+        return ordered
+    
+    def run_scheduled(self, plan, workers, model_slots=2):
+        """Run the plan on a worker pool, honouring dependencies and resource groups"""
+        print(f"\n🔀 PARALLEL EXECUTION ({workers} workers, {model_slots} slots per model)")
+        print("-" * 40)
+        start = time.time()
+        
+        def skip(category, name):
+            def on_skip(failed):
+                return self.run_test(category, name, lambda: {
+                    'success': False, 'message': f"Skipped: depends on failed {', '.join(failed)}"
+                })
+            return on_skip
+        
+        skips = {}
+        scheduler = SuiteScheduler(
+            max_workers=workers,
+            default_limit=model_slots,
+            on_skip=lambda name, failed: skips[name](failed)
+        )
+        for category, name, func, options in plan:
+            skips[name] = skip(category, name)
+            scheduler.add(name, lambda c=category, n=name, f=func, m=self.plan_models(options):
+                          self.run_test(c, n, f, models=m), **options)
+        
+        self.parallel = True
+        try:
+            scheduler.run()
+        finally:
+            self.parallel = False
+        
+        print(f"\n⏱️  Parallel wall time: {time.time() - start:.2f}s")
 
     def generate_comprehensive_report(self):
         """Generate comprehensive test report"""
@@ -490,6 +813,8 @@ class ComprehensiveTestSuite:
         print(f"総テスト数: {self.test_count}")
         print(f"成功数: {self.passed_count}")
         print(f"失敗数: {self.test_count - self.passed_count}")
+        if self.timeout_count:
+            print(f"  うちタイムアウト: {self.timeout_count}")
         print(f"成功率: {success_rate:.1f}%")
         
         print("\nカテゴリ別結果:")
@@ -513,6 +838,71 @@ class ComprehensiveTestSuite:
             print("🔧 FAIR - Significant improvements needed")
         else:
             print("❌ POOR - Major issues to resolve")
+        
+        if self.warmup:
+            print("\nモデルロード (ウォームアップ、レイテンシ統計から除外):")
+            for model, record in self.warmup.items():
+                if not record['success']:
+                    print(f"  {model}: 失敗 - {record['error']}")
+                elif record['already_loaded']:
+                    print(f"  {model}: 既にロード済み")
+                else:
+                    print(f"  {model}: cold load {record['cold_load_time']:.2f}s")
+        
+        self.report_model_loads()
+        self.report_server_process()
+        
+        self.client.print_overhead_report()
+        if self.client.cache is not None:
+            self.client.cache.print_stats()
+        
+        performance = self.model_performance()
+        if performance:
+            print("\nサーバー計測 (Ollama eval counters):")
+            for model, summary in performance.items():
+                print(f"  {model}: cold load {summary['cold_load_time']:.2f}s, "
+                      f"prefill {summary['prefill_tokens_per_sec'] or 0:.1f} tok/s, "
+                      f"decode {summary['decode_tokens_per_sec'] or 0:.1f} tok/s")
+
+    def swap_heavy_tests(self):
+        return [t for tests in self.results.values() for t in tests if t.get('swap_heavy')]
+    
+    def report_model_loads(self):
+        """Model loads during tests and the swap-heavy tests, kept apart from latency figures"""
+        if not any('model_loads' in t for tests in self.results.values() for t in tests):
+            return
+        self.loads.print_summary("\n🔁 テスト中のモデルロード (ウォームアップ除く)")
+        swap_heavy = self.swap_heavy_tests()
+        if swap_heavy:
+            print("\n🔁 スワップの多いテスト (所要時間はロード時間を除外):")
+            for test in swap_heavy:
+                print(f"  {test['name']}: {', '.join(test['models'])} - {test['model_loads']} loads "
+                      f"({test['model_load_time']:.2f}s), "
+                      f"{max(0.0, test['duration'] - test['model_load_time']):.2f}s excluding loads")
+    
+    def report_server_process(self):
+        """Peak and average footprint of the Ollama process tree per test"""
+        sampled = [t for tests in self.results.values() for t in tests if t.get('server_process')]
+        if not sampled:
+            return
+        print("\n🧠 Ollamaサーバーのリソース使用量 (テスト毎):")
+        for test in sorted(sampled, key=lambda t: -t['server_process']['rss_peak_mb']):
+            models = f" [{', '.join(test['models'])}]" if test.get('models') else ""
+            print(f"  {test['name']}{models}: {describe(test['server_process'])}")
+    
+    def model_performance(self):
+        """Per-model load/prefill/decode summary from native-backend counters"""
+        performance = {}
+        for model, records in self.server_counters.items():
+            summary = summarize_counters(records)
+            if not summary:
+                continue
+            # After warm-up the first request is warm; the real cold load comes from the warm-up
+            load = self.warmup.get(model)
+            if load and load['success'] and not load['already_loaded']:
+                summary['cold_load_time'] = load['cold_load_time']
+            performance[model] = summary
+        return performance
 
     def create_visualizations(self):
         """Create comprehensive test visualizations"""
@@ -594,7 +984,7 @@ class ComprehensiveTestSuite:
         ax4.grid(True, alpha=0.3)
         
         plt.tight_layout()
-        plt.savefig('/Users/yuki/wisbee-iOS/screenshots/comprehensive_test_report.png', 
+        plt.savefig(results_path('comprehensive_test_report.png'),
                    dpi=300, bbox_inches='tight', facecolor='#0a0a0a')
         
         print("✅ Visualization saved to: comprehensive_test_report.png")
@@ -608,9 +998,16 @@ class ComprehensiveTestSuite:
                 'total_tests': self.test_count,
                 'passed_tests': self.passed_count,
                 'failed_tests': self.test_count - self.passed_count,
+                'timed_out_tests': self.timeout_count,
                 'success_rate': (self.passed_count / self.test_count * 100) if self.test_count > 0 else 0
             },
             'results_by_category': self.results,
+            'http_client': self.client.overhead_report(),
+            'backend': self.backend,
+            'model_performance': self.model_performance(),
+            'warmup': self.warmup,
+            'model_loads': self.loads.summary(),
+            'swap_heavy_tests': [t['name'] for t in self.swap_heavy_tests()],
             'environment': {
                 'python_version': sys.version,
                 'platform': os.name,
@@ -618,15 +1015,60 @@ class ComprehensiveTestSuite:
             }
         }
         
-        # Save JSON report
-        with open('/Users/yuki/wisbee-iOS/test_results_comprehensive.json', 'w', encoding='utf-8') as f:
+        # Save JSON report (results_by_category was loaded back from the JSONL stream)
+        with open(results_path('test_results_comprehensive.json'), 'w', encoding='utf-8') as f:
             json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"✅ Per-test stream: {STREAM_FILE}")
         
         # Save markdown report
         self.save_markdown_report(report)
+    
+    def save_run(self):
+        """Record this run in the history and its server counters in the catalog measurements.
         
-        print(f"✅ Detailed results saved to: test_results_comprehensive.json")
-        print(f"✅ Markdown report saved to: test_results_comprehensive.md")
+        Separate from save_results so a report rebuilt from a saved stream is
+        never recorded as another run.
+        """
+        source = run_source(self.client)
+        performance = self.model_performance()
+        if performance and source == 'live':
+            record_performance(performance)
+            print(f"✅ Server counters recorded in: {MEASUREMENTS_FILE}")
+        
+        if source == 'replay':
+            print(f"✅ Replayed responses are not appended to: benchmark_history.sqlite")
+            return
+        run_id = record_run('comprehensive', self.history_records(), self.start_time, {'backend': self.backend},
+                            source=source)
+        print(f"✅ Run {run_id} appended to: benchmark_history.sqlite")
+    
+    def history_records(self):
+        """(model, test, metrics) rows for the results store"""
+        records = []
+        for category, tests in self.results.items():
+            for test in tests:
+                details = test['details'] if isinstance(test['details'], dict) else {}
+                metrics = {
+                    'duration': test['duration'],
+                    'success': test['success'],
+                    'timed_out': test.get('status') == TIMEOUT
+                }
+                if 'model_loads' in test:
+                    # Swap cost reported on its own so it does not read as a latency regression
+                    metrics['model_loads'] = test['model_loads']
+                    metrics['model_load_time'] = test['model_load_time']
+                    metrics['duration_excl_load'] = max(0.0, test['duration'] - test['model_load_time'])
+                metrics.update(numeric_metrics(details))
+                metrics.update(numeric_metrics(test.get('server_process') or {}, exclude=('pid', 'samples'),
+                                               prefix='server_'))
+                records.append((details.get('model', ''), f"{category}/{test['name']}", metrics))
+        for model, load in self.warmup.items():
+            if load['success'] and not load['already_loaded']:
+                records.append((model, 'warmup/Model Load', {
+                    'cold_load_time': load['cold_load_time'],
+                    'warmup_time': load['warmup_time']
+                }))
+        return records
 
     def save_markdown_report(self, report):
         """Save markdown formatted report"""
@@ -638,7 +1080,7 @@ class ComprehensiveTestSuite:
 - **実行時間**: {report['duration']:.1f}秒
 - **総テスト数**: {report['summary']['total_tests']}
 - **成功数**: {report['summary']['passed_tests']}
-- **失敗数**: {report['summary']['failed_tests']}
+- **失敗数**: {report['summary']['failed_tests']}（うちタイムアウト {report['summary']['timed_out_tests']}）
 - **成功率**: {report['summary']['success_rate']:.1f}%
 
 ## 📈 カテゴリ別結果
@@ -656,9 +1098,12 @@ class ComprehensiveTestSuite:
                 md_content += f"**成功率**: {rate:.1f}% ({passed}/{total})\n\n"
                 
                 for test in tests:
-                    icon = "✅" if test['success'] else "❌"
-                    md_content += f"- {icon} **{test['name']}** ({test['duration']:.2f}s)\n"
+                    icon = "✅" if test['success'] else "⏰" if test.get('status') == TIMEOUT else "❌"
+                    swap = f" 🔁 {test.get('model_loads', 0)} loads" if test.get('swap_heavy') else ""
+                    md_content += f"- {icon} **{test['name']}** ({test['duration']:.2f}s){swap}\n"
                     md_content += f"  - {test['message']}\n"
+                    if test.get('server_process'):
+                        md_content += f"  - 🧠 {describe(test['server_process'])}\n"
                 
                 md_content += "\n"
         
@@ -691,10 +1136,50 @@ class ComprehensiveTestSuite:
 *Generated by Wisbee iOS Comprehensive Test Suite*
 """
         
-        with open('/Users/yuki/wisbee-iOS/test_results_comprehensive.md', 'w', encoding='utf-8') as f:
+        with open(results_path('test_results_comprehensive.md'), 'w', encoding='utf-8') as f:
             f.write(md_content)
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Wisbee iOS comprehensive test suite")
+    parser.add_argument('--backend', choices=['openai', 'native'], default='openai',
+                        help="native uses /api/chat and records Ollama's load/prefill/decode counters")
+    parser.add_argument('--load-rate', type=float,
+                        help='run load mode at this open-loop arrival rate (req/s)')
+    parser.add_argument('--find-saturation', action='store_true',
+                        help='run load mode, ramping the rate until latency targets break')
+    parser.add_argument('--load-duration', type=float, default=30, help='seconds per load step')
+    parser.add_argument('--arrival', choices=['poisson', 'constant'], default='poisson')
+    parser.add_argument('--load-model', default='gemma3:1b')
+    parser.add_argument('--p99-target', type=float, default=10.0, help='p99 latency target in seconds')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='run independent tests in parallel on this many workers (latency tests still run alone)')
+    parser.add_argument('--test-timeout', type=float, default=30, help='seconds before a test is cancelled')
+    parser.add_argument('--suite-timeout', type=float, help='wall-clock budget for the whole run in seconds')
+    parser.add_argument('--no-warmup', action='store_true',
+                        help='skip the model warm-up stage (first requests then include model load)')
+    parser.add_argument('--keep-alive', default='30m', help='keep_alive for warmed-up models')
+    parser.add_argument('--cache', choices=['record', 'replay', 'auto'],
+                        help='cache chat responses on disk: record, replay (no Ollama calls) or auto')
+    parser.add_argument('--cache-dir', help='response cache directory (default: <results dir>/response_cache)')
+    parser.add_argument('--cache-max-mb', type=float, default=512, help='evict least recently used beyond this size')
+    parser.add_argument('--model-slots', type=int, default=2,
+                        help='parallel mode: tests allowed to use the same model at once')
+    parser.add_argument('--pool', action='append', metavar='URL',
+                        help='Ollama host to balance requests across, repeatable (default: a single OLLAMA_HOST)')
+    parser.add_argument('--routing', choices=POLICIES, default='least-outstanding',
+                        help='pool routing policy')
+    parser.add_argument('--minimize-swaps', action='store_true',
+                        help='reorder tests so all work for the resident model runs before switching models')
+    parser.add_argument('--server-pid', type=int,
+                        help='Ollama server pid to sample (default: OLLAMA_PID, the OLLAMA_HOST port, or `ollama serve`)')
+    parser.add_argument('--sample-interval', type=float, default=0.25,
+                        help='seconds between server RSS/CPU/thread samples during each test')
+    parser.add_argument('--report-only', nargs='?', const='', metavar='JSONL',
+                        help=f'rebuild reports from a saved result stream (default: {STREAM_FILE}) without testing')
+    args = parser.parse_args()
+    
     # Install required packages if needed
     try:
         import matplotlib
@@ -703,9 +1188,27 @@ if __name__ == "__main__":
         subprocess.run([sys.executable, "-m", "pip", "install", "matplotlib", "numpy"], check=True)
     
     # Run comprehensive test suite
-    suite = ComprehensiveTestSuite()
-    suite.run_all_tests()
+    suite = ComprehensiveTestSuite(backend=args.backend, test_timeout=args.test_timeout,
+                                   suite_timeout=args.suite_timeout, warmup=not args.no_warmup,
+                                   keep_alive=args.keep_alive,
+                                   cache=ResponseCache(args.cache, args.cache_dir, args.cache_max_mb * 1024 * 1024)
+                                   if args.cache else None,
+                                   pool=args.pool, routing=args.routing, minimize_swaps=args.minimize_swaps,
+                                   server_pid=args.server_pid, sample_interval=args.sample_interval)
+    if args.report_only is not None:
+        suite.report_from_stream(args.report_only or None)
+    elif args.load_rate or args.find_saturation:
+        suite.run_load_tests(
+            rate=args.load_rate,
+            duration=args.load_duration,
+            arrival=args.arrival,
+            model=args.load_model,
+            p99_target=args.p99_target,
+            find_saturation=args.find_saturation
+        )
+    else:
+        suite.run_all_tests(workers=args.workers, model_slots=args.model_slots)
     
     print("\n✨ 完全版テストスイート完了！")
     print("📄 詳細レポート: test_results_comprehensive.json")
-    print("📊 ビジュアライゼーション: screenshots/comprehensive_test_report.png")
\ No newline at end of file
+    print("📊 ビジュアライゼーション: comprehensive_test_report.png")
\ No newline at end of file
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI Context Scaling Sweep
+プロンプト長を幾何級数的に伸ばし、プリフィル時間・TTFT・メモリの増え方を測定して安全な入力上限を求める
+"""
+
+import argparse
+import json
+import math
+import sys
+import uuid
+from datetime import datetime
+
+from bench_stats import linear_fit
+from model_catalog import MEASUREMENTS_FILE, canonical_name, get_model_index, record_input_limits
+from ollama_client import get_client
+from result_stream import ResultStream, read_results
+from results_store import numeric_metrics, record_run, results_path, run_source
+from token_accounting import get_token_counter
+
+STREAM_FILE = 'context_scaling_results.jsonl'
+SUMMARY_FILE = 'context_scaling.json'
+
+# Filler paragraphs repeated to the target length; the question comes last, as in a real long input
+FILLER = {
+    'ja': '人工知能は私たちの生活を大きく変えつつあります。医療では画像診断を助け、'
+          '交通では自動運転の研究が進み、教育では一人ひとりに合わせた学習を支えています。',
+    'en': 'Artificial intelligence is changing daily life. It helps doctors read medical images, '
+          'drives research on self-driving cars and lets teachers adapt lessons to every student. '
+}
+QUESTION = {
+    'ja': '\n\n上の文章を一文で要約してください。',
+    'en': '\n\nSummarize the text above in one sentence.'
+}
+# Tokens kept free in num_ctx for the chat template and the reply
+HEADROOM = 64
+# Steps faster than this are too noisy to call superlinear
+MIN_TIMED = 0.01
+
+
+def context_window(tokens, limit):
+    """num_ctx for a prompt: the next power of two that fits it, capped at the model's limit"""
+    return min(limit, 2 ** math.ceil(math.log2(max(tokens, 1))))
+
+
+def local_exponents(points):
+    """Exponent b of time ∝ tokens^b between consecutive (tokens, time) points"""
+    exponents = []
+    for (n0, t0), (n1, t1) in zip(points, points[1:]):
+        timed = t0 >= MIN_TIMED and t1 > 0 and n1 > n0
+        exponents.append(math.log(t1 / t0) / math.log(n1 / n0) if timed else None)
+    return exponents
+
+
+def power_fit(points):
+    """Fit time = a * tokens^b on a log-log scale; b > 1 means superlinear"""
+    points = [(n, t) for n, t in points if n > 0 and t > 0]
+    if len(points) < 2:
+        return None
+    fit = linear_fit([math.log(n) for n, _ in points], [math.log(t) for _, t in points])
+    return {'exponent': fit['slope'], 'coefficient': math.exp(fit['intercept']), 'r2': fit['r2']}
+
+
+def catalog_limits(analysis, limits):
+    """What the app needs per model: the safe size and where scaling turns superlinear"""
+    summaries = {}
+    for model, languages in analysis.items():
+        exponents = [e['prefill_fit']['exponent'] for e in languages.values() if e['prefill_fit']]
+        knees = [e['superlinear_from'] for e in languages.values() if e['superlinear_from']]
+        summaries[model] = {
+            'safe_input_tokens': limits.get(model),
+            'prefill_exponent': max(exponents) if exponents else None,
+            'superlinear_from': min(knees) if knees else None
+        }
+    return summaries
+
+
+class ContextScalingSweep:
+    """Geometrically growing prompts per model and language, up to the model's context limit"""
+
+    def __init__(self, base_url=None, start_tokens=128, factor=2.0, max_context=None, num_predict=16,
+                 timeout=600.0, superlinear_exponent=1.2, max_ttft=5.0):
+        self.client = get_client(base_url)
+        self.tokens = get_token_counter()
+        self.start_tokens = start_tokens
+        self.factor = factor
+        self.max_context = max_context
+        self.num_predict = num_predict
+        self.timeout = timeout
+        self.superlinear_exponent = superlinear_exponent
+        self.max_ttft = max_ttft
+        self.stream = None
+
+    def context_limit(self, model):
+        """Context length from the model index (/api/show, catalog fallback), capped by --max-context"""
+        index = get_model_index(self.client)
+        entry = index.get(model) or index.refresh().get(model) or {}
+        limit = entry.get('context_length')
+        if limit and self.max_context:
+            return min(limit, self.max_context)
+        return limit or self.max_context
+
+    def steps(self, limit):
+        """Target prompt sizes: start, start*factor, ... and finally the largest that fits the limit"""
+        largest = limit - self.num_predict - HEADROOM
+        steps = []
+        target = self.start_tokens
+        while target < largest:
+            steps.append(int(target))
+            target *= self.factor
+        if largest > 0 and (not steps or largest > steps[-1]):
+            steps.append(largest)
+        return steps
+
+    def prompt(self, model, language, target):
+        """A prompt of about target tokens; the leading nonce keeps the prefix cache from skipping prefill"""
+        head = f"[{uuid.uuid4().hex[:8]}] "
+        fixed = self.tokens.count(head + QUESTION[language], model)[0]
+        filler, _ = self.tokens.fit(FILLER[language], max(1, target - fixed), model)
+        text = head + filler + QUESTION[language]
+        return text, self.tokens.count(text, model)[0]
+
+    def resident_size(self, model):
+        """Bytes the server reports for the model in /api/ps (weights plus KV cache)"""
+        result = self.client.ps(timeout=10)
+        for entry in (result['data'] or {}).get('models', []) if result['success'] else []:
+            if canonical_name(entry.get('name', '')) == canonical_name(model):
+                return entry.get('size_vram') or entry.get('size')
+        return None
+
+    # MARK: - Sweep
+
+    def run_step(self, model, language, step, target, limit):
+        prompt, prompt_tokens = self.prompt(model, language, target)
+        num_ctx = context_window(prompt_tokens + self.num_predict + HEADROOM, limit)
+        result = self.client.native_stream_chat(model, prompt, timeout=self.timeout,
+                                                options={'num_ctx': num_ctx, 'num_predict': self.num_predict,
+                                                         'temperature': 0})
+        counters = result.get('counters') or {}
+        ttft = (result.get('stream') or {}).get('ttft')
+        load_time = counters.get('load_duration') or 0.0
+        return {
+            'model': model,
+            'language': language,
+            'step': step,
+            'target_tokens': target,
+            'prompt_text_tokens': prompt_tokens,
+            'prompt_tokens': counters.get('prompt_eval_count') or prompt_tokens,
+            'num_ctx': num_ctx,
+            'success': result['success'],
+            'error': result['error'],
+            'prefill_time': counters.get('prompt_eval_duration'),
+            'ttft': ttft,
+            # A new num_ctx reloads the model; that is not part of the prompt's cost
+            'ttft_excl_load': ttft - load_time if ttft is not None else None,
+            'load_time': load_time,
+            'memory_bytes': self.resident_size(model) if result['success'] else None,
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def sweep(self, model, languages):
+        limit = self.context_limit(model)
+        if not limit:
+            print(f"⚠️  {model}: context length unknown (not installed?), skipped")
+            return []
+        records = []
+        for language in languages:
+            steps = self.steps(limit)
+            print(f"\n📏 {model} [{language}] up to {limit} tokens: {', '.join(map(str, steps))}")
+            for step, target in enumerate(steps):
+                record = self.run_step(model, language, step, target, limit)
+                self.stream.write(record)
+                records.append(record)
+                if not record['success']:
+                    print(f"  ❌ {target:6d} tokens: {record['error']}")
+                    # Longer prompts will not fare better
+                    break
+                memory = f", {record['memory_bytes'] / 1e9:.2f}GB" if record['memory_bytes'] else ""
+                print(f"  ✅ {record['prompt_tokens']:6d} tokens (ctx {record['num_ctx']}): "
+                      f"prefill {record['prefill_time'] or 0:.3f}s, TTFT {record['ttft_excl_load'] or 0:.3f}s{memory}")
+        return records
+
+    def run(self, models, languages):
+        path = results_path(STREAM_FILE)
+        self.stream = ResultStream(path)
+        print(f"📈 Context scaling sweep: {', '.join(models)} ({', '.join(languages)}), x{self.factor:g} per step")
+        try:
+            for model in models:
+                self.sweep(model, languages)
+        finally:
+            self.stream.close()
+        return path
+
+    # MARK: - Analysis
+
+    def analyze(self, records):
+        """Per model and language: scaling fits, the first superlinear step and a safe input size"""
+        grouped = {}
+        for record in records:
+            grouped.setdefault(record['model'], {}).setdefault(record['language'], []).append(record)
+
+        analysis = {}
+        for model, languages in grouped.items():
+            for language, rows in languages.items():
+                rows.sort(key=lambda r: r['step'])
+                ok = [r for r in rows if r['success'] and r['prefill_time'] is not None]
+                prefill = [(r['prompt_tokens'], r['prefill_time']) for r in ok]
+                exponents = local_exponents(prefill)
+                knee = next((ok[i + 1]['prompt_tokens'] for i, b in enumerate(exponents)
+                             if b is not None and b > self.superlinear_exponent), None)
+                safe = [r for r in ok if (knee is None or r['prompt_tokens'] < knee)
+                        and (r['ttft_excl_load'] or 0) <= self.max_ttft]
+                memory = [(r['num_ctx'], r['memory_bytes']) for r in ok if r['memory_bytes']]
+                analysis.setdefault(model, {})[language] = {
+                    'steps': len(rows),
+                    'failed_at': next((r['target_tokens'] for r in rows if not r['success']), None),
+                    'prefill_fit': power_fit(prefill),
+                    'ttft_fit': power_fit([(r['prompt_tokens'], r['ttft_excl_load']) for r in ok
+                                           if r['ttft_excl_load'] is not None]),
+                    'memory_per_1k_ctx': (linear_fit([n for n, _ in memory], [m for _, m in memory])['slope'] * 1000
+                                          if len(memory) > 1 else None),
+                    'local_exponents': exponents,
+                    'superlinear_from': knee,
+                    'safe_input_tokens': safe[-1]['prompt_tokens'] if safe else None,
+                    'per_step': [{key: r[key] for key in ('prompt_tokens', 'num_ctx', 'prefill_time',
+                                                          'ttft_excl_load', 'memory_bytes')} for r in ok]
+                }
+        return analysis
+
+    def report(self, analysis):
+        print("\n" + "=" * 60)
+        print("📊 入力長に対するスケーリング")
+        print("=" * 60)
+        limits = {}
+        for model, languages in analysis.items():
+            print(f"\n🤖 {model}")
+            for language, entry in languages.items():
+                fit = entry['prefill_fit']
+                shape = f"prefill ∝ n^{fit['exponent']:.2f} (r² {fit['r2'] or 0:.2f})" if fit else "too few points"
+                knee = entry['superlinear_from']
+                memory = entry['memory_per_1k_ctx']
+                print(f"  [{language}] {shape}"
+                      + (f", memory +{memory / 1e6:.1f}MB per 1k ctx" if memory else "")
+                      + (f"\n       ⚠️  superlinear from {knee} tokens" if knee else "")
+                      + (f"\n       ❌ failed at {entry['failed_at']} tokens" if entry['failed_at'] else ""))
+            safe = [entry['safe_input_tokens'] for entry in languages.values()]
+            # Every language must be safe at the recommended size
+            limits[model] = min(safe) if safe and None not in safe else None
+            print(f"  🛡️  Safe input limit: {limits[model] or 'none found'}"
+                  + (f" tokens (TTFT ≤ {self.max_ttft:.1f}s, before any superlinear step)" if limits[model] else ""))
+        return limits
+
+    def save(self, analysis, limits, records, started_at):
+        with open(results_path(SUMMARY_FILE), 'w', encoding='utf-8') as f:
+            json.dump({'superlinear_exponent': self.superlinear_exponent, 'max_ttft': self.max_ttft,
+                       'safe_input_tokens': limits, 'analysis': analysis}, f, ensure_ascii=False, indent=2)
+        history = [
+            (record['model'], f"{record['language']} {record['target_tokens']} tokens",
+             numeric_metrics(record, exclude=('step',)))
+            for record in records
+        ]
+        run_id = record_run('context_scaling', history, started_at,
+                            {'factor': self.factor, 'num_predict': self.num_predict}, source=run_source(self.client))
+        print(f"\n💾 Per-step stream: {STREAM_FILE}")
+        print(f"💾 Summary saved to: {SUMMARY_FILE}")
+        print(f"💾 Run {run_id} appended to: benchmark_history.sqlite")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep prompt length and fit how latency and memory scale")
+    parser.add_argument('--model', action='append', dest='models', help='model to sweep, repeatable (default: gemma3:1b)')
+    parser.add_argument('--language', action='append', dest='languages', choices=sorted(FILLER),
+                        help='prompt language, repeatable (default: ja and en)')
+    parser.add_argument('--base-url', help='Ollama server (default: OLLAMA_HOST or localhost:11434)')
+    parser.add_argument('--start-tokens', type=int, default=128)
+    parser.add_argument('--factor', type=float, default=2.0, help='growth per step')
+    parser.add_argument('--max-context', type=int, help='stop below this many tokens even if the model allows more')
+    parser.add_argument('--num-predict', type=int, default=16, help='reply tokens per step')
+    parser.add_argument('--superlinear-exponent', type=float, default=1.2,
+                        help='local exponent of prefill time above which scaling counts as superlinear')
+    parser.add_argument('--max-ttft', type=float, default=5.0, help='slowest acceptable time to first token (s)')
+    parser.add_argument('--dry-run', action='store_true', help='do not write the safe limits to the catalog')
+    parser.add_argument('--report-only', nargs='?', const='', metavar='JSONL',
+                        help=f'analyze a saved per-step stream (default: {STREAM_FILE}) without running')
+    args = parser.parse_args()
+
+    sweep = ContextScalingSweep(args.base_url, args.start_tokens, args.factor, args.max_context, args.num_predict,
+                                superlinear_exponent=args.superlinear_exponent, max_ttft=args.max_ttft)
+    started_at = datetime.now()
+    if args.report_only is not None:
+        path = args.report_only or results_path(STREAM_FILE)
+    else:
+        path = sweep.run(args.models or ['gemma3:1b'], args.languages or ['ja', 'en'])
+
+    records = list(read_results(path))
+    if not records:
+        print("❌ No steps recorded")
+        return 1
+    analysis = sweep.analyze(records)
+    limits = sweep.report(analysis)
+    if args.report_only is None:
+        sweep.save(analysis, limits, records, started_at)
+        source = run_source(sweep.client)
+        if source != 'live':
+            print(f"📚 Safe input limits not recorded for a {source} run")
+        elif not args.dry_run:
+            skipped = record_input_limits(catalog_limits(analysis, limits))
+            print(f"📚 Safe input limits written to {MEASUREMENTS_FILE}"
+                  + (f" (not in catalog: {', '.join(skipped)})" if skipped else ""))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -684,6 +684,8 @@ class ChatManager: ObservableObject {
     @Published var isLoading: Bool = false
     
     private let ollamaService = OllamaService()
+    // What is sent to Ollama: bounded by a token budget, unlike `messages`, which is only displayed
+    private var history = HistoryCompactor(systemPrompt: "あなたはChirAIの親切な日本語アシスタントです。簡潔に答えてください。")
     
     init() {
         addWelcomeMessage()
@@ -714,8 +716,11 @@ class ChatManager: ObservableObject {
         inputText = ""
         isLoading = true
         
+        history.add(role: "user", content: userInput)
+        
         do {
-            let aiResponse = try await ollamaService.sendMessage(userInput)
+            let aiResponse = try await ollamaService.sendChat(history.messages())
+            history.add(role: "assistant", content: aiResponse)
             let aiMessage = ChatMessage(
                 id: UUID(),
                 content: aiResponse,
@@ -743,6 +748,107 @@ struct ChatMessage: Identifiable {
     let isUser: Bool
     let timestamp: Date
 }
+'''
+        
+        # HistoryCompactor (mirrors history_compaction.py)
+        history_compactor = '''import Foundation
+
+/// Bounded chat history: pinned system prompt, running summary, recent-turn window.
+/// Same rules and token estimate as history_compaction.py, so compaction_benchmark.py
+/// results carry over to the app.
+struct HistoryCompactor {
+    static let summaryHeader = "これまでの会話の要約:"
+    static let sentenceEnds: Set<Character> = ["。", "．", "！", "？", "!", "?"]
+    static let roleLabels = ["user": "ユーザー", "assistant": "AI"]
+    
+    let systemPrompt: String
+    let budget: Int
+    let reserve: Int
+    let summaryBudget: Int
+    
+    private let systemTokens: Int
+    private var window: [(role: String, content: String, tokens: Int)] = []
+    private var windowTokens = 0
+    private var summary: [(line: String, tokens: Int)] = []
+    private var summaryTokens = 0
+    
+    init(systemPrompt: String, budget: Int = 2048, reserve: Int = 512, summaryBudget: Int = 256) {
+        self.systemPrompt = systemPrompt
+        self.budget = budget
+        self.reserve = reserve
+        self.summaryBudget = summaryBudget
+        self.systemTokens = HistoryCompactor.approxTokens(systemPrompt)
+    }
+    
+    /// One token per CJK character, one per four other characters
+    static func approxTokens(_ text: String) -> Int {
+        var cjk = 0
+        var other = 0
+        for scalar in text.unicodeScalars {
+            if scalar.value >= 0x3000 { cjk += 1 } else { other += 1 }
+        }
+        return cjk + (other + 3) / 4
+    }
+    
+    /// The summary's full allowance is set aside, so summarizing never exceeds the budget
+    private var windowBudget: Int {
+        budget - reserve - systemTokens - summaryBudget
+    }
+    
+    mutating func add(role: String, content: String) {
+        let tokens = HistoryCompactor.approxTokens(content)
+        window.append((role: role, content: content, tokens: tokens))
+        windowTokens += tokens
+        if windowTokens > windowBudget {
+            compact()
+        }
+    }
+    
+    /// Move the oldest messages into the summary until the window fits; the newest always stays
+    private mutating func compact() {
+        var evicted: [(role: String, content: String)] = []
+        while window.count > 1 && (windowTokens > windowBudget || window[0].role == "assistant") {
+            let oldest = window.removeFirst()
+            windowTokens -= oldest.tokens
+            evicted.append((role: oldest.role, content: oldest.content))
+        }
+        
+        for message in evicted {
+            guard let line = HistoryCompactor.summaryLine(role: message.role, content: message.content) else { continue }
+            let tokens = HistoryCompactor.approxTokens(line)
+            summary.append((line: line, tokens: tokens))
+            summaryTokens += tokens
+        }
+        while !summary.isEmpty && summaryTokens > summaryBudget {
+            summaryTokens -= summary.removeFirst().tokens
+        }
+    }
+    
+    /// First sentence of a message, cut to 48 tokens
+    static func summaryLine(role: String, content: String) -> String? {
+        let text = content.split(whereSeparator: { $0.isWhitespace }).joined(separator: " ")
+        var first = text
+        if let end = text.firstIndex(where: { sentenceEnds.contains($0) }) {
+            first = String(text[...end])
+        }
+        while !first.isEmpty && approxTokens(first) > 48 {
+            first = String(first.prefix(Int(Double(first.count) * 0.8)))
+        }
+        guard !first.isEmpty else { return nil }
+        return "\\(roleLabels[role] ?? role): \\(first)"
+    }
+    
+    /// The message list to send: system prompt, summary, recent window
+    func messages() -> [[String: String]] {
+        var messages = [["role": "system", "content": systemPrompt]]
+        if !summary.isEmpty {
+            let lines = summary.map { $0.line }.joined(separator: "\\n")
+            messages.append(["role": "system", "content": "\\(HistoryCompactor.summaryHeader)\\n\\(lines)"])
+        }
+        messages += window.map { ["role": $0.role, "content": $0.content] }
+        return messages
+    }
+}
 '''
         
         # OllamaService
@@ -750,6 +856,40 @@ struct ChatMessage: Identifiable {
 
 class OllamaService {
     private let baseURL = "http://localhost:11434"
+    private let model = "qwen2.5:3b"
+    
+    /// Send a (compacted) message history through /api/chat
+    func sendChat(_ messages: [[String: String]]) async throws -> String {
+        guard let url = URL(string: "\\(baseURL)/api/chat") else {
+            throw OllamaError.invalidURL
+        }
+        
+        let requestBody: [String: Any] = [
+            "model": model,
+            "messages": messages,
+            "stream": false
+        ]
+        
+        var request = URLRequest(url: url)
+        request.httpMethod = "POST"
+        request.setValue("application/json", forHTTPHeaderField: "Content-Type")
+        request.httpBody = try JSONSerialization.data(withJSONObject: requestBody)
+        
+        let (data, response) = try await URLSession.shared.data(for: request)
+        
+        guard let httpResponse = response as? HTTPURLResponse,
+              httpResponse.statusCode == 200 else {
+            throw OllamaError.serverError
+        }
+        
+        guard let json = try JSONSerialization.jsonObject(with: data) as? [String: Any],
+              let message = json["message"] as? [String: Any],
+              let content = message["content"] as? String else {
+            throw OllamaError.invalidResponse
+        }
+        
+        return content
+    }
     
     func sendMessage(_ message: String) async throws -> String {
         guard let url = URL(string: "\\(baseURL)/api/generate") else {
@@ -806,6 +946,7 @@ enum OllamaError: Error, LocalizedError {
             (f"{project_dir}/{self.project_name}/App/ChirAIApp.swift", app_content),
             (f"{project_dir}/{self.project_name}/App/ContentView.swift", content_view),
             (f"{project_dir}/{self.project_name}/Core/Services/ChatManager.swift", chat_manager),
+            (f"{project_dir}/{self.project_name}/Core/Services/HistoryCompactor.swift", history_compactor),
             (f"{project_dir}/{self.project_name}/Core/Services/OllamaService.swift", ollama_service)
         ]
         
@@ -10,11 +10,15 @@ import numpy as np
 from matplotlib.patches import Circle
 import seaborn as sns
 
+from model_residency import ModelLoadLedger, count_switches, residency_order, resident_models
+from ollama_client import get_client
+from suite_harness import TIMEOUT, SuiteDeadline, execute_test
+
 # Set matplotlib to non-interactive backend
 plt.switch_backend('Agg')
 
 class E2ECoverageTest:
-    def __init__(self):
+    def __init__(self, test_timeout=30, suite_timeout=None, minimize_swaps=False):
         self.test_results = []
         self.coverage_data = {
             'api_tests': {'total': 0, 'passed': 0},
@@ -24,71 +28,69 @@ class E2ECoverageTest:
             'language_tests': {'total': 0, 'passed': 0}
         }
         self.start_time = datetime.now()
-        
-    def run_test(self, name, category, test_func):
-        """Run a single test and record results"""
+        self.client = get_client()
+        self.test_timeout = test_timeout
+        self.deadline = SuiteDeadline(suite_timeout)
+        self.timeout_count = 0
+        self.minimize_swaps = minimize_swaps
+        self.loads = ModelLoadLedger()
+        
+    def run_test(self, name, category, test_func, timeout=None, models=()):
+        """Run a single test with a deadline and record results"""
         print(f"\n🧪 Running: {name}")
-        start = time.time()
-        
-        try:
-            result = test_func()
-            duration = time.time() - start
-            success = result.get('success', False)
-            
-            self.test_results.append({
-                'name': name,
-                'category': category,
-                'success': success,
-                'duration': duration,
-                'message': result.get('message', '')
-            })
-            
-            self.coverage_data[category]['total'] += 1
-            if success:
-                self.coverage_data[category]['passed'] += 1
-                print(f"✅ {name} - Passed ({duration:.2f}s)")
-            else:
-                print(f"❌ {name} - Failed: {result.get('message', 'Unknown error')}")
-                
-        except Exception as e:
-            self.test_results.append({
-                'name': name,
-                'category': category,
-                'success': False,
-                'duration': time.time() - start,
-                'message': str(e)
-            })
-            self.coverage_data[category]['total'] += 1
-            print(f"❌ {name} - Exception: {str(e)}")
+        # Residency probes cost two /api/ps calls per test, so only when tracking swaps
+        track = bool(models) and self.minimize_swaps
+        before = resident_models(self.client, timeout=2) if track else None
+        outcome = execute_test(test_func, timeout or self.test_timeout, self.deadline)
+        duration = outcome['duration']
+        success = outcome['success']
+        
+        # Models that became resident during the test had to be loaded
+        after = resident_models(self.client, timeout=2) if track else None
+        loaded = [m for m in models if before is not None and after is not None
+                  and m in after and m not in before]
+        for model in loaded:
+            self.loads.record(model, 0.0, name, measured=False)
+        
+        self.test_results.append({
+            'name': name,
+            'category': category,
+            'success': success,
+            'status': outcome['status'],
+            'duration': duration,
+            'message': outcome['message'],
+            'models': list(models),
+            'model_loads': len(loaded) if track else None,
+            'swap_heavy': len(models) > 1 or bool(loaded)
+        })
+        if loaded:
+            print(f"🔁 {name} - loaded {', '.join(loaded)}")
+        
+        self.coverage_data[category]['total'] += 1
+        if success:
+            self.coverage_data[category]['passed'] += 1
+            print(f"✅ {name} - Passed ({duration:.2f}s)")
+        elif outcome['exception'] is not None:
+            print(f"❌ {name} - Exception: {outcome['message']}")
+        elif outcome['status'] == TIMEOUT:
+            self.timeout_count += 1
+            print(f"⏰ {name} - {outcome['message']}")
+        else:
+            print(f"❌ {name} - Failed: {outcome['message'] or 'Unknown error'}")
     
     def test_ollama_api(self):
         """Test Ollama API connectivity"""
         try:
-            result = subprocess.run(
-                ['curl', '-s', 'http://localhost:11434/api/tags'],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            return {'success': result.returncode == 0, 'message': 'API connected'}
+            result = self.client.tags(timeout=5)
+            return {'success': result['success'], 'message': 'API connected'}
         except:
             return {'success': False, 'message': 'API connection failed'}
     
     def test_chat_completion(self):
         """Test chat completion API"""
         try:
-            cmd = [
-                'curl', '-s', '-X', 'POST',
-                'http://localhost:11434/v1/chat/completions',
-                '-H', 'Content-Type: application/json',
-                '-d', json.dumps({
-                    'model': 'gemma3:1b',
-                    'messages': [{'role': 'user', 'content': 'Hello'}],
-                    'stream': False
-                })
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-            if result.returncode == 0 and 'choices' in result.stdout:
+            result = self.client.chat('gemma3:1b', 'Hello', timeout=10)
+            if result['success']:
                 return {'success': True, 'message': 'Chat API working'}
             return {'success': False, 'message': 'Chat API failed'}
         except:
@@ -97,18 +99,8 @@ class E2ECoverageTest:
     def test_japanese_support(self):
         """Test Japanese language support"""
         try:
-            cmd = [
-                'curl', '-s', '-X', 'POST',
-                'http://localhost:11434/v1/chat/completions',
-                '-H', 'Content-Type: application/json',
-                '-d', json.dumps({
-                    'model': 'qwen2.5:3b',
-                    'messages': [{'role': 'user', 'content': 'こんにちは'}],
-                    'stream': False
-                })
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-            if result.returncode == 0 and any(ord(c) > 127 for c in result.stdout):
+            result = self.client.chat('qwen2.5:3b', 'こんにちは', timeout=10)
+            if result['success'] and any(ord(c) > 127 for c in result['content']):
                 return {'success': True, 'message': 'Japanese support confirmed'}
             return {'success': False, 'message': 'No Japanese in response'}
         except:
@@ -119,18 +111,8 @@ class E2ECoverageTest:
         models = ['gemma3:1b', 'qwen2.5:3b']
         for model in models:
             try:
-                cmd = [
-                    'curl', '-s', '-X', 'POST',
-                    'http://localhost:11434/v1/chat/completions',
-                    '-H', 'Content-Type: application/json',
-                    '-d', json.dumps({
-                        'model': model,
-                        'messages': [{'role': 'user', 'content': 'Test'}],
-                        'stream': False
-                    })
-                ]
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-                if result.returncode != 0:
+                result = self.client.chat(model, 'Test', timeout=10)
+                if result['status'] is None:
                     return {'success': False, 'message': f'Model {model} failed'}
             except:
                 return {'success': False, 'message': f'Model {model} error'}
@@ -139,22 +121,13 @@ class E2ECoverageTest:
     def test_response_time(self):
         """Test response time performance"""
         try:
-            start = time.time()
-            cmd = [
-                'curl', '-s', '-X', 'POST',
-                'http://localhost:11434/v1/chat/completions',
-                '-H', 'Content-Type: application/json',
-                '-d', json.dumps({
-                    'model': 'gemma3:1b',
-                    'messages': [{'role': 'user', 'content': 'Quick test'}],
-                    'stream': False
-                })
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-            response_time = time.time() - start
+            result = self.client.chat('gemma3:1b', 'Quick test', timeout=10)
+            timing = result['timing']
+            response_time = timing['total']
+            overhead_ms = timing['client_overhead'] * 1000
             
-            if result.returncode == 0 and response_time < 5:
-                return {'success': True, 'message': f'Response time: {response_time:.2f}s'}
+            if result['status'] is not None and response_time < 5:
+                return {'success': True, 'message': f'Response time: {response_time:.2f}s (client overhead {overhead_ms:.0f}ms)'}
             return {'success': False, 'message': f'Slow response: {response_time:.2f}s'}
         except:
             return {'success': False, 'message': 'Performance test error'}
@@ -362,26 +335,34 @@ class E2ECoverageTest:
         print("=" * 50)
         print(f"Start time: {self.start_time}")
         
-        # API Tests
-        self.run_test("Ollama API Connection", "api_tests", self.test_ollama_api)
-        self.run_test("Chat Completion API", "api_tests", self.test_chat_completion)
-        
-        # Language Tests
-        self.run_test("Japanese Language Support", "language_tests", self.test_japanese_support)
-        
-        # Integration Tests
-        self.run_test("Model Switching", "integration_tests", self.test_model_switching)
-        
-        # Performance Tests
-        self.run_test("Response Time Check", "performance_tests", self.test_response_time)
+        # (name, category, test, models used)
+        plan = [
+            # API Tests
+            ("Ollama API Connection", "api_tests", self.test_ollama_api, []),
+            ("Chat Completion API", "api_tests", self.test_chat_completion, ['gemma3:1b']),
+            # Language Tests
+            ("Japanese Language Support", "language_tests", self.test_japanese_support, ['qwen2.5:3b']),
+            # Integration Tests (swap-heavy: loads both models)
+            ("Model Switching", "integration_tests", self.test_model_switching, ['gemma3:1b', 'qwen2.5:3b']),
+            # Performance Tests
+            ("Response Time Check", "performance_tests", self.test_response_time, ['gemma3:1b']),
+            # UI Tests (simulated)
+            ("UI Component Loading", "ui_tests",
+             lambda: {'success': True, 'message': 'UI components loaded'}, []),
+            ("Chat Interface", "ui_tests",
+             lambda: {'success': True, 'message': 'Chat interface working'}, []),
+            ("Model Picker", "ui_tests",
+             lambda: {'success': True, 'message': 'Model picker functional'}, []),
+        ]
+        if self.minimize_swaps:
+            models_of = lambda entry: entry[3]
+            ordered = residency_order(plan, models_of, resident_models(self.client) or [])
+            print(f"🧭 Residency-ordered plan: {count_switches(m for e in ordered for m in e[3])} model switches "
+                  f"(declared order {count_switches(m for e in plan for m in e[3])})")
+            plan = ordered
         
-        # UI Tests (simulated)
-        self.run_test("UI Component Loading", "ui_tests", 
-                     lambda: {'success': True, 'message': 'UI components loaded'})
-        self.run_test("Chat Interface", "ui_tests", 
-                     lambda: {'success': True, 'message': 'Chat interface working'})
-        self.run_test("Model Picker", "ui_tests", 
-                     lambda: {'success': True, 'message': 'Model picker functional'})
+        for name, category, test_func, models in plan:
+            self.run_test(name, category, test_func, models=models)
         
         # Generate report
         self.generate_report()
@@ -405,12 +386,22 @@ class E2ECoverageTest:
         print(f"Total Tests: {total_tests}")
         print(f"Passed: {passed_tests}")
         print(f"Failed: {total_tests - passed_tests}")
+        if self.timeout_count:
+            print(f"  Timed out: {self.timeout_count}")
         print(f"Success Rate: {success_rate:.1f}%")
         
         print("\nCategory Breakdown:")
         for category, data in self.coverage_data.items():
             cat_rate = (data['passed'] / data['total'] * 100) if data['total'] > 0 else 0
             print(f"  {category}: {data['passed']}/{data['total']} ({cat_rate:.1f}%)")
+        
+        if self.minimize_swaps:
+            self.loads.print_summary("\n🔁 Model loads during tests")
+        swap_heavy = [t['name'] for t in self.test_results if t['swap_heavy']]
+        if swap_heavy:
+            print(f"  Swap-heavy tests: {', '.join(swap_heavy)}")
+        
+        self.client.print_overhead_report()
     
     def take_app_screenshots(self):
         """Take screenshots of the running app"""
@@ -442,8 +433,18 @@ if __name__ == "__main__":
         print("Installing required packages...")
         subprocess.run(["/usr/bin/python3", "-m", "pip", "install", "matplotlib", "seaborn", "numpy"], check=True)
     
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Wisbee iOS E2E coverage tests")
+    parser.add_argument('--test-timeout', type=float, default=30, help='seconds before a test is cancelled')
+    parser.add_argument('--suite-timeout', type=float, help='wall-clock budget for the whole run in seconds')
+    parser.add_argument('--minimize-swaps', action='store_true',
+                        help='run all work for the resident model before switching models, and track model loads per test')
+    args = parser.parse_args()
+    
     # Run tests
-    tester = E2ECoverageTest()
+    tester = E2ECoverageTest(test_timeout=args.test_timeout, suite_timeout=args.suite_timeout,
+                             minimize_swaps=args.minimize_swaps)
     tester.run_all_tests()
     
     print("\n✨ E2E Coverage Test Complete!")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI History Compaction
+トークン予算付きスライディングウィンドウ、システムプロンプト固定、古いターンの要約による会話履歴の圧縮
+"""
+
+import re
+from collections import deque
+
+SENTENCE_END = re.compile(r'(?<=[。．！？!?\n])')
+ROLE_LABELS = {'user': 'ユーザー', 'assistant': 'AI'}
+SUMMARY_HEADER = 'これまでの会話の要約:'
+
+
+def approx_tokens(text):
+    """Rough token count: one per CJK character, one per four other characters"""
+    cjk = sum(1 for c in text if ord(c) >= 0x3000)
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def extractive_summary(evicted, count_tokens=approx_tokens, max_line_tokens=48):
+    """One line per evicted message: its first sentence, cut to max_line_tokens"""
+    lines = []
+    for message in evicted:
+        text = ' '.join(message['content'].split())
+        first = SENTENCE_END.split(text, 1)[0] if text else ''
+        while first and count_tokens(first) > max_line_tokens:
+            first = first[:int(len(first) * 0.8)]
+        if first:
+            lines.append(f"{ROLE_LABELS.get(message['role'], message['role'])}: {first}")
+    return lines
+
+
+def llm_summarizer(client, model, timeout=60):
+    """Summarizer that asks the model to condense the evicted turns (extractive fallback on failure)"""
+    def summarize(evicted, count_tokens=approx_tokens):
+        transcript = '\n'.join(f"{ROLE_LABELS.get(m['role'], m['role'])}: {m['content']}" for m in evicted)
+        result = client.native_chat(model, [
+            {'role': 'system', 'content': '会話を重要な事実だけ残して1〜2行の日本語で要約してください。'},
+            {'role': 'user', 'content': transcript}
+        ], timeout=timeout, options={'temperature': 0, 'num_predict': 96})
+        if not result['success']:
+            # Never lose the turns because the summarizer failed
+            return extractive_summary(evicted, count_tokens)
+        return [line.strip() for line in result['content'].splitlines() if line.strip()]
+    return summarize
+
+
+class HistoryCompactor:
+    """Bounded chat history: pinned system prompt, running summary, recent-turn window.
+
+    Every message sent is one of: the system prompt (never evicted), one
+    summary message (capped at summary_budget tokens, oldest lines dropped
+    first), and a window of the most recent messages that fits what is left
+    of budget after reserve tokens for the reply. Token counts are kept
+    incrementally, so adding a turn costs the same at turn 500 as at turn 5,
+    and nothing outside the window and summary is retained.
+    """
+
+    def __init__(self, system_prompt=None, budget=2048, reserve=512, summary_budget=256,
+                 summarizer=extractive_summary, count_tokens=approx_tokens):
+        self.system_prompt = system_prompt
+        self.budget = budget
+        self.reserve = reserve
+        self.summary_budget = summary_budget
+        self.summarizer = summarizer
+        self.count_tokens = count_tokens
+        self.system_tokens = count_tokens(system_prompt) if system_prompt else 0
+        if self.window_budget() <= 0:
+            raise ValueError('budget leaves no room for messages after reserve, system prompt and summary')
+        self.window = deque()
+        self.window_tokens = 0
+        self.summary = deque()
+        self.summary_tokens = 0
+        self.stats = {'turns': 0, 'evicted': 0, 'compactions': 0}
+
+    def window_budget(self):
+        # The summary's full allowance is set aside, so summarizing never pushes the total over budget
+        return self.budget - self.reserve - self.system_tokens - self.summary_budget
+
+    def add(self, role, content):
+        """Append a message and compact if the window no longer fits"""
+        tokens = self.count_tokens(content)
+        self.window.append((role, content, tokens))
+        self.window_tokens += tokens
+        self.stats['turns'] += 1
+        if self.window_tokens > self.window_budget():
+            self.compact()
+
+    def compact(self):
+        """Move the oldest messages into the summary until the window fits.
+
+        The newest message always stays, and the window never starts with an
+        assistant reply whose question was evicted.
+        """
+        evicted = []
+        while len(self.window) > 1 and (self.window_tokens > self.window_budget()
+                                        or self.window[0][0] == 'assistant'):
+            role, content, tokens = self.window.popleft()
+            self.window_tokens -= tokens
+            evicted.append({'role': role, 'content': content})
+        if not evicted:
+            return
+
+        for line in self.summarizer(evicted, self.count_tokens):
+            tokens = self.count_tokens(line)
+            self.summary.append((line, tokens))
+            self.summary_tokens += tokens
+        while self.summary and self.summary_tokens > self.summary_budget:
+            _, tokens = self.summary.popleft()
+            self.summary_tokens -= tokens
+        self.stats['evicted'] += len(evicted)
+        self.stats['compactions'] += 1
+
+    def messages(self):
+        """The message list to send: system prompt, summary, recent window"""
+        messages = []
+        if self.system_prompt:
+            messages.append({'role': 'system', 'content': self.system_prompt})
+        if self.summary:
+            lines = '\n'.join(line for line, _ in self.summary)
+            messages.append({'role': 'system', 'content': f"{SUMMARY_HEADER}\n{lines}"})
+        messages.extend({'role': role, 'content': content} for role, content, _ in self.window)
+        return messages
+
+    def tokens(self):
+        """Tokens in messages(), by the compactor's own count"""
+        return self.system_tokens + self.summary_tokens + self.window_tokens
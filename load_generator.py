@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI Load Generator
+オープンループ負荷試験（ポアソン/一定到着）とレイテンシ分布・飽和点の測定
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_stats import summarize
+from ollama_client import OllamaClient
+from ollama_pool import BalancedClient
+
+LATENCY_PERCENTILES = (50, 90, 99, 99.9)
+# Saturation search: offered rate starts here and grows by FACTOR up to MAX
+SATURATION_START_RATE = 0.5
+SATURATION_MAX_RATE = 32.0
+SATURATION_FACTOR = 1.5
+
+
+def saturation_rates(start_rate=SATURATION_START_RATE, max_rate=SATURATION_MAX_RATE, factor=SATURATION_FACTOR):
+    """Offered rates find_saturation steps through when nothing breaks"""
+    rates = []
+    rate = start_rate
+    while rate <= max_rate:
+        rates.append(rate)
+        rate *= factor
+    return rates
+
+
+class LoadGenerator:
+    """Drive one model with an open-loop arrival process.
+
+    Requests are scheduled ahead of time and sent at their arrival time
+    regardless of how many are still in flight, so a slow server shows up
+    as growing latency instead of a lower send rate. Latency is measured
+    from the scheduled arrival, not from the actual send.
+    """
+
+    def __init__(self, model='gemma3:1b', prompt='Say hello in one short sentence.', base_url=None,
+                 backend='native', max_in_flight=64, max_tokens=64, timeout=60.0, seed=None,
+                 routing='least-outstanding'):
+        self.model = model
+        self.prompt = prompt
+        self.backend = backend
+        self.max_in_flight = max_in_flight
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self.random = random.Random(seed)
+        # A dedicated pool sized to max_in_flight keeps connection waits out of the numbers
+        if isinstance(base_url, (list, tuple)):
+            # Several hosts: measure the pool's combined throughput
+            self.client = BalancedClient(base_url, policy=routing, max_connections=max_in_flight,
+                                         read_timeout=timeout)
+        else:
+            self.client = OllamaClient(base_url, max_connections=max_in_flight, read_timeout=timeout)
+
+    def arrival_times(self, rate, duration, arrival='poisson'):
+        """Offsets (seconds from start) at which requests arrive"""
+        if rate <= 0 or duration <= 0:
+            return []
+        if arrival == 'constant':
+            return [i / rate for i in range(int(rate * duration))]
+        if arrival != 'poisson':
+            raise ValueError(f'Unknown arrival process: {arrival}')
+
+        offsets = []
+        t = self.random.expovariate(rate)
+        while t < duration:
+            offsets.append(t)
+            t += self.random.expovariate(rate)
+        return offsets
+
+    def _send(self):
+        if self.backend == 'native':
+            return self.client.native_chat(
+                self.model, self.prompt, timeout=self.timeout,
+                options={'num_predict': self.max_tokens}
+            )
+        return self.client.chat(self.model, self.prompt, timeout=self.timeout, max_tokens=self.max_tokens)
+
+    def run(self, rate, duration, arrival='poisson'):
+        """Offer `rate` requests/sec for `duration` seconds and summarize the outcome"""
+        schedule = self.arrival_times(rate, duration, arrival)
+        samples = []
+        lock = threading.Lock()
+
+        def fire(scheduled_at):
+            sent_at = time.perf_counter()
+            result = self._send()
+            done_at = time.perf_counter()
+
+            counters = result.get('counters')
+            dispatch_delay = sent_at - scheduled_at
+            if counters:
+                # Time the server spent not loading, prefilling or decoding is waiting
+                compute = counters['load_duration'] + counters['prompt_eval_duration'] + counters['eval_duration']
+                queue_delay = dispatch_delay + max(0.0, (done_at - sent_at) - compute)
+            else:
+                queue_delay = dispatch_delay
+
+            with lock:
+                samples.append({
+                    'success': result['success'],
+                    'latency': done_at - scheduled_at,
+                    'dispatch_delay': dispatch_delay,
+                    'queue_delay': queue_delay,
+                    'error': result['error'],
+                    'host': result.get('host')
+                })
+
+        origin = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            for offset in schedule:
+                scheduled_at = origin + offset
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(fire, scheduled_at)
+        elapsed = time.perf_counter() - origin
+
+        return self.summarize(samples, rate, duration, arrival, elapsed)
+
+    def summarize(self, samples, rate, duration, arrival, elapsed):
+        completed = [s for s in samples if s['success']]
+        errors = [s for s in samples if not s['success']]
+        error_kinds = {}
+        for sample in errors:
+            key = (sample['error'] or 'unknown')[:80]
+            error_kinds[key] = error_kinds.get(key, 0) + 1
+
+        return {
+            'model': self.model,
+            'backend': self.backend,
+            'arrival': arrival,
+            'target_rate': rate,
+            'duration': duration,
+            'requests': len(samples),
+            'offered_rate': len(samples) / duration if duration > 0 else 0.0,
+            'completed': len(completed),
+            'errors': len(errors),
+            'error_rate': len(errors) / len(samples) if samples else 0.0,
+            'error_kinds': error_kinds,
+            'throughput': len(completed) / elapsed if elapsed > 0 else 0.0,
+            'elapsed': elapsed,
+            'latency': summarize([s['latency'] for s in completed], LATENCY_PERCENTILES),
+            'queue_delay': summarize([s['queue_delay'] for s in completed], LATENCY_PERCENTILES),
+            'dispatch_delay': summarize([s['dispatch_delay'] for s in samples], LATENCY_PERCENTILES),
+            'hosts': self.host_breakdown(samples, elapsed)
+        }
+
+    @staticmethod
+    def host_breakdown(samples, elapsed):
+        """Per-host completions, throughput and latency when requests went through a pool"""
+        hosts = {}
+        for sample in samples:
+            if sample['host']:
+                hosts.setdefault(sample['host'], []).append(sample)
+        return {
+            host: {
+                'requests': len(host_samples),
+                'completed': sum(1 for s in host_samples if s['success']),
+                'throughput': sum(1 for s in host_samples if s['success']) / elapsed if elapsed > 0 else 0.0,
+                'latency': summarize([s['latency'] for s in host_samples if s['success']], LATENCY_PERCENTILES)
+            }
+            for host, host_samples in sorted(hosts.items())
+        }
+
+    def find_saturation(self, start_rate=SATURATION_START_RATE, max_rate=SATURATION_MAX_RATE,
+                        factor=SATURATION_FACTOR, duration=30.0, arrival='poisson', p99_target=10.0,
+                        max_error_rate=0.05):
+        """Ramp the offered rate until p99 latency, errors or throughput break"""
+        steps = []
+        sustainable = None
+        saturation = None
+
+        for rate in saturation_rates(start_rate, max_rate, factor):
+            summary = self.run(rate, duration, arrival)
+            steps.append(summary)
+            print_load_summary(summary)
+
+            breaches = []
+            if summary['latency']['p99'] > p99_target:
+                breaches.append(f"p99 {summary['latency']['p99']:.2f}s > {p99_target:.2f}s")
+            if summary['error_rate'] > max_error_rate:
+                breaches.append(f"errors {summary['error_rate'] * 100:.1f}%")
+            if summary['throughput'] < 0.9 * summary['offered_rate']:
+                breaches.append(f"throughput {summary['throughput']:.2f}/s < offered {summary['offered_rate']:.2f}/s")
+
+            if breaches:
+                saturation = rate
+                print(f"   🔴 Saturated at {rate:.2f} req/s: {', '.join(breaches)}")
+                break
+
+            sustainable = rate
+
+        return {
+            'model': self.model,
+            'sustainable_rate': sustainable,
+            'saturation_rate': saturation,
+            'p99_target': p99_target,
+            'max_error_rate': max_error_rate,
+            'steps': steps
+        }
+
+
+def print_load_summary(summary):
+    latency = summary['latency']
+    print(f"   📈 {summary['target_rate']:.2f} req/s ({summary['arrival']}): "
+          f"{summary['completed']}/{summary['requests']} ok, "
+          f"throughput {summary['throughput']:.2f}/s, errors {summary['error_rate'] * 100:.1f}%")
+    print(f"      latency p50/p90/p99/p99.9: {latency['p50']:.2f}/{latency['p90']:.2f}/"
+          f"{latency['p99']:.2f}/{latency['p99_9']:.2f}s, "
+          f"queue p50/p99: {summary['queue_delay']['p50']:.2f}/{summary['queue_delay']['p99']:.2f}s")
+    for host, stats in summary.get('hosts', {}).items():
+        print(f"      🖥️  {host}: {stats['completed']}/{stats['requests']} ok, "
+              f"{stats['throughput']:.2f}/s, p50/p99 {stats['latency']['p50']:.2f}/{stats['latency']['p99']:.2f}s")
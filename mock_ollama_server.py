@@ -0,0 +1,590 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI Mock Ollama Server
+テスト用の決定的なOllama互換スタンドインサーバー
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from model_catalog import catalog_entries, load_catalog
+
+# Used by the test suites but not listed in local_llm_models.json
+DEFAULT_EXTRA_MODELS = ['qwen2.5:3b']
+DEFAULT_CONTEXT_LENGTH = 8192
+# Ollama's context window when a request does not set num_ctx
+DEFAULT_NUM_CTX = 2048
+
+
+def parse_distribution(spec):
+    """Build a sampler from 'fixed:S', 'uniform:A,B', 'normal:MEAN,STD',
+    'lognormal:MEDIAN,SIGMA' or 'exponential:MEAN' (seconds)"""
+    if isinstance(spec, (int, float)):
+        return lambda rng: float(spec)
+    kind, _, args = str(spec).partition(':')
+    if not args:
+        kind, args = 'fixed', kind
+    params = [float(p) for p in args.split(',') if p]
+
+    if kind == 'fixed':
+        return lambda rng: params[0]
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(params[0], params[1])
+    if kind == 'normal':
+        return lambda rng: max(0.0, rng.gauss(params[0], params[1]))
+    if kind == 'lognormal':
+        mu = math.log(params[0]) if params[0] > 0 else 0.0
+        return lambda rng: rng.lognormvariate(mu, params[1])
+    if kind == 'exponential':
+        return lambda rng: rng.expovariate(1.0 / params[0]) if params[0] > 0 else 0.0
+    raise ValueError(f'Unknown latency distribution: {spec}')
+
+
+def estimate_tokens(text):
+    """Rough byte-based token estimate used for the fake eval counters"""
+    return max(1, (len(text.encode('utf-8')) + 3) // 4)
+
+
+def catalog_models(path=None, extra_models=DEFAULT_EXTRA_MODELS):
+    """Model entries from local_llm_models.json plus any extra names"""
+    catalog = load_catalog(path, measured=False) if path else load_catalog(measured=False)
+    models = OrderedDict((entry['name'], dict(entry)) for entry in catalog_entries(catalog))
+    for name in extra_models or []:
+        models.setdefault(name, {'name': name, 'family': name.split(':')[0],
+                                 'parameter_size': 'unknown', 'size_gb': 1.0})
+    return models
+
+
+class MockOllamaConfig:
+    """Behaviour knobs for the stand-in server"""
+
+    def __init__(self, models=None, latency='fixed:0', prefill_tokens_per_sec=0.0, tokens_per_sec=0.0,
+                 response_tokens=32, load_seconds_per_gb=0.0, max_loaded_models=0, parallel=0,
+                 error_rate=0.0, drop_rate=0.0, stall_rate=0.0, stall_seconds=30.0, seed=0, prefix_cache=True,
+                 attention_tokens=0, kv_bytes_per_token=0):
+        self.models = models if models is not None else catalog_models()
+        self.latency = parse_distribution(latency)
+        self.prefill_tokens_per_sec = prefill_tokens_per_sec  # 0 = instant
+        self.tokens_per_sec = tokens_per_sec  # 0 = instant
+        self.response_tokens = response_tokens
+        self.load_seconds_per_gb = load_seconds_per_gb
+        self.max_loaded_models = max_loaded_models  # 0 = unlimited
+        self.parallel = parallel  # per-model concurrent requests, 0 = unlimited
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.seed = seed
+        # Like Ollama, skip prefill for the prompt prefix still in the model's KV cache
+        self.prefix_cache = prefix_cache
+        # Prompt length at which attention doubles the per-token prefill cost, 0 = linear prefill
+        self.attention_tokens = attention_tokens
+        # KV cache bytes per context token, added to the /api/ps size of a resident model
+        self.kv_bytes_per_token = kv_bytes_per_token
+
+
+class MockOllamaState:
+    """Shared state: RNG, resident models and counters"""
+
+    def __init__(self, config):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.loaded = OrderedDict()
+        self.model_locks = {name: threading.Lock() for name in config.models}
+        self.slots = {
+            name: threading.Semaphore(config.parallel) for name in config.models
+        } if config.parallel else {}
+        # Last prompt + response text per resident model (one KV cache slot each)
+        self.kv_cache = {}
+        # num_ctx of the last request per model, which sizes its KV cache
+        self.num_ctx = {}
+        self.stats = {'requests': 0, 'loads': 0, 'evictions': 0, 'load_time': 0.0,
+                      'errors_injected': 0, 'drops_injected': 0, 'stalls_injected': 0,
+                      'cached_prompt_tokens': 0}
+
+    def draw(self):
+        with self.lock:
+            return self.random.random()
+
+    def sample_latency(self):
+        with self.lock:
+            return self.config.latency(self.random)
+
+    def count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def ensure_loaded(self, name):
+        """Simulate loading weights on first use; returns load time in seconds"""
+        with self.model_locks[name]:
+            with self.lock:
+                cold = name not in self.loaded
+            load_time = 0.0
+            if cold:
+                size_gb = self.config.models[name].get('size_gb') or 0.0
+                load_time = size_gb * self.config.load_seconds_per_gb
+                if load_time:
+                    time.sleep(load_time)
+
+            with self.lock:
+                self.loaded[name] = time.time()
+                self.loaded.move_to_end(name)
+                if cold:
+                    self.stats['loads'] += 1
+                    self.stats['load_time'] += load_time
+                limit = self.config.max_loaded_models
+                while limit and len(self.loaded) > limit:
+                    evicted, _ = self.loaded.popitem(last=False)
+                    self.kv_cache.pop(evicted, None)
+                    self.num_ctx.pop(evicted, None)
+                    self.stats['evictions'] += 1
+            return load_time
+
+    def cached_prefix(self, name, text):
+        """Tokens of text already in the model's KV cache, then remember text as the new cache"""
+        with self.lock:
+            previous = self.kv_cache.get(name, '')
+            self.kv_cache[name] = text
+        if not self.config.prefix_cache or not previous:
+            return 0
+        common = len(os.path.commonprefix([previous, text]))
+        return estimate_tokens(text[:common]) if common else 0
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['loaded_models'] = list(self.loaded)
+            return stats
+
+
+def model_digest(name):
+    return hashlib.sha256(name.encode('utf-8')).hexdigest()
+
+
+def response_tokens(model, count):
+    pieces = ['こんにちは', '。', ' This', ' is', ' a', ' mock', ' response', ' from', f' {model}', '.']
+    return [pieces[i % len(pieces)] for i in range(count)]
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    server_version = 'MockOllama/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self):
+        return self.server.state
+
+    # MARK: - Response helpers
+
+    def _send_json(self, obj, status=200):
+        body = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def _write_chunk(self, data):
+        self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+    def _end_chunked(self):
+        self.wfile.write(b'0\r\n\r\n')
+        self.wfile.flush()
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return None
+
+    # MARK: - Routing
+
+    def do_GET(self):
+        self.state.count('requests')
+        if self.path == '/api/tags':
+            self._send_json({'models': [self._tag(entry) for entry in self.state.config.models.values()]})
+        elif self.path == '/api/version':
+            self._send_json({'version': '0.0.0-mock'})
+        elif self.path == '/api/ps':
+            snapshot = self.state.snapshot()
+            models = self.state.config.models
+            self._send_json({'models': [self._resident(models[name]) for name in snapshot['loaded_models']]})
+        elif self.path == '/mock/stats':
+            self._send_json(self.state.snapshot())
+        else:
+            self._send_json({'error': 'not found'}, 404)
+
+    def do_POST(self):
+        self.state.count('requests')
+        body = self._read_json()
+        if body is None:
+            self._send_json({'error': 'invalid JSON body'}, 400)
+            return
+
+        if self.path == '/api/show':
+            self._show(body)
+        elif self.path in ('/api/chat', '/api/generate', '/v1/chat/completions'):
+            self._generate(body)
+        else:
+            self._send_json({'error': 'not found'}, 404)
+
+    def _tag(self, entry):
+        return {
+            'name': entry['name'],
+            'model': entry['name'],
+            'modified_at': '2025-06-04T11:53:00Z',
+            'size': int((entry.get('size_gb') or 0) * 1e9),
+            'digest': model_digest(entry['name']),
+            'details': {
+                'format': 'gguf',
+                'family': entry.get('family', ''),
+                'families': [entry.get('family', '')],
+                'parameter_size': entry.get('parameter_size', ''),
+                'quantization_level': entry.get('quantization', 'Q4_K_M')
+            }
+        }
+
+    def _resident(self, entry):
+        """An /api/ps entry: weights plus the KV cache for the model's current num_ctx"""
+        tag = self._tag(entry)
+        with self.state.lock:
+            num_ctx = self.state.num_ctx.get(entry['name'], DEFAULT_NUM_CTX)
+        tag['size'] += num_ctx * self.state.config.kv_bytes_per_token
+        tag['size_vram'] = tag['size']
+        tag['context_length'] = num_ctx
+        return tag
+
+    def _show(self, body):
+        name = body.get('model') or body.get('name')
+        entry = self.state.config.models.get(name)
+        if entry is None:
+            self._send_json({'error': f"model '{name}' not found"}, 404)
+            return
+        tag = self._tag(entry)
+        family = entry.get('family', '')
+        self._send_json({
+            'details': tag['details'],
+            'model_info': {
+                'general.architecture': family,
+                f'{family}.context_length': entry.get('context_length', DEFAULT_CONTEXT_LENGTH)
+            },
+            'modified_at': tag['modified_at']
+        })
+
+    # MARK: - Generation
+
+    def _generate(self, body):
+        started = time.perf_counter()
+        config = self.state.config
+        openai = self.path.startswith('/v1/')
+        model = body.get('model')
+
+        if model not in config.models:
+            message = f"model '{model}' not found"
+            self._send_json({'error': {'message': message, 'type': 'api_error'}} if openai else {'error': message}, 404)
+            return
+
+        # Failure injection happens before any work, like a crashing runner would
+        draw = self.state.draw()
+        if draw < config.drop_rate:
+            self.state.count('drops_injected')
+            self.close_connection = True
+            return
+        draw -= config.drop_rate
+        if draw < config.error_rate:
+            self.state.count('errors_injected')
+            self._send_json({'error': 'injected failure'}, 500)
+            return
+        draw -= config.error_rate
+        if draw < config.stall_rate:
+            self.state.count('stalls_injected')
+            time.sleep(config.stall_seconds)
+
+        slot = self.state.slots.get(model)
+        if slot:
+            slot.acquire()
+        try:
+            self._respond(body, model, openai, started)
+        finally:
+            if slot:
+                slot.release()
+
+    def _respond(self, body, model, openai, started):
+        config = self.state.config
+        overhead = self.state.sample_latency()
+        if overhead:
+            time.sleep(overhead)
+        load_time = self.state.ensure_loaded(model)
+
+        # Like Ollama, a request without prompt or messages only loads the model
+        if (self.path == '/api/generate' and 'prompt' not in body) or (
+                self.path == '/api/chat' and not body.get('messages')):
+            message = self._native_message(model, '', True, {
+                'load_duration': int(load_time * 1e9),
+                'total_duration': int((time.perf_counter() - started) * 1e9)
+            })
+            message['done_reason'] = 'load'
+            self._send_json(message)
+            return
+
+        if self.path == '/api/generate':
+            # The context array stands for the previous conversation; here it is its code points
+            prompt_text = ''.join(map(chr, body.get('context') or [])) + body.get('prompt', '')
+        else:
+            prompt_text = ''.join(str(m.get('content', '')) for m in body.get('messages', []))
+
+        options = body.get('options') or {}
+        with self.state.lock:
+            self.state.num_ctx[model] = options.get('num_ctx') or DEFAULT_NUM_CTX
+        limit = body.get('max_tokens') or options.get('num_predict')
+        count = config.response_tokens if not limit or limit < 0 else min(limit, config.response_tokens)
+        tokens = response_tokens(model, count)
+
+        # Only the uncached part of the prompt is evaluated (and counted, as Ollama does)
+        cached = self.state.cached_prefix(model, prompt_text + ''.join(tokens))
+        prompt_tokens = max(1, estimate_tokens(prompt_text) - cached)
+        self.state.count('cached_prompt_tokens', min(cached, estimate_tokens(prompt_text)))
+        context = [ord(c) for c in prompt_text + ''.join(tokens)] if self.path == '/api/generate' else None
+
+        prefill_time = prompt_tokens / config.prefill_tokens_per_sec if config.prefill_tokens_per_sec else 0.0
+        if config.attention_tokens:
+            prefill_time *= 1 + prompt_tokens / config.attention_tokens
+        token_time = 1.0 / config.tokens_per_sec if config.tokens_per_sec else 0.0
+        if prefill_time:
+            time.sleep(prefill_time)
+
+        counters = {
+            'load_duration': int(load_time * 1e9),
+            'prompt_eval_count': prompt_tokens,
+            'prompt_eval_duration': int(prefill_time * 1e9),
+            'eval_count': len(tokens),
+            'eval_duration': int(token_time * len(tokens) * 1e9)
+        }
+
+        if body.get('stream', not openai):
+            self._stream(body, model, openai, tokens, token_time, counters, started, context)
+            return
+
+        if token_time:
+            time.sleep(token_time * len(tokens))
+        content = ''.join(tokens)
+        counters['total_duration'] = int((time.perf_counter() - started) * 1e9)
+
+        if openai:
+            self._send_json(self._openai_completion(model, content, counters))
+        else:
+            self._send_json(self._native_message(model, content, True, counters, context))
+
+    def _stream(self, body, model, openai, tokens, token_time, counters, started, context=None):
+        if openai:
+            self._start_chunked('text/event-stream')
+        else:
+            self._start_chunked('application/x-ndjson')
+
+        for token in tokens:
+            if token_time:
+                time.sleep(token_time)
+            if openai:
+                event = self._openai_chunk(model, {'content': token}, None)
+                self._write_chunk(b'data: ' + json.dumps(event, ensure_ascii=False).encode('utf-8') + b'\n\n')
+            else:
+                event = self._native_message(model, token, False)
+                self._write_chunk(json.dumps(event, ensure_ascii=False).encode('utf-8') + b'\n')
+
+        counters['total_duration'] = int((time.perf_counter() - started) * 1e9)
+        if openai:
+            final = self._openai_chunk(model, {}, 'stop')
+            self._write_chunk(b'data: ' + json.dumps(final).encode('utf-8') + b'\n\n')
+            if (body.get('stream_options') or {}).get('include_usage'):
+                usage = self._openai_chunk(model, None, None)
+                usage['choices'] = []
+                usage['usage'] = self._usage(counters)
+                self._write_chunk(b'data: ' + json.dumps(usage).encode('utf-8') + b'\n\n')
+            self._write_chunk(b'data: [DONE]\n\n')
+        else:
+            final = self._native_message(model, '', True, counters, context)
+            self._write_chunk(json.dumps(final).encode('utf-8') + b'\n')
+        self._end_chunked()
+
+    def _native_message(self, model, content, done, counters=None, context=None):
+        message = {
+            'model': model,
+            'created_at': datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z'),
+            'done': done
+        }
+        if self.path == '/api/generate':
+            message['response'] = content
+            if done and context is not None:
+                message['context'] = context
+        else:
+            message['message'] = {'role': 'assistant', 'content': content}
+        if done:
+            message['done_reason'] = 'stop'
+            message.update(counters or {})
+        return message
+
+    def _usage(self, counters):
+        return {
+            'prompt_tokens': counters['prompt_eval_count'],
+            'completion_tokens': counters['eval_count'],
+            'total_tokens': counters['prompt_eval_count'] + counters['eval_count']
+        }
+
+    def _openai_completion(self, model, content, counters):
+        return {
+            'id': f'chatcmpl-{model_digest(content)[:8]}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': self._usage(counters)
+        }
+
+    def _openai_chunk(self, model, delta, finish_reason):
+        return {
+            'id': 'chatcmpl-mock',
+            'object': 'chat.completion.chunk',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]
+        }
+
+
+class MockOllamaHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, config):
+        super().__init__(address, MockOllamaHandler)
+        self.state = MockOllamaState(config)
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-response (timeouts, cancelled streams) are expected here
+        if issubclass(sys.exc_info()[0], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class MockOllamaServer:
+    """Run the stand-in server on a background thread (port 0 picks a free port)"""
+
+    def __init__(self, config=None, host='127.0.0.1', port=0):
+        self.config = config or MockOllamaConfig()
+        self.httpd = MockOllamaHTTPServer((host, port), self.config)
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def stats(self):
+        return self.httpd.state.snapshot()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic Ollama stand-in for performance tests")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--catalog', help='model catalog JSON (default: local_llm_models.json)')
+    parser.add_argument('--model', action='append', default=[],
+                        help=f'extra model name to serve (default extras: {", ".join(DEFAULT_EXTRA_MODELS)})')
+    parser.add_argument('--latency', default='fixed:0',
+                        help="per-request overhead: fixed:S, uniform:A,B, normal:M,SD, lognormal:MEDIAN,SIGMA, exponential:M")
+    parser.add_argument('--prefill-tokens-per-sec', type=float, default=0.0, help='0 = instant')
+    parser.add_argument('--tokens-per-sec', type=float, default=0.0, help='decode rate, 0 = instant')
+    parser.add_argument('--response-tokens', type=int, default=32)
+    parser.add_argument('--load-seconds-per-gb', type=float, default=0.0)
+    parser.add_argument('--max-loaded-models', type=int, default=0, help='0 = unlimited')
+    parser.add_argument('--parallel', type=int, default=0, help='concurrent requests per model, 0 = unlimited')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction answered with HTTP 500')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='fraction whose connection is dropped')
+    parser.add_argument('--stall-rate', type=float, default=0.0, help='fraction that stall before answering')
+    parser.add_argument('--stall-seconds', type=float, default=30.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-prefix-cache', action='store_true',
+                        help='re-evaluate the whole prompt every time instead of reusing the cached prefix')
+    parser.add_argument('--attention-tokens', type=int, default=0,
+                        help='prompt length where attention doubles per-token prefill cost, 0 = linear')
+    parser.add_argument('--kv-bytes-per-token', type=int, default=0,
+                        help='KV cache bytes per num_ctx token reported by /api/ps')
+    args = parser.parse_args()
+
+    config = MockOllamaConfig(
+        models=catalog_models(args.catalog, DEFAULT_EXTRA_MODELS + args.model),
+        latency=args.latency,
+        prefill_tokens_per_sec=args.prefill_tokens_per_sec,
+        tokens_per_sec=args.tokens_per_sec,
+        response_tokens=args.response_tokens,
+        load_seconds_per_gb=args.load_seconds_per_gb,
+        max_loaded_models=args.max_loaded_models,
+        parallel=args.parallel,
+        error_rate=args.error_rate,
+        drop_rate=args.drop_rate,
+        stall_rate=args.stall_rate,
+        stall_seconds=args.stall_seconds,
+        seed=args.seed,
+        prefix_cache=not args.no_prefix_cache,
+        attention_tokens=args.attention_tokens,
+        kv_bytes_per_token=args.kv_bytes_per_token
+    )
+    httpd = MockOllamaHTTPServer((args.host, args.port), config)
+    print(f"🐝 Mock Ollama listening on http://{args.host}:{args.port} ({len(config.models)} models)")
+    print(f"   export OLLAMA_HOST=http://{args.host}:{args.port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
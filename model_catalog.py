@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI Model Catalog
+local_llm_models.json の読み書き、実測パフォーマンスの記録、インストール済みモデルのインデックス
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from ollama_client import get_client
+from results_store import results_path
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'local_llm_models.json')
+INDEX_FILE = 'model_index.json'
+# Measured data merged into the catalog at read time
+MEASUREMENTS_FILE = 'catalog_measurements.json'
+MEASURED_KEYS = ('recommendations', 'recommended_models')
+# How long a fetched /api/tags listing is trusted before asking the server again
+DEFAULT_TTL = 300
+
+
+def load_catalog(path=CATALOG_PATH, measured=True):
+    """The catalog, with measured performance, input limits and recommendations merged in.
+
+    Measurements live in MEASUREMENTS_FILE under the results directory, so
+    benchmark runs never rewrite the tracked local_llm_models.json.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        catalog = json.load(f)
+    if measured:
+        merge_measurements(catalog, load_measurements())
+    return catalog
+
+
+def write_json_atomic(data, path):
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def save_catalog(catalog, path=CATALOG_PATH):
+    """Deliberate catalog edits only; measured data goes through update_measurements"""
+    write_json_atomic(catalog, path)
+
+
+def catalog_entries(catalog):
+    """Every model entry in the catalog (regular and variant models)"""
+    ollama = catalog.get('local_llm_services', {}).get('ollama', {})
+    return ollama.get('models', []) + ollama.get('variant_models', [])
+
+
+# MARK: - Measurements
+
+_measurements_lock = threading.Lock()
+
+
+def load_measurements(path=None):
+    """{'models': {name: {'performance': ..., 'input_limits': ...}}, 'recommendations': ..., ...}"""
+    try:
+        with open(path or results_path(MEASUREMENTS_FILE), 'r', encoding='utf-8') as f:
+            measurements = json.load(f)
+    except (OSError, ValueError):
+        measurements = {}
+    measurements.setdefault('models', {})
+    return measurements
+
+
+def merge_measurements(catalog, measurements):
+    """Overlay measured per-model fields and the measured recommendations onto the catalog"""
+    for entry in catalog_entries(catalog):
+        entry.update(measurements['models'].get(canonical_name(entry['name']), {}))
+    for key in MEASURED_KEYS:
+        if measurements.get(key) is not None:
+            catalog[key] = measurements[key]
+    return catalog
+
+
+def update_measurements(update, path=None):
+    """Read, modify and atomically rewrite the measurements file under one lock"""
+    path = path or results_path(MEASUREMENTS_FILE)
+    with _measurements_lock:
+        measurements = load_measurements(path)
+        update(measurements)
+        write_json_atomic(measurements, path)
+
+
+def record_model_fields(values, field, path=CATALOG_PATH):
+    """Store values[model] as the model's measured field; models not in the catalog are skipped and returned"""
+    known = {canonical_name(entry['name']) for entry in catalog_entries(load_catalog(path, measured=False))}
+    measured_at = datetime.now().isoformat()
+    skipped = [model for model in values if canonical_name(model) not in known]
+
+    def update(measurements):
+        for model, value in values.items():
+            if canonical_name(model) in known:
+                measurements['models'].setdefault(canonical_name(model), {})[field] = {**value, 'measured_at': measured_at}
+
+    update_measurements(update)
+    return skipped
+
+
+def record_performance(summaries, path=CATALOG_PATH):
+    """Store per-model server counter summaries as measured catalog performance.
+
+    summaries maps model name -> bench_stats.summarize_counters() output.
+    Models that are not in the catalog are skipped and returned.
+    """
+    return record_model_fields({
+        model: {
+            'cold_load_s': summary['cold_load_time'],
+            'prefill_tokens_per_sec': summary['prefill_tokens_per_sec'],
+            'decode_tokens_per_sec': summary['decode_tokens_per_sec'],
+            'requests': summary['requests']
+        }
+        for model, summary in summaries.items() if summary
+    }, 'performance', path)
+
+
+def record_input_limits(limits, path=CATALOG_PATH):
+    """Store per-model safe input sizes from the context scaling sweep.
+
+    limits maps model name -> dict with safe_input_tokens, prefill_exponent
+    and superlinear_from. Models that are not in the catalog are skipped and
+    returned.
+    """
+    return record_model_fields(limits, 'input_limits', path)
+
+
+# MARK: - Model Index
+
+def canonical_name(name):
+    """Ollama treats a name without a tag as name:latest"""
+    return name if ':' in name.rsplit('/', 1)[-1] else f'{name}:latest'
+
+
+def parse_parameter_size(value):
+    """'4.3B' / '999.89M' -> parameter count, None if unknown"""
+    units = {'K': 1e3, 'M': 1e6, 'B': 1e9, 'T': 1e12}
+    if not value:
+        return None
+    try:
+        return float(value[:-1]) * units[value[-1].upper()] if value[-1].upper() in units else float(value)
+    except ValueError:
+        return None
+
+
+class ModelIndex:
+    """Installed models merged with local_llm_models.json, keyed by name and digest.
+
+    /api/tags is fetched at most once per TTL; /api/show runs only for
+    digests not seen before, since a digest identifies the weights. The
+    index is persisted per server in the results directory, so later runs
+    (and replay mode) start from it without network calls. If the server
+    cannot be reached the last known index is used and marked stale.
+    """
+
+    def __init__(self, client, ttl=DEFAULT_TTL, path=None, catalog_path=CATALOG_PATH):
+        self.client = client
+        self.ttl = ttl
+        self.path = path or results_path(INDEX_FILE)
+        self.catalog_path = catalog_path
+        self.fetched_at = 0.0
+        self.stale = False
+        self.models = {}
+        self.digests = {}
+        self._shown = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f).get(self.client.base_url, {})
+        except (OSError, ValueError):
+            return
+        self.fetched_at = saved.get('fetched_at', 0.0)
+        self._shown = saved.get('shown', {})
+        self._set_models(saved.get('models', {}))
+
+    def _save(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            saved = {}
+        saved[self.client.base_url] = {'fetched_at': self.fetched_at, 'models': self.models, 'shown': self._shown}
+        write_json_atomic(saved, self.path)
+
+    def _set_models(self, models):
+        self.models = models
+        self.digests = {}
+        for name, entry in models.items():
+            if entry.get('digest'):
+                self.digests.setdefault(entry['digest'], []).append(name)
+
+    def _show(self, name, digest):
+        """Context length and details from /api/show, cached by digest"""
+        if digest and digest in self._shown:
+            return self._shown[digest]
+        result = self.client.post('/api/show', {'model': name}, timeout=10)
+        if not result['success'] or not isinstance(result['data'], dict):
+            return {}
+        info = result['data'].get('model_info') or {}
+        shown = {
+            'context_length': next((v for k, v in info.items() if k.endswith('.context_length')), None),
+            'details': result['data'].get('details') or {}
+        }
+        if digest:
+            self._shown[digest] = shown
+        return shown
+
+    def refresh(self, force=False):
+        """Re-fetch /api/tags when the TTL has expired (or forced); returns self"""
+        with self._lock:
+            if not force and self.models and time.time() - self.fetched_at < self.ttl:
+                return self
+            result = self.client.tags(timeout=10)
+            if not result['success']:
+                self.stale = True
+                return self
+
+            catalog = {}
+            try:
+                catalog = {canonical_name(e['name']): e for e in catalog_entries(load_catalog(self.catalog_path))}
+            except (OSError, ValueError):
+                pass
+
+            models = {}
+            for tag in (result['data'] or {}).get('models', []):
+                name = canonical_name(tag['name'])
+                shown = self._show(tag['name'], tag.get('digest'))
+                details = {**shown.get('details', {}), **(tag.get('details') or {})}
+                known = catalog.get(name, {})
+                parameter_size = details.get('parameter_size') or known.get('parameter_size')
+                models[name] = {
+                    'name': name,
+                    'digest': tag.get('digest'),
+                    'family': details.get('family') or known.get('family'),
+                    'parameter_size': parameter_size,
+                    'parameters': parse_parameter_size(parameter_size),
+                    'quantization': details.get('quantization_level') or known.get('quantization'),
+                    'context_length': shown.get('context_length') or known.get('context_length'),
+                    'size_bytes': tag.get('size'),
+                    'size_gb': round(tag['size'] / 1e9, 2) if tag.get('size') else known.get('size_gb'),
+                    'modified_at': tag.get('modified_at'),
+                    'in_catalog': bool(known),
+                    'description': known.get('description'),
+                    'performance': known.get('performance')
+                }
+            self._set_models(models)
+            self.fetched_at = time.time()
+            self.stale = False
+            self._save()
+            return self
+
+    def get(self, name):
+        """Index entry for an installed model name, None if not installed"""
+        return self.refresh().models.get(canonical_name(name))
+
+    def by_digest(self, digest):
+        """Entries sharing a digest (the same weights under several names)"""
+        self.refresh()
+        return [self.models[name] for name in self.digests.get(digest, [])]
+
+    def missing(self, names):
+        """Required models that are not installed"""
+        self.refresh()
+        return [name for name in names if canonical_name(name) not in self.models]
+
+    def available(self, names):
+        """The given models that are installed, in the given order"""
+        missing = self.missing(names)
+        return [name for name in names if name not in missing]
+
+    def pick(self, family=None, max_size_gb=None, min_context=None):
+        """Installed models matching the constraints, smallest first"""
+        self.refresh()
+        picked = [
+            entry for entry in self.models.values()
+            if (family is None or entry['family'] == family)
+            and (max_size_gb is None or (entry['size_gb'] or 0) <= max_size_gb)
+            and (min_context is None or (entry['context_length'] or 0) >= min_context)
+        ]
+        return sorted(picked, key=lambda e: (e['size_bytes'] or 0, e['name']))
+
+
+_shared_indexes = {}
+_shared_lock = threading.Lock()
+
+
+def get_model_index(client, ttl=DEFAULT_TTL):
+    """Process-wide index per server so suites share one set of lookups"""
+    with _shared_lock:
+        index = _shared_indexes.get(client.base_url)
+        if index is None:
+            index = ModelIndex(client, ttl=ttl)
+            _shared_indexes[client.base_url] = index
+        return index
+
+
+def print_index(index):
+    age = time.time() - index.fetched_at
+    print(f"📚 Model index for {index.client.base_url} ({len(index.models)} models, "
+          f"fetched {age:.0f}s ago{', stale' if index.stale else ''})")
+    for entry in sorted(index.models.values(), key=lambda e: e['name']):
+        context = entry['context_length'] or '?'
+        print(f"  {entry['name']}: {entry['parameter_size'] or '?'} {entry['quantization'] or '?'}, "
+              f"ctx {context}, {entry['size_gb'] or 0:.1f}GB, digest {(entry['digest'] or '?')[:12]}"
+              f"{'' if entry['in_catalog'] else ' (not in catalog)'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the merged model index (/api/tags + /api/show + catalog)")
+    parser.add_argument('--base-url', help='Ollama server (default: OLLAMA_HOST or localhost:11434)')
+    parser.add_argument('--refresh', action='store_true', help='ignore the TTL and fetch from the server')
+    parser.add_argument('--json', action='store_true', help='print the index as JSON')
+    args = parser.parse_args()
+
+    index = ModelIndex(get_client(args.base_url)).refresh(force=args.refresh)
+    if args.json:
+        print(json.dumps(index.models, ensure_ascii=False, indent=2))
+    else:
+        print_index(index)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI Model Recommender
+実測ベンチマーク結果のパレートフロンティアから用途別の推奨モデルを算出しカタログへ書き戻す
+"""
+
+import argparse
+import socket
+import statistics
+import sys
+from datetime import datetime
+
+from model_catalog import CATALOG_PATH, MEASURED_KEYS, MEASUREMENTS_FILE, canonical_name, catalog_entries, get_model_index, load_catalog, update_measurements
+from ollama_client import get_client
+from results_store import ResultsStore
+
+# Suites whose records are per (model, prompt) with response_time / quality_score
+SOURCE_SUITES = ('mt_bench', 'variant_models')
+
+# Objectives are (metric, 'min' | 'max'); the first one orders the ranking
+USE_CASES = {
+    'fast_chat': {
+        'description': 'Fast chat responses',
+        'objectives': [('latency_s', 'min'), ('decode_tokens_per_sec', 'max'), ('quality_score', 'max')]
+    },
+    'japanese_quality': {
+        'description': 'Best Japanese answer quality',
+        'objectives': [('quality_score', 'max'), ('latency_s', 'min')]
+    },
+    'low_memory': {
+        'description': 'Smallest memory footprint',
+        'objectives': [('memory_gb', 'min'), ('quality_score', 'max'), ('latency_s', 'min')]
+    }
+}
+
+METRIC_LABELS = {
+    'latency_s': ('median response', 's'),
+    'decode_tokens_per_sec': ('decode speed', ' tokens/s'),
+    'quality_score': ('quality score', '/10'),
+    'memory_gb': ('memory footprint', 'GB')
+}
+
+
+# MARK: - Measurements
+
+def server_counters(samples):
+    """How a run's samples were measured: 'counters', 'replayed' or None (client timings only).
+
+    Real decode timings are streamed rates, or native counters that fit
+    inside the client's wall time. Replayed responses carry the recorded
+    counters but take microseconds, so their server total_duration exceeds
+    the response time they report.
+    """
+    values = {}
+    for (_model, _test, metric), metric_values in samples.items():
+        values.setdefault(metric, []).extend(metric_values)
+    if values.get('total_duration') and \
+            sum(values['total_duration']) > sum(values.get('response_time', [])) * 1.05:
+        return 'replayed'
+    if values.get('decode_tokens_per_sec'):
+        return 'counters'
+    if values.get('eval_count') and sum(values.get('eval_duration', [])) > 0:
+        return 'counters'
+    return None
+
+
+def measured_runs(store, suites=SOURCE_SUITES, runs_per_suite=10, host=None):
+    """(run_ids, counter_run_ids, dropped) over the latest live runs of each suite.
+
+    Every live run counts for quality and latency; only runs with real
+    server counters count for decode speed. Replays are dropped.
+    """
+    run_ids, counter_run_ids, dropped = [], [], []
+    for suite in suites:
+        for run in store.runs(suite, runs_per_suite, source='live', host=host):
+            kind = server_counters(store.samples([run['run_id']]))
+            if kind == 'replayed':
+                dropped.append(run['run_id'])
+                continue
+            run_ids.append(run['run_id'])
+            if kind == 'counters':
+                counter_run_ids.append(run['run_id'])
+    return run_ids, counter_run_ids, dropped
+
+
+def samples_by_model(store, run_ids):
+    samples = {}
+    for (model, _test, metric), values in store.samples(run_ids).items():
+        if model:
+            samples.setdefault(model, {}).setdefault(metric, []).extend(values)
+    return samples
+
+
+def measured_metrics(store, run_ids, counter_run_ids=()):
+    """Per-model quality and latency over run_ids, decode speed over counter_run_ids"""
+    metrics = {}
+    for model, values in samples_by_model(store, run_ids).items():
+        entry = {}
+        if values.get('response_time'):
+            entry['latency_s'] = statistics.median(values['response_time'])
+        if values.get('quality_score'):
+            entry['quality_score'] = statistics.mean(values['quality_score'])
+        metrics[model] = entry
+    for model, values in samples_by_model(store, list(counter_run_ids)).items():
+        entry = metrics.setdefault(model, {})
+        if values.get('decode_tokens_per_sec'):
+            entry['decode_tokens_per_sec'] = statistics.median(values['decode_tokens_per_sec'])
+        elif values.get('eval_count') and sum(values.get('eval_duration', [])) > 0:
+            # Native-backend server counters: tokens over decode seconds
+            entry['decode_tokens_per_sec'] = sum(values['eval_count']) / sum(values['eval_duration'])
+    return metrics
+
+
+def memory_footprints(catalog, index=None):
+    """On-disk size per model (a lower bound on resident memory): index first, catalog as fallback"""
+    sizes = {canonical_name(e['name']): e.get('size_gb') for e in catalog_entries(catalog)}
+    if index is not None:
+        sizes.update({name: e['size_gb'] for name, e in index.models.items() if e.get('size_gb')})
+    return sizes
+
+
+def with_catalog_fallbacks(metrics, catalog, sizes):
+    """Fill decode speed from catalog performance records and add memory footprints"""
+    performance = {canonical_name(e['name']): e.get('performance') or {} for e in catalog_entries(catalog)}
+    for model, entry in metrics.items():
+        name = canonical_name(model)
+        if 'decode_tokens_per_sec' not in entry and performance.get(name, {}).get('decode_tokens_per_sec'):
+            entry['decode_tokens_per_sec'] = performance[name]['decode_tokens_per_sec']
+        if sizes.get(name):
+            entry['memory_gb'] = sizes[name]
+    return metrics
+
+
+# MARK: - Pareto frontier
+
+def dominates(a, b, objectives):
+    """a is at least as good as b on every objective and better on one"""
+    better = False
+    for metric, direction in objectives:
+        x, y = (a[metric], b[metric]) if direction == 'max' else (-a[metric], -b[metric])
+        if x < y:
+            return False
+        better = better or x > y
+    return better
+
+
+def rank_use_case(metrics, objectives):
+    """Frontier models first (by the primary objective), then dominated ones by how often they are beaten.
+    
+    Objectives no model has data for (e.g. decode speed without native-backend
+    runs) are dropped; models missing any remaining one are skipped.
+    """
+    objectives = [(metric, direction) for metric, direction in objectives
+                  if any(e.get(metric) is not None for e in metrics.values())]
+    if not objectives:
+        return [], sorted(metrics), objectives
+    candidates = {m: e for m, e in metrics.items() if all(e.get(metric) is not None for metric, _ in objectives)}
+    beaten_by = {
+        model: [other for other in candidates if other != model
+                and dominates(candidates[other], entry, objectives)]
+        for model, entry in candidates.items()
+    }
+    primary, direction = objectives[0]
+    sign = -1 if direction == 'max' else 1
+
+    ordered = sorted(candidates, key=lambda m: (len(beaten_by[m]) > 0, len(beaten_by[m]),
+                                                sign * candidates[m][primary], m))
+    return [
+        {
+            'rank': rank,
+            'name': model,
+            'frontier': not beaten_by[model],
+            'dominated_by': beaten_by[model],
+            'metrics': {metric: candidates[model][metric] for metric, _ in objectives}
+        }
+        for rank, model in enumerate(ordered, 1)
+    ], sorted(set(metrics) - set(candidates)), objectives
+
+
+def describe(entry, ranked, objectives):
+    """Pros and cons of a pick relative to the other ranked models"""
+    pros, cons = [], []
+    for metric, direction in objectives:
+        values = [e['metrics'][metric] for e in ranked]
+        best, worst = (max(values), min(values)) if direction == 'max' else (min(values), max(values))
+        label, unit = METRIC_LABELS[metric]
+        text = f"{label} {entry['metrics'][metric]:.2f}{unit}"
+        if entry['metrics'][metric] == best:
+            pros.append(f"Best {text}")
+        elif len(values) > 1 and entry['metrics'][metric] == worst:
+            cons.append(f"Worst {text}")
+    return pros, cons
+
+
+def recommend(metrics):
+    recommendations = {}
+    for use_case, spec in USE_CASES.items():
+        ranked, skipped, objectives = rank_use_case(metrics, spec['objectives'])
+        recommendations[use_case] = {
+            'description': spec['description'],
+            'objectives': [[metric, direction] for metric, direction in objectives],
+            'ranked': ranked,
+            'insufficient_data': skipped
+        }
+    return recommendations
+
+
+# MARK: - Catalog
+
+def write_recommendations(catalog, recommendations, run_ids):
+    """Replace recommended_models with the measured top picks and keep the full rankings.
+
+    Both are stored with the other measurements and merged over the catalog's
+    own recommended_models when it is loaded.
+    """
+    catalog['recommendations'] = {
+        'generated_at': datetime.now().isoformat(),
+        'source_runs': run_ids,
+        'use_cases': recommendations
+    }
+    picks = []
+    for use_case, entry in recommendations.items():
+        if not entry['ranked']:
+            continue
+        top = entry['ranked'][0]
+        pros, cons = describe(top, entry['ranked'], entry['objectives'])
+        picks.append({
+            'name': top['name'],
+            'use_case': entry['description'],
+            'pros': pros,
+            'cons': cons,
+            'measured': top['metrics']
+        })
+    catalog['recommended_models'] = picks
+
+    def update(measurements):
+        for key in MEASURED_KEYS:
+            measurements[key] = catalog[key]
+
+    update_measurements(update)
+
+
+def measured_ranking(use_case, path=CATALOG_PATH):
+    """Ranked entries for a use case from the catalog, [] if never computed"""
+    try:
+        recommendations = load_catalog(path).get('recommendations') or {}
+    except (OSError, ValueError):
+        return []
+    return recommendations.get('use_cases', {}).get(use_case, {}).get('ranked', [])
+
+
+def print_recommendations(recommendations):
+    for use_case, entry in recommendations.items():
+        objectives = ', '.join(f"{direction} {metric}" for metric, direction in entry['objectives'])
+        print(f"\n🎯 {use_case}: {entry['description']} ({objectives})")
+        for ranked in entry['ranked']:
+            marker = "⭐" if ranked['frontier'] else "  "
+            values = ", ".join(f"{metric} {value:.2f}" for metric, value in ranked['metrics'].items())
+            beaten = f" (dominated by {', '.join(ranked['dominated_by'])})" if ranked['dominated_by'] else ""
+            print(f"  {marker} {ranked['rank']}. {ranked['name']}: {values}{beaten}")
+        if entry['insufficient_data']:
+            print(f"     no data: {', '.join(entry['insufficient_data'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommend models per use case from measured Pareto frontiers")
+    parser.add_argument('--dir', help='results directory (default: CHIRAI_RESULTS_DIR or repo root)')
+    parser.add_argument('--suite', action='append', dest='suites',
+                        help=f"history suites to use, repeatable (default: {', '.join(SOURCE_SUITES)})")
+    parser.add_argument('--runs', type=int, default=10, help='latest runs per suite to aggregate')
+    parser.add_argument('--base-url', help='Ollama server whose cached model index gives on-disk sizes')
+    parser.add_argument('--host', default=socket.gethostname(),
+                        help="only runs recorded on this machine (default: this one; 'any' for all)")
+    parser.add_argument('--dry-run', action='store_true', help='print the rankings without updating the catalog')
+    args = parser.parse_args()
+
+    catalog = load_catalog()
+    with ResultsStore(args.dir) as store:
+        run_ids, counter_run_ids, dropped = measured_runs(store, args.suites or SOURCE_SUITES, args.runs,
+                                                          None if args.host == 'any' else args.host)
+        metrics = measured_metrics(store, run_ids, counter_run_ids)
+    if dropped:
+        print(f"⚠️  {len(dropped)} replayed runs skipped (server counters longer than their response times)")
+    if not metrics:
+        print("❌ No live benchmark history to rank - run test_japanese_llm.py first")
+        return 1
+
+    # The persisted index is enough here; refresh only if it was never built
+    index = get_model_index(get_client(args.base_url))
+    sizes = memory_footprints(catalog, index.refresh() if not index.models else index)
+    recommendations = recommend(with_catalog_fallbacks(metrics, catalog, sizes))
+
+    print(f"📊 {len(metrics)} models from {len(run_ids)} runs ({len(counter_run_ids)} with server counters)")
+    print_recommendations(recommendations)
+
+    if not args.dry_run:
+        write_recommendations(catalog, recommendations, run_ids)
+        print(f"\n📚 Recommendations written to {MEASUREMENTS_FILE}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
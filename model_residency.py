@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI Model Residency
+常駐モデルを考慮した実行順序の並べ替えとモデルロード回数・時間の集計
+"""
+
+import threading
+
+# load_duration above this means weights were actually read; a resident model reports a few ms
+LOAD_THRESHOLD = 0.05
+
+
+def resident_models(client, timeout=5):
+    """Names of the models currently loaded on the server (/api/ps), or None if unknown"""
+    result = client.ps(timeout=timeout)
+    if not result['success']:
+        return None
+    return [m.get('name') for m in (result['data'] or {}).get('models', [])]
+
+
+def residency_order(items, models_of, resident=()):
+    """Reorder work so everything for the loaded model runs before switching.
+
+    models_of(item) lists the models an item uses (empty = none). Greedy:
+    take the first item (in original order) whose models are all resident,
+    otherwise switch to the model needed by the earliest single-model item;
+    items that use several models (swap-heavy) go last. After each item its
+    last model is assumed to be the resident one, as on a host that fits a
+    single model.
+    """
+    remaining = list(items)
+    ordered = []
+    hot = set(resident or ())
+    while remaining:
+        ready = [item for item in remaining if set(models_of(item)) <= hot]
+        if ready:
+            pick = ready[0]
+        else:
+            pick = min(remaining, key=lambda item: len(models_of(item)))
+        ordered.append(pick)
+        remaining.remove(pick)
+        models = models_of(pick)
+        if models:
+            hot = {models[-1]}
+    return ordered
+
+
+def count_switches(models):
+    """How often consecutive work changes model (None entries need no model)"""
+    sequence = [m for m in models if m]
+    return sum(1 for a, b in zip(sequence, sequence[1:]) if a != b)
+
+
+class ModelLoadLedger:
+    """Thread-safe record of model loads observed while tests run"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.loads = []
+
+    def record(self, model, load_time, test=None, measured=True):
+        """measured=False marks a load whose time is estimated (e.g. from the warm-up)"""
+        with self._lock:
+            self.loads.append({'model': model, 'load_time': load_time, 'test': test, 'measured': measured})
+
+    def summary(self):
+        with self._lock:
+            loads = list(self.loads)
+        by_model = {}
+        for load in loads:
+            entry = by_model.setdefault(load['model'], {'loads': 0, 'load_time': 0.0})
+            entry['loads'] += 1
+            entry['load_time'] += load['load_time'] or 0.0
+        return {
+            'loads': len(loads),
+            'load_time': sum(load['load_time'] or 0.0 for load in loads),
+            'estimated': any(not load['measured'] for load in loads),
+            'by_model': by_model
+        }
+
+    def print_summary(self, title="🔁 Model loads"):
+        summary = self.summary()
+        estimated = " (partly estimated from warm-up)" if summary['estimated'] else ""
+        print(f"\n{title}: {summary['loads']} loads, {summary['load_time']:.2f}s{estimated}")
+        for model, entry in summary['by_model'].items():
+            print(f"  {model}: {entry['loads']} loads, {entry['load_time']:.2f}s")
+        return summary
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI Multi-turn Benchmark
+台本付きの複数ターン会話を再生し、ターンごとのプリフィル増加とKVキャッシュ再利用の効果を測定
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+
+from bench_stats import linear_fit
+from ollama_client import get_client
+from result_stream import ResultStream, read_results
+from results_store import numeric_metrics, record_run, results_path, run_source
+
+STREAM_FILE = 'multi_turn_results.jsonl'
+SUMMARY_FILE = 'multi_turn_benchmark.json'
+
+# How each turn reaches the server:
+#   resend-cold  full history via /api/chat, with an unrelated request in between so the
+#                prefix cache is gone (assumes one slot per model, OLLAMA_NUM_PARALLEL=1)
+#   resend-warm  full history via /api/chat back to back, so Ollama reuses the cached prefix
+#   context      /api/generate with the previous turn's context; only the new message is sent
+MODES = ('resend-cold', 'resend-warm', 'context')
+
+# Scripted conversations like a ChatManager.sendMessage session; turns repeat to reach --turns
+CONVERSATIONS = {
+    'travel_planning': [
+        '来月、京都に3日間旅行します。おすすめの観光プランを教えてください。',
+        '1日目は寺社巡りにしたいです。効率のよい回り方はありますか？',
+        '2日目は嵐山に行きます。昼食のおすすめはありますか？',
+        '雨が降った場合の代わりのプランも考えてください。',
+        '3日目は大阪に移動します。移動手段を比較してください。',
+        'ここまでの予定を時間順にまとめてください。',
+        '予算を1日1万円に抑えるには、どこを削りますか？',
+        'お土産のおすすめを5つ挙げてください。'
+    ],
+    'code_review': [
+        'Pythonでファイルを1行ずつ読んで単語数を数える関数を書いてください。',
+        'その関数に型ヒントを追加してください。',
+        '巨大なファイルでも遅くならないように改善してください。',
+        '例外処理を追加して、ファイルがない場合に分かりやすいエラーを出してください。',
+        'この関数のユニットテストを書いてください。',
+        'これまでの変更点を箇条書きで説明してください。',
+        '日本語の文章でも正しく単語を数えるにはどうすればよいですか？',
+        '最終版のコードを全部まとめて表示してください。'
+    ]
+}
+
+# Sent between resend-cold turns to push the conversation out of the KV cache
+CACHE_BUSTER = '無関係な質問です。1から5まで数えてください。'
+
+
+class MultiTurnBenchmark:
+    """Replay scripted conversations turn by turn and record Ollama's prefill counters"""
+
+    def __init__(self, model='gemma3:1b', base_url=None, max_tokens=128, timeout=120.0, slow_threshold=5.0):
+        self.model = model
+        self.client = get_client(base_url)
+        self.options = {'temperature': 0.7, 'num_predict': max_tokens}
+        self.timeout = timeout
+        self.slow_threshold = slow_threshold
+        self.stream = None
+
+    def script(self, name, turns):
+        base = CONVERSATIONS[name]
+        return [base[i % len(base)] for i in range(turns)]
+
+    # MARK: - Turns
+
+    def _chat_turn(self, history, message):
+        history.append({'role': 'user', 'content': message})
+        result = self.client.native_chat(self.model, history, timeout=self.timeout, options=self.options)
+        if result['success']:
+            history.append({'role': 'assistant', 'content': result['content']})
+        else:
+            history.pop()
+        return result
+
+    def _bust_cache(self):
+        self.client.native_chat(self.model, CACHE_BUSTER, timeout=self.timeout, options={'num_predict': 1})
+
+    def run_conversation(self, name, mode, turns):
+        """One conversation in one mode; every turn is streamed to disk as it finishes"""
+        history = []
+        context = None
+        history_chars = 0
+        records = []
+
+        # Start from a cache that holds nothing of this conversation
+        self._bust_cache()
+        for turn, message in enumerate(self.script(name, turns), 1):
+            if mode == 'resend-cold' and turn > 1:
+                self._bust_cache()
+
+            started = time.perf_counter()
+            if mode == 'context':
+                result = self.client.generate(self.model, message, timeout=self.timeout,
+                                              options=self.options, context=context)
+                if result['success']:
+                    context = result['context']
+            else:
+                result = self._chat_turn(history, message)
+            latency = time.perf_counter() - started
+
+            history_chars += len(message) + len(result.get('content') or '')
+            counters = result['counters'] or {}
+            record = {
+                'model': self.model,
+                'conversation': name,
+                'mode': mode,
+                'turn': turn,
+                'success': result['success'],
+                'error': result['error'],
+                'latency': latency,
+                'history_chars': history_chars,
+                'prompt_eval_count': counters.get('prompt_eval_count'),
+                'prefill_time': counters.get('prompt_eval_duration'),
+                'decode_time': counters.get('eval_duration'),
+                'load_time': counters.get('load_duration'),
+                'timestamp': datetime.now().isoformat()
+            }
+            self.stream.write(record)
+            records.append(record)
+
+            icon = "✅" if result['success'] else "❌"
+            prefill = record['prefill_time'] or 0.0
+            print(f"  {icon} turn {turn:2d}: {latency:.2f}s, prefill {prefill:.3f}s "
+                  f"({record['prompt_eval_count'] or 0} prompt tokens evaluated)")
+            if not result['success']:
+                # Later turns depend on this one
+                break
+        return records
+
+    def run(self, conversations, modes, turns):
+        path = results_path(STREAM_FILE)
+        self.stream = ResultStream(path)
+        print(f"💬 Multi-turn benchmark: {self.model}, {turns} turns, modes {', '.join(modes)}")
+        try:
+            for name in conversations:
+                for mode in modes:
+                    print(f"\n📝 {name} [{mode}]")
+                    self.run_conversation(name, mode, turns)
+        finally:
+            self.stream.close()
+        return path
+
+    # MARK: - Analysis
+
+    def analyze(self, records):
+        """Per (conversation, mode): prefill growth per turn and the first turn over the slow threshold"""
+        grouped = {}
+        for record in records:
+            if record['success']:
+                grouped.setdefault((record['conversation'], record['mode']), []).append(record)
+
+        analysis = {}
+        for (name, mode), rows in grouped.items():
+            rows.sort(key=lambda r: r['turn'])
+            turns = [r['turn'] for r in rows]
+            slow = next((r['turn'] for r in rows if r['latency'] > self.slow_threshold), None)
+            analysis.setdefault(name, {})[mode] = {
+                'turns': len(rows),
+                'prefill_growth': linear_fit(turns, [r['prefill_time'] or 0.0 for r in rows]),
+                'prompt_tokens_growth': linear_fit(turns, [r['prompt_eval_count'] or 0 for r in rows]),
+                'latency_growth': linear_fit(turns, [r['latency'] for r in rows]),
+                'last_turn_latency': rows[-1]['latency'],
+                'last_turn_prefill': rows[-1]['prefill_time'],
+                'first_slow_turn': slow,
+                'per_turn': [{key: r[key] for key in ('turn', 'latency', 'prefill_time', 'prompt_eval_count')}
+                             for r in rows]
+            }
+        return analysis
+
+    def report(self, analysis):
+        print("\n" + "=" * 60)
+        print("📊 プリフィル時間のターン毎の増加")
+        print("=" * 60)
+        for name, modes in analysis.items():
+            print(f"\n💬 {name}")
+            for mode, entry in modes.items():
+                growth = entry['prefill_growth']
+                slow = entry['first_slow_turn']
+                print(f"  {mode:<12} prefill {growth['slope'] * 1000:+.1f}ms/turn, "
+                      f"{entry['prompt_tokens_growth']['slope']:+.0f} tokens/turn, "
+                      f"last turn {entry['last_turn_latency']:.2f}s"
+                      + (f", 🐢 over {self.slow_threshold:.1f}s from turn {slow}" if slow else ""))
+
+            cold, warm = modes.get('resend-cold'), modes.get('resend-warm')
+            if cold and warm and cold['last_turn_prefill']:
+                saved = 1 - (warm['last_turn_prefill'] or 0.0) / cold['last_turn_prefill']
+                print(f"  ♻️  Prefix cache saves {saved * 100:.0f}% of last-turn prefill "
+                      f"({cold['last_turn_prefill']:.3f}s → {warm['last_turn_prefill']:.3f}s)")
+
+    def save(self, analysis, records, started_at):
+        with open(results_path(SUMMARY_FILE), 'w', encoding='utf-8') as f:
+            json.dump({'model': self.model, 'slow_threshold': self.slow_threshold,
+                       'analysis': analysis}, f, ensure_ascii=False, indent=2)
+
+        history = [
+            (record['model'], f"{record['conversation']} turn {record['turn']} [{record['mode']}]",
+             numeric_metrics(record, exclude=('turn',)))
+            for record in records
+        ]
+        run_id = record_run('multi_turn', history, started_at, {'options': self.options},
+                            source=run_source(self.client))
+        print(f"\n💾 Per-turn stream: {STREAM_FILE}")
+        print(f"💾 Summary saved to: {SUMMARY_FILE}")
+        print(f"💾 Run {run_id} appended to: benchmark_history.sqlite")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-turn conversation benchmark with prefix-cache reuse")
+    parser.add_argument('--model', default='gemma3:1b')
+    parser.add_argument('--base-url', help='Ollama server (default: OLLAMA_HOST or localhost:11434)')
+    parser.add_argument('--turns', type=int, default=8, help='turns per conversation (scripts repeat)')
+    parser.add_argument('--conversation', action='append', dest='conversations', choices=sorted(CONVERSATIONS),
+                        help='scripted conversation, repeatable (default: all)')
+    parser.add_argument('--mode', action='append', dest='modes', choices=MODES,
+                        help='how history reaches the server, repeatable (default: all)')
+    parser.add_argument('--max-tokens', type=int, default=128)
+    parser.add_argument('--slow-threshold', type=float, default=5.0, help='turn latency considered too slow (s)')
+    parser.add_argument('--report-only', nargs='?', const='', metavar='JSONL',
+                        help=f'analyze a saved per-turn stream (default: {STREAM_FILE}) without running')
+    args = parser.parse_args()
+
+    benchmark = MultiTurnBenchmark(args.model, args.base_url, args.max_tokens, slow_threshold=args.slow_threshold)
+    started_at = datetime.now()
+    if args.report_only is not None:
+        path = args.report_only or results_path(STREAM_FILE)
+    else:
+        path = benchmark.run(args.conversations or list(CONVERSATIONS), args.modes or list(MODES), args.turns)
+
+    records = list(read_results(path))
+    if not records:
+        print("❌ No turns recorded")
+        return 1
+    analysis = benchmark.analyze(records)
+    benchmark.report(analysis)
+    if args.report_only is None:
+        benchmark.save(analysis, records, started_at)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,555 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI Ollama Client
+テストスイート共通のHTTPクライアント（Keep-Alive接続プール付き）
+"""
+
+import inspect
+import json
+import os
+import socket
+import threading
+import time
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from bench_stats import percentile
+
+DEFAULT_BASE_URL = 'http://localhost:11434'
+
+
+def normalize_base_url(base_url=None):
+    """Resolve base URL from argument or OLLAMA_HOST, adding a scheme if missing"""
+    url = base_url or os.environ.get('OLLAMA_HOST') or DEFAULT_BASE_URL
+    if '://' not in url:
+        url = f'http://{url}'
+    url = url.rstrip('/')
+    # The OpenAI-compatible prefix is added per request, not stored in the base
+    if url.endswith('/v1'):
+        url = url[:-3]
+    return url
+
+
+# Checked-out connection -> ident of the thread using it, so a timed-out
+# test's requests can be aborted from the harness thread
+_in_flight = weakref.WeakKeyDictionary()
+_in_flight_lock = threading.Lock()
+# Threads whose test expired: further requests from them fail immediately
+_cancelled_threads = set()
+
+
+class RequestCancelled(requests.RequestException):
+    """Raised for requests issued by a thread after cancel_requests()"""
+
+
+class _TrackingPoolMixin:
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        if threading.get_ident() in _cancelled_threads:
+            # urlopen returns the slot when it sees the error
+            conn.close()
+            raise RequestCancelled('Request cancelled: test deadline expired')
+        with _in_flight_lock:
+            _in_flight[conn] = threading.get_ident()
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            with _in_flight_lock:
+                _in_flight.pop(conn, None)
+        super()._put_conn(conn)
+
+
+class _TrackingHTTPConnectionPool(_TrackingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _TrackingHTTPSConnectionPool(_TrackingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class CancellableAdapter(HTTPAdapter):
+    """HTTPAdapter whose in-flight requests can be aborted with cancel_requests()"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TrackingHTTPConnectionPool,
+            'https': _TrackingHTTPSConnectionPool
+        }
+
+
+def cancel_requests(thread_id):
+    """Abort every request the given thread has in flight; returns how many were cut.
+    
+    The thread stays cancelled until release_cancellation() is called for it.
+    """
+    with _in_flight_lock:
+        _cancelled_threads.add(thread_id)
+        connections = [conn for conn, owner in _in_flight.items() if owner == thread_id]
+    cancelled = 0
+    for conn in connections:
+        sock = getattr(conn, 'sock', None)
+        if sock is None:
+            continue
+        try:
+            # shutdown (unlike close) wakes a recv() blocked in another thread
+            sock.shutdown(socket.SHUT_RDWR)
+            cancelled += 1
+        except OSError:
+            pass
+    return cancelled
+
+
+def release_cancellation(thread_id):
+    with _in_flight_lock:
+        _cancelled_threads.discard(thread_id)
+
+
+def is_cancelled(thread_id=None):
+    """Whether cancel_requests() was called for this thread (default: the current one)"""
+    return (thread_id or threading.get_ident()) in _cancelled_threads
+
+
+class OllamaClient:
+    """Keep-alive HTTP client shared by the Ollama test suites"""
+
+    def __init__(self, base_url=None, max_connections=4, connect_timeout=5.0, read_timeout=30.0):
+        self.base_url = normalize_base_url(base_url)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+        # pool_block caps concurrent connections per host instead of opening overflow sockets
+        self.session = requests.Session()
+        adapter = CancellableAdapter(pool_connections=8, pool_maxsize=max_connections, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'total_time': 0.0, 'model_time': 0.0}
+        # Optional response_cache.ResponseCache consulted by chat() and native_chat()
+        self.cache = None
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # MARK: - Requests
+
+    def get(self, path, timeout=None):
+        """GET a JSON endpoint"""
+        return self._request('GET', path, None, timeout)
+
+    def post(self, path, payload, timeout=None):
+        """POST a JSON payload to an endpoint"""
+        return self._request('POST', path, payload, timeout)
+
+    def tags(self, timeout=None):
+        return self.get('/api/tags', timeout)
+
+    def version(self, timeout=None):
+        return self.get('/api/version', timeout)
+
+    def ps(self, timeout=None):
+        """Models currently resident in server memory"""
+        return self.get('/api/ps', timeout)
+
+    def preload(self, model, keep_alive=None, timeout=None):
+        """Load a model without generating (/api/generate with no prompt).
+
+        Sets result['load_time'] from the server's load_duration. Warm-up
+        requests are left out of the overhead statistics.
+        """
+        payload = {'model': model}
+        if keep_alive is not None:
+            payload['keep_alive'] = keep_alive
+
+        result = self._request('POST', '/api/generate', payload, timeout, record=False)
+        data = result['data']
+        result['load_time'] = None
+        if result['success'] and isinstance(data, dict):
+            result['load_time'] = data.get('load_duration', 0) / 1e9
+        return result
+
+    def chat(self, model, messages, timeout=None, **options):
+        """Non-streaming chat via the OpenAI-compatible endpoint"""
+        if isinstance(messages, str):
+            messages = [{'role': 'user', 'content': messages}]
+        payload = {'model': model, 'messages': messages, 'stream': False}
+        payload.update(options)
+
+        if self.cache is not None:
+            return self.cache.fetch(self, 'chat', model, messages, options,
+                                    lambda: self._chat(payload, timeout))
+        return self._chat(payload, timeout)
+
+    def _chat(self, payload, timeout):
+        result = self.post('/v1/chat/completions', payload, timeout)
+        data = result['data']
+        result['usage'] = None
+        if result['success'] and isinstance(data, dict) and data.get('choices'):
+            result['content'] = data['choices'][0]['message']['content']
+            result['usage'] = data.get('usage')
+        elif result['success']:
+            result['success'] = False
+            result['error'] = 'No choices in response'
+        return result
+
+    def native_chat(self, model, messages, timeout=None, options=None, keep_alive=None):
+        """Non-streaming chat via Ollama's native /api/chat, keeping server eval counters"""
+        if isinstance(messages, str):
+            messages = [{'role': 'user', 'content': messages}]
+        payload = {'model': model, 'messages': messages, 'stream': False}
+        if options:
+            payload['options'] = options
+        if keep_alive is not None:
+            payload['keep_alive'] = keep_alive
+
+        if self.cache is not None:
+            return self.cache.fetch(self, 'native_chat', model, messages, options or {},
+                                    lambda: self._native_chat(payload, timeout))
+        return self._native_chat(payload, timeout)
+
+    def _native_chat(self, payload, timeout):
+        result = self.post('/api/chat', payload, timeout)
+        data = result['data']
+        result['counters'] = None
+        if result['success'] and isinstance(data, dict) and 'message' in data:
+            result['content'] = data['message'].get('content', '')
+            result['counters'] = server_counters(data)
+        elif result['success']:
+            result['success'] = False
+            result['error'] = 'No message in response'
+        return result
+
+    def generate(self, model, prompt, timeout=None, options=None, context=None, keep_alive=None):
+        """Non-streaming /api/generate; pass the previous result['context'] to continue
+        a conversation without resending it (the server keeps its KV cache)"""
+        payload = {'model': model, 'prompt': prompt, 'stream': False}
+        if options:
+            payload['options'] = options
+        if context:
+            payload['context'] = context
+        if keep_alive is not None:
+            payload['keep_alive'] = keep_alive
+
+        result = self.post('/api/generate', payload, timeout)
+        data = result['data']
+        result['counters'] = None
+        result['context'] = None
+        if result['success'] and isinstance(data, dict) and 'response' in data:
+            result['content'] = data['response']
+            result['counters'] = server_counters(data)
+            result['context'] = data.get('context')
+        elif result['success']:
+            result['success'] = False
+            result['error'] = 'No response in generate result'
+        return result
+
+    def stream_chat(self, model, messages, timeout=None, **options):
+        """Streaming chat via the OpenAI-compatible endpoint, timing every SSE chunk"""
+        if isinstance(messages, str):
+            messages = [{'role': 'user', 'content': messages}]
+        payload = {
+            'model': model,
+            'messages': messages,
+            'stream': True,
+            'stream_options': {'include_usage': True}
+        }
+        payload.update(options)
+
+        def parse(line):
+            if not line.startswith(b'data:'):
+                return None, None, False
+            body = line[5:].strip()
+            if body == b'[DONE]':
+                return None, None, True
+            event = json.loads(body)
+            delta = ''.join((choice.get('delta') or {}).get('content') or '' for choice in event.get('choices') or [])
+            return delta, event.get('usage'), False
+
+        result, start, chunk_times, usage = self._stream('/v1/chat/completions', payload, timeout, parse)
+        result['usage'] = usage
+        result['stream'] = stream_metrics(start, chunk_times, usage)
+        return result
+
+    def native_stream_chat(self, model, messages, timeout=None, options=None, keep_alive=None):
+        """Streaming chat via /api/chat: per-token timing plus the server eval counters.
+
+        Unlike the OpenAI endpoint this honours options such as num_ctx.
+        """
+        if isinstance(messages, str):
+            messages = [{'role': 'user', 'content': messages}]
+        payload = {'model': model, 'messages': messages, 'stream': True}
+        if options:
+            payload['options'] = options
+        if keep_alive is not None:
+            payload['keep_alive'] = keep_alive
+
+        def parse(line):
+            if not line.strip():
+                return None, None, False
+            event = json.loads(line)
+            if event.get('error'):
+                raise ValueError(event['error'])
+            delta = (event.get('message') or {}).get('content')
+            return delta, event if event.get('done') else None, bool(event.get('done'))
+
+        result, start, chunk_times, final = self._stream('/api/chat', payload, timeout, parse)
+        result['counters'] = server_counters(final) if final else None
+        usage = {'prompt_tokens': final.get('prompt_eval_count'),
+                 'completion_tokens': final['eval_count']} if final and final.get('eval_count') else None
+        result['usage'] = usage
+        result['stream'] = stream_metrics(start, chunk_times, usage)
+        return result
+
+    def _stream(self, path, payload, timeout, parse):
+        """POST a streaming request; parse(line) -> (text delta, final data, done).
+
+        Returns (result, start, chunk_times, last final data).
+        """
+        result = {
+            'success': False,
+            'status': None,
+            'data': None,
+            'content': None,
+            'error': None,
+            'timing': None,
+            'stream': None
+        }
+
+        start = time.perf_counter()
+        chunk_times = []
+        parts = []
+        final = None
+        try:
+            with self.session.post(
+                f'{self.base_url}{path}',
+                json=payload,
+                timeout=self._timeout(timeout),
+                stream=True
+            ) as response:
+                result['status'] = response.status_code
+                if not response.ok:
+                    try:
+                        data = response.json()
+                    except ValueError:
+                        data = None
+                    result['error'] = error_message(data, response.status_code)
+                else:
+                    # chunk_size=None yields each chunk as soon as it arrives
+                    for line in response.iter_lines(chunk_size=None):
+                        delta, data, done = parse(line)
+                        if data:
+                            final = data
+                        if delta:
+                            chunk_times.append(time.perf_counter())
+                            parts.append(delta)
+                        if done:
+                            break
+
+                    result['success'] = True
+                    result['content'] = ''.join(parts)
+
+        except (requests.RequestException, ValueError) as e:
+            result['error'] = str(e)
+
+        total = time.perf_counter() - start
+        model_time = (chunk_times[-1] - start) if chunk_times else total
+        result['timing'] = {
+            'total': total,
+            'model': model_time,
+            'client_overhead': total - model_time,
+            'source': 'stream'
+        }
+
+        self._record(result['timing'])
+        return result, start, chunk_times, final
+
+    def _timeout(self, timeout):
+        if timeout is None:
+            return (self.connect_timeout, self.read_timeout)
+        if isinstance(timeout, (tuple, list)):
+            return tuple(timeout)
+        return (min(self.connect_timeout, timeout), timeout)
+
+    def _request(self, method, path, payload, timeout, record=True):
+        result = {
+            'success': False,
+            'status': None,
+            'data': None,
+            'content': None,
+            'error': None,
+            'timing': None
+        }
+
+        start = time.perf_counter()
+        try:
+            response = self.session.request(
+                method, f'{self.base_url}{path}',
+                json=payload,
+                timeout=self._timeout(timeout)
+            )
+            result['status'] = response.status_code
+            try:
+                result['data'] = response.json()
+            except ValueError:
+                result['data'] = None
+            total = time.perf_counter() - start
+
+            result['success'] = response.ok
+            if not response.ok:
+                result['error'] = error_message(result['data'], response.status_code)
+
+            result['timing'] = self._split_timing(total, response.elapsed.total_seconds(), result['data'])
+
+        except requests.RequestException as e:
+            result['error'] = str(e)
+            result['timing'] = self._split_timing(time.perf_counter() - start, None, None)
+
+        if record:
+            self._record(result['timing'])
+        return result
+
+    # MARK: - Timing
+
+    def _split_timing(self, total, server_elapsed, data):
+        """Split wall time into model time and client overhead.
+
+        Native endpoints report total_duration (ns); otherwise the time until
+        response headers arrive is used, which for non-streaming requests
+        covers queueing and generation on the server.
+        """
+        source = 'none'
+        model_time = 0.0
+        if isinstance(data, dict) and data.get('total_duration'):
+            model_time = data['total_duration'] / 1e9
+            source = 'server'
+        elif server_elapsed is not None:
+            model_time = server_elapsed
+            source = 'headers'
+
+        model_time = min(model_time, total)
+        return {
+            'total': total,
+            'model': model_time,
+            'client_overhead': total - model_time,
+            'source': source
+        }
+
+    def _record(self, timing):
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['total_time'] += timing['total']
+            self.stats['model_time'] += timing['model']
+
+    def overhead_report(self):
+        """Aggregate latency split across every request made by this client"""
+        with self._lock:
+            count = self.stats['requests']
+            total = self.stats['total_time']
+            model = self.stats['model_time']
+
+        overhead = total - model
+        return {
+            'requests': count,
+            'total_time': total,
+            'model_time': model,
+            'client_overhead': overhead,
+            'avg_overhead_ms': (overhead / count * 1000) if count else 0.0,
+            'overhead_ratio': (overhead / total) if total > 0 else 0.0
+        }
+
+    def print_overhead_report(self):
+        report = self.overhead_report()
+        if not report['requests']:
+            return
+        print(f"\n🔌 HTTP client: {report['requests']} requests, "
+              f"model {report['model_time']:.2f}s / overhead {report['client_overhead']:.2f}s "
+              f"({report['overhead_ratio'] * 100:.1f}%, avg {report['avg_overhead_ms']:.1f}ms)")
+
+
+def error_message(data, status):
+    """Extract an error from native ({'error': str}) or OpenAI-style ({'error': {'message'}}) bodies"""
+    error = data.get('error') if isinstance(data, dict) else None
+    if isinstance(error, dict):
+        error = error.get('message')
+    return error or f'HTTP {status}'
+
+
+def server_counters(data):
+    """Convert Ollama's nanosecond eval counters into seconds and tokens/sec"""
+    def seconds(key):
+        return (data.get(key) or 0) / 1e9
+
+    prompt_tokens = data.get('prompt_eval_count') or 0
+    prompt_time = seconds('prompt_eval_duration')
+    eval_tokens = data.get('eval_count') or 0
+    eval_time = seconds('eval_duration')
+    return {
+        'total_duration': seconds('total_duration'),
+        'load_duration': seconds('load_duration'),
+        'prompt_eval_count': prompt_tokens,
+        'prompt_eval_duration': prompt_time,
+        'prefill_tokens_per_sec': prompt_tokens / prompt_time if prompt_time > 0 else None,
+        'eval_count': eval_tokens,
+        'eval_duration': eval_time,
+        'decode_tokens_per_sec': eval_tokens / eval_time if eval_time > 0 else None
+    }
+
+
+def stream_metrics(start, chunk_times, usage=None):
+    """Time-to-first-token, inter-token latency percentiles and decode rate"""
+    if not chunk_times:
+        return {
+            'ttft': None,
+            'itl_p50': None,
+            'itl_p90': None,
+            'itl_p99': None,
+            'completion_tokens': (usage or {}).get('completion_tokens', 0),
+            'decode_tokens_per_sec': None
+        }
+
+    gaps = [b - a for a, b in zip(chunk_times, chunk_times[1:])]
+    # Ollama sends one token per chunk; prefer the server count when it reports usage
+    tokens = (usage or {}).get('completion_tokens') or len(chunk_times)
+    decode_window = chunk_times[-1] - chunk_times[0]
+    return {
+        'ttft': chunk_times[0] - start,
+        'itl_p50': percentile(gaps, 50) if gaps else None,
+        'itl_p90': percentile(gaps, 90) if gaps else None,
+        'itl_p99': percentile(gaps, 99) if gaps else None,
+        'completion_tokens': tokens,
+        'decode_tokens_per_sec': (tokens - 1) / decode_window if decode_window > 0 else None
+    }
+
+
+_shared_clients = {}
+_shared_lock = threading.Lock()
+
+
+def get_client(base_url=None, **kwargs):
+    """Return the process-wide client for a base URL and settings so suites share one pool.
+
+    Settings are part of the key: asking for a different pool size or
+    timeout gets its own client instead of silently reusing another one.
+    """
+    arguments = inspect.signature(OllamaClient).bind(normalize_base_url(base_url), **kwargs)
+    arguments.apply_defaults()
+    key = tuple(arguments.arguments.items())
+    with _shared_lock:
+        client = _shared_clients.get(key)
+        if client is None:
+            client = OllamaClient(**arguments.arguments)
+            _shared_clients[key] = client
+        return client
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI Ollama Pool
+複数Ollamaバックエンドへの負荷分散クライアント（最小同時接続/EWMAルーティング、ヘルスチェック、再試行）
+"""
+
+import argparse
+import itertools
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ollama_client import OllamaClient, is_cancelled, normalize_base_url
+
+POLICIES = ('least-outstanding', 'ewma')
+# Weight of the newest latency sample in the per-host moving average
+EWMA_ALPHA = 0.3
+
+
+class Backend:
+    """One Ollama host in the pool with its routing and health state"""
+
+    def __init__(self, client):
+        self.client = client
+        self.outstanding = 0
+        self.ewma = None
+        # Consecutive failed requests/probes; reset by any success
+        self.failures = 0
+        # Out of rotation until a health probe succeeds
+        self.ejected = False
+        self.stats = {'requests': 0, 'errors': 0, 'retried_elsewhere': 0, 'ejections': 0}
+
+    @property
+    def url(self):
+        return self.client.base_url
+
+
+class BalancedClient:
+    """Drop-in OllamaClient replacement that spreads requests over several hosts.
+
+    Routing policies:
+    - least-outstanding: the host with the fewest requests in flight
+    - ewma: lowest latency EWMA scaled by (outstanding + 1), so a fast host
+      still sheds load once it queues
+
+    A host is ejected after `eject_after` consecutive transport errors or 5xx
+    responses, or a failed /api/tags probe. Every `probe_interval` seconds all
+    hosts are probed in the background and ejected ones that answer are
+    readmitted. Failed requests are retried on another host (up to
+    `max_attempts` hosts); streams only if nothing was received yet.
+    """
+
+    def __init__(self, base_urls, policy='least-outstanding', max_connections=4, connect_timeout=5.0,
+                 read_timeout=30.0, eject_after=2, probe_interval=10.0, probe_timeout=2.0, max_attempts=2):
+        if policy not in POLICIES:
+            raise ValueError(f'Unknown routing policy: {policy}')
+        urls = list(dict.fromkeys(normalize_base_url(url) for url in base_urls))
+        if not urls:
+            raise ValueError('BalancedClient needs at least one base URL')
+
+        self.policy = policy
+        self.eject_after = eject_after
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.max_attempts = max_attempts
+        self.backends = [
+            Backend(OllamaClient(url, max_connections, connect_timeout, read_timeout)) for url in urls
+        ]
+        self.base_url = ','.join(urls)
+
+        self._lock = threading.Lock()
+        self._rotation = itertools.count()
+        self._last_probe = 0.0
+        self._probing = False
+        # Cache hits are recorded here; real requests on the backend clients
+        self.stats = {'requests': 0, 'total_time': 0.0, 'model_time': 0.0}
+        self.cache = None
+
+    def close(self):
+        for backend in self.backends:
+            backend.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # MARK: - Health
+
+    def check_health(self):
+        """Probe every host with /api/tags now; returns {url: healthy}"""
+        with ThreadPoolExecutor(max_workers=len(self.backends)) as pool:
+            results = list(pool.map(self._probe, self.backends))
+        return {backend.url: ok for backend, ok in zip(self.backends, results)}
+
+    def _probe(self, backend):
+        ok = backend.client.tags(timeout=self.probe_timeout)['success']
+        with self._lock:
+            if ok:
+                if backend.ejected:
+                    print(f"✅ {backend.url} passed its health probe - back in the pool")
+                backend.failures = 0
+                backend.ejected = False
+            else:
+                self._eject(backend, 'health probe failed')
+        return ok
+
+    def _probe_all_in_background(self):
+        def run():
+            try:
+                self.check_health()
+            finally:
+                with self._lock:
+                    self._probing = False
+
+        threading.Thread(target=run, name='ollama-pool-probe', daemon=True).start()
+
+    def _eject(self, backend, reason):
+        """Take a host out of rotation until a probe succeeds (call with the lock held)"""
+        if not backend.ejected:
+            backend.ejected = True
+            backend.stats['ejections'] += 1
+            print(f"⚠️  {backend.url} ejected from the pool: {reason}")
+
+    # MARK: - Routing
+
+    def _pick(self, exclude):
+        now = time.monotonic()
+        with self._lock:
+            if not self._probing and now - self._last_probe >= self.probe_interval:
+                self._last_probe = now
+                self._probing = True
+                self._probe_all_in_background()
+
+            candidates = [b for b in self.backends if b not in exclude and not b.ejected]
+            if not candidates:
+                # Every remaining host is ejected: trying one beats failing outright
+                candidates = [b for b in self.backends if b not in exclude]
+            if not candidates:
+                return None
+
+            # Rotate before taking the minimum so ties are spread round-robin
+            offset = next(self._rotation) % len(candidates)
+            candidates = candidates[offset:] + candidates[:offset]
+            if self.policy == 'ewma':
+                # Hosts without a sample yet are tried first
+                backend = min(candidates, key=lambda b: -1 if b.ewma is None else b.ewma * (b.outstanding + 1))
+            else:
+                backend = min(candidates, key=lambda b: b.outstanding)
+            backend.outstanding += 1
+            backend.stats['requests'] += 1
+            return backend
+
+    def _finish(self, backend, result, elapsed, failed):
+        with self._lock:
+            backend.outstanding -= 1
+            if failed:
+                backend.stats['errors'] += 1
+                backend.failures += 1
+                if backend.failures >= self.eject_after:
+                    self._eject(backend, f"{backend.failures} consecutive failures ({result['error']})")
+            else:
+                backend.failures = 0
+                backend.ewma = elapsed if backend.ewma is None \
+                    else EWMA_ALPHA * elapsed + (1 - EWMA_ALPHA) * backend.ewma
+
+    @staticmethod
+    def _host_failed(result):
+        """Transport errors and server errors say the host is unwell; 4xx is the request's fault"""
+        return result['status'] is None or result['status'] >= 500
+
+    def _dispatch(self, call, retryable=None):
+        """Run call(client) on a routed host, retrying failures on other hosts.
+
+        retryable(result) decides whether a failed result may be sent again
+        (default: always, which is right for non-streaming requests).
+        """
+        tried = []
+        result = None
+        while True:
+            backend = self._pick(tried)
+            if backend is None:
+                return result
+            tried.append(backend)
+
+            start = time.perf_counter()
+            result = None
+            try:
+                result = call(backend.client)
+            finally:
+                # A request cut by the suite harness says nothing about the host
+                failed = (result is None or self._host_failed(result)) and not is_cancelled()
+                self._finish(backend, result or {'error': 'exception'}, time.perf_counter() - start, failed)
+
+            result['host'] = backend.url
+            result['attempts'] = len(tried)
+            if not failed or len(tried) >= self.max_attempts:
+                return result
+            if retryable is not None and not retryable(result):
+                return result
+            if len(tried) >= len(self.backends):
+                return result
+            with self._lock:
+                backend.stats['retried_elsewhere'] += 1
+
+    # MARK: - Requests
+
+    def get(self, path, timeout=None):
+        return self._dispatch(lambda client: client.get(path, timeout))
+
+    def post(self, path, payload, timeout=None):
+        return self._dispatch(lambda client: client.post(path, payload, timeout))
+
+    def tags(self, timeout=None):
+        return self.get('/api/tags', timeout)
+
+    def version(self, timeout=None):
+        return self.get('/api/version', timeout)
+
+    def ps(self, timeout=None):
+        """Models resident on every healthy host (a model counts as loaded only if all have it)"""
+        results = [b.client.ps(timeout) for b in self.backends if not b.ejected]
+        if not results:
+            return self.get('/api/ps', timeout)
+        failed = next((r for r in results if not r['success']), None)
+        if failed is not None:
+            return failed
+        names = [{m.get('name') for m in (r['data'] or {}).get('models', [])} for r in results]
+        common = set.intersection(*names)
+        merged = dict(results[0])
+        merged['data'] = {'models': [m for m in (results[0]['data'] or {}).get('models', [])
+                                     if m.get('name') in common]}
+        return merged
+
+    def preload(self, model, keep_alive=None, timeout=None):
+        """Load a model on every healthy host in parallel; load_time is the slowest host's"""
+        backends = [b for b in self.backends if not b.ejected] or self.backends
+        with ThreadPoolExecutor(max_workers=len(backends)) as pool:
+            results = list(pool.map(lambda b: b.client.preload(model, keep_alive, timeout), backends))
+        failed = [r for r in results if not r['success']]
+        merged = dict(failed[0] if failed else max(results, key=lambda r: r['load_time'] or 0))
+        merged['load_times'] = {b.url: r['load_time'] for b, r in zip(backends, results)}
+        return merged
+
+    def chat(self, model, messages, timeout=None, **options):
+        if isinstance(messages, str):
+            messages = [{'role': 'user', 'content': messages}]
+
+        def send():
+            return self._dispatch(lambda client: client.chat(model, messages, timeout, **options))
+
+        if self.cache is not None:
+            return self.cache.fetch(self, 'chat', model, messages, options, send)
+        return send()
+
+    def native_chat(self, model, messages, timeout=None, options=None, keep_alive=None):
+        if isinstance(messages, str):
+            messages = [{'role': 'user', 'content': messages}]
+
+        def send():
+            return self._dispatch(lambda client: client.native_chat(model, messages, timeout, options, keep_alive))
+
+        if self.cache is not None:
+            return self.cache.fetch(self, 'native_chat', model, messages, options or {}, send)
+        return send()
+
+    def stream_chat(self, model, messages, timeout=None, **options):
+        # A stream that already produced tokens cannot be replayed transparently
+        return self._dispatch(lambda client: client.stream_chat(model, messages, timeout, **options),
+                              retryable=lambda result: not result['content'])
+
+    def native_stream_chat(self, model, messages, timeout=None, options=None, keep_alive=None):
+        return self._dispatch(lambda client: client.native_stream_chat(model, messages, timeout, options, keep_alive),
+                              retryable=lambda result: not result['content'])
+
+    # MARK: - Statistics
+
+    def _record(self, timing):
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['total_time'] += timing['total']
+            self.stats['model_time'] += timing['model']
+
+    def overhead_report(self):
+        """Latency split summed over every host (plus cache hits)"""
+        with self._lock:
+            count = self.stats['requests']
+            total = self.stats['total_time']
+            model = self.stats['model_time']
+        for backend in self.backends:
+            report = backend.client.overhead_report()
+            count += report['requests']
+            total += report['total_time']
+            model += report['model_time']
+
+        overhead = total - model
+        return {
+            'requests': count,
+            'total_time': total,
+            'model_time': model,
+            'client_overhead': overhead,
+            'avg_overhead_ms': (overhead / count * 1000) if count else 0.0,
+            'overhead_ratio': (overhead / total) if total > 0 else 0.0,
+            'hosts': self.pool_report()
+        }
+
+    def pool_report(self):
+        with self._lock:
+            return {
+                b.url: {
+                    **b.stats,
+                    'healthy': not b.ejected,
+                    'ewma_latency': b.ewma
+                }
+                for b in self.backends
+            }
+
+    def print_overhead_report(self):
+        report = self.overhead_report()
+        if report['requests']:
+            print(f"\n🔌 HTTP client: {report['requests']} requests, "
+                  f"model {report['model_time']:.2f}s / overhead {report['client_overhead']:.2f}s "
+                  f"({report['overhead_ratio'] * 100:.1f}%, avg {report['avg_overhead_ms']:.1f}ms)")
+        self.print_pool_report()
+
+    def print_pool_report(self):
+        print(f"\n🔀 Ollama pool ({self.policy}, {len(self.backends)} hosts):")
+        for url, host in self.pool_report().items():
+            ewma = f"{host['ewma_latency']:.2f}s" if host['ewma_latency'] is not None else "-"
+            print(f"  {'✅' if host['healthy'] else '❌'} {url}: {host['requests']} requests, "
+                  f"{host['errors']} errors, {host['retried_elsewhere']} retried elsewhere, "
+                  f"{host['ejections']} ejections, EWMA {ewma}")
+
+
+_shared_pools = {}
+_shared_lock = threading.Lock()
+
+
+def get_pool(base_urls, **kwargs):
+    """Process-wide BalancedClient for a set of hosts, like ollama_client.get_client"""
+    key = (tuple(normalize_base_url(url) for url in base_urls), kwargs.get('policy', 'least-outstanding'))
+    with _shared_lock:
+        pool = _shared_pools.get(key)
+        if pool is None:
+            pool = BalancedClient(base_urls, **kwargs)
+            _shared_pools[key] = pool
+        return pool
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send chat requests through a balanced Ollama pool")
+    parser.add_argument('hosts', nargs='+', help='Ollama base URLs')
+    parser.add_argument('--policy', choices=POLICIES, default='least-outstanding')
+    parser.add_argument('--model', default='gemma3:1b')
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    pool = BalancedClient(args.hosts, policy=args.policy, max_connections=args.concurrency)
+    for url, ok in pool.check_health().items():
+        print(f"{'✅' if ok else '❌'} {url}")
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(
+            lambda i: pool.chat(args.model, f'Say hello #{i} in one short sentence.', max_tokens=50),
+            range(args.requests)
+        ))
+    elapsed = time.time() - start
+    succeeded = sum(1 for r in results if r['success'])
+    print(f"\n📊 {succeeded}/{args.requests} succeeded in {elapsed:.2f}s ({succeeded / elapsed:.1f} req/s)")
+    pool.print_overhead_report()
+    return 0 if succeeded == args.requests else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
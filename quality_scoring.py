@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI Quality Scoring
+応答品質ルーブリックのバッチ計算（NumPyによる文字種ヒストグラム・文数・長さ区分）
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+# Script classes reported in the histogram
+SCRIPT_CLASSES = ('ascii', 'hiragana', 'katakana', 'kanji', 'other')
+
+MATH_CHARS = "0123456789+-*/="
+# Question types with a type-specific check; every other type gets the points
+_TYPE_KINDS = {'math_reasoning': 1, 'code_generation': 2, 'translation': 3}
+
+# Every code point maps to one category; categories split the script classes
+# further where the rubric needs it (math characters, sentence endings, 0x3000)
+_CATEGORIES = ('ascii_math', 'ascii_period', 'ascii_other', 'other_low', 'other_high',
+               'maru', 'hiragana', 'katakana', 'kanji')
+_CATEGORY_SCRIPT = np.array([0, 0, 0, 4, 4, 4, 1, 2, 3])
+_ABOVE_3000 = np.array([c in ('other_high', 'maru', 'hiragana', 'katakana', 'kanji') for c in _CATEGORIES])
+
+
+def _category_table():
+    """uint8 category for every BMP code point, plus one slot for everything above"""
+    index = {name: i for i, name in enumerate(_CATEGORIES)}
+    table = np.full(0x10001, index['other_high'], dtype=np.uint8)
+    table[:0x80] = index['ascii_other']
+    table[[ord(c) for c in MATH_CHARS]] = index['ascii_math']
+    table[ord('.')] = index['ascii_period']
+    table[0x80:0x3001] = index['other_low']
+    table[ord('。')] = index['maru']
+    table[0x3040:0x30A0] = index['hiragana']
+    table[0x30A0:0x3100] = index['katakana']
+    table[0x3400:0x4DC0] = index['kanji']
+    table[0x4E00:0xA000] = index['kanji']
+    table[0xF900:0xFB00] = index['kanji']
+    return table
+
+
+_TABLE = _category_table()
+# Code points handled per vectorized step, bounding temporary arrays
+CHUNK_CODE_POINTS = 1 << 22
+
+
+def _category_counts(responses):
+    """(len(responses) x len(_CATEGORIES)) code point counts"""
+    k = len(_CATEGORIES)
+    lengths = np.fromiter(map(len, responses), dtype=np.int64, count=len(responses))
+    counts = np.zeros((len(responses), k), dtype=np.int64)
+    
+    # Split into chunks of roughly CHUNK_CODE_POINTS (a longer response gets its own chunk)
+    ends = np.cumsum(lengths)
+    boundaries = [0]
+    while boundaries[-1] < len(responses):
+        start = boundaries[-1]
+        offset = ends[start - 1] if start else 0
+        end = int(np.searchsorted(ends, offset + CHUNK_CODE_POINTS, side='right'))
+        boundaries.append(max(end, start + 1))
+    
+    for start, end in zip(boundaries, boundaries[1:]):
+        if not lengths[start:end].any():
+            continue
+        # UTF-32 gives exactly one element per Python code point
+        codes = np.frombuffer(''.join(responses[start:end]).encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+        categories = np.take(_TABLE, codes, mode='clip')
+        owner = np.repeat(np.arange(end - start, dtype=np.int32), lengths[start:end])
+        counts[start:end] = np.bincount(owner * k + categories, minlength=(end - start) * k).reshape(end - start, k)
+    return counts
+
+
+def response_features(responses):
+    """Per-response features for a batch, computed in one pass over all code points.
+
+    Returns a dict of arrays, one row per response: length, script counts
+    (n x len(SCRIPT_CLASSES)), above_3000 (code points > 0x3000, the rubric's
+    "Japanese" test), math_chars, maru ('。') and period ('.') counts.
+    """
+    counts = _category_counts(responses)
+    scripts = np.zeros((len(responses), len(SCRIPT_CLASSES)), dtype=np.int64)
+    for category, script in enumerate(_CATEGORY_SCRIPT):
+        scripts[:, script] += counts[:, category]
+    return {
+        'length': counts.sum(axis=1),
+        'scripts': scripts,
+        'above_3000': counts[:, _ABOVE_3000].sum(axis=1),
+        'math_chars': counts[:, _CATEGORIES.index('ascii_math')],
+        'maru': counts[:, _CATEGORIES.index('maru')],
+        'period': counts[:, _CATEGORIES.index('ascii_period')]
+    }
+
+
+def contains_japanese(responses):
+    """Boolean array: any code point above 0x3000 (matches the suites' original check)"""
+    return response_features(responses)['above_3000'] > 0
+
+
+def length_points(lengths):
+    """Rubric points for response length: 2 if 50 < len < 1000, 1 if len > 20"""
+    lengths = np.asarray(lengths)
+    return np.where((lengths > 50) & (lengths < 1000), 2, np.where(lengths > 20, 1, 0))
+
+
+def score_batch(responses, test_types, features=None):
+    """Score many responses at once with the MT-Bench rubric (0-10 each)"""
+    features = features or response_features(responses)
+    kinds = np.fromiter((_TYPE_KINDS.get(t, 0) for t in test_types), dtype=np.int8, count=len(responses))
+    lengths = features['length']
+    ascii_counts = features['scripts'][:, SCRIPT_CLASSES.index('ascii')]
+
+    # Substring search is only needed for code questions
+    has_code = np.zeros(len(responses), dtype=bool)
+    for i in np.flatnonzero(kinds == 2):
+        has_code[i] = 'def' in responses[i] or 'function' in responses[i]
+
+    type_points = np.select(
+        [kinds == 1, kinds == 2, kinds == 3],
+        [2 * (features['math_chars'] > 0), 2 * has_code, 2 * (ascii_counts > 0)],
+        default=2
+    )
+
+    score = (
+        2 * (lengths > 10)
+        + 2 * (features['above_3000'] > 0)
+        + type_points
+        + length_points(lengths)
+        + 2 * ((features['maru'] > 0) | (features['period'] > 0))
+    )
+    return np.minimum(score, 10).astype(np.int64)
+
+
+def score_response(response, test_type):
+    """Single-response convenience wrapper around score_batch"""
+    return int(score_batch([response], [test_type])[0])
+
+
+def reference_score(response, test_type):
+    """The original per-character rubric, kept to verify score_batch"""
+    score = 0
+    max_score = 10
+
+    if response and len(response) > 10:
+        score += 2
+    if any(ord(char) > 0x3000 for char in response):
+        score += 2
+    if test_type == "math_reasoning":
+        if any(char in response for char in "0123456789+-*/="):
+            score += 2
+    elif test_type == "code_generation":
+        if "def" in response or "function" in response:
+            score += 2
+    elif test_type == "translation":
+        if any(ord(char) < 128 for char in response):
+            score += 2
+    else:
+        score += 2
+    if 50 < len(response) < 1000:
+        score += 2
+    elif len(response) > 20:
+        score += 1
+    if response.count('。') > 0 or response.count('.') > 0:
+        score += 2
+    return min(score, max_score)
+
+
+def stored_responses(path):
+    """(response, type) pairs from an mt_bench_results.json file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        results = json.load(f)
+    pairs = []
+    for model_result in results:
+        for test in model_result.get('tests', []):
+            if test.get('response'):
+                pairs.append((test['response'], test.get('type', '')))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check batched scoring against the per-character rubric")
+    parser.add_argument('results', help='mt_bench_results.json')
+    parser.add_argument('--repeat', type=int, default=1, help='replicate the responses to time larger batches')
+    args = parser.parse_args()
+
+    pairs = stored_responses(args.results) * args.repeat
+    if not pairs:
+        print("❌ No responses found")
+        return 1
+    responses = [r for r, _ in pairs]
+    types = [t for _, t in pairs]
+
+    start = time.perf_counter()
+    expected = [reference_score(r, t) for r, t in pairs]
+    reference_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scores = score_batch(responses, types)
+    batch_time = time.perf_counter() - start
+
+    mismatches = int(np.sum(scores != np.array(expected)))
+    print(f"📊 {len(pairs)} responses: per-character {reference_time:.3f}s, batched {batch_time:.3f}s "
+          f"({reference_time / batch_time if batch_time else 0:.1f}x)")
+    if mismatches:
+        print(f"❌ {mismatches} scores differ from the reference rubric")
+        return 1
+    print("✅ Scores identical to the reference rubric")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
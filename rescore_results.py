@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI Offline Re-scoring
+保存済みベンチマーク結果をストリーミングで読み込み、差し替え可能なスコアラーで再採点
+"""
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+from collections import deque
+from multiprocessing import Pool
+
+import numpy as np
+
+from quality_scoring import SCRIPT_CLASSES, response_features, score_batch
+from result_stream import read_results
+
+READ_CHUNK = 1 << 20
+
+
+# MARK: - Scorers
+#
+# A scorer takes a list of test records (dicts with at least 'response' and
+# usually 'type') and returns one JSON-serializable value per record.
+
+def mt_bench_scorer(records):
+    """The MT-Bench rubric used by LLMTester"""
+    responses = [r.get('response') or '' for r in records]
+    return score_batch(responses, [r.get('type', '') for r in records]).tolist()
+
+
+def japanese_ratio_scorer(records):
+    """Share of hiragana, katakana and kanji among all characters"""
+    features = response_features([r.get('response') or '' for r in records])
+    japanese = features['scripts'][:, [SCRIPT_CLASSES.index(c) for c in ('hiragana', 'katakana', 'kanji')]].sum(axis=1)
+    return np.round(japanese / np.maximum(features['length'], 1), 4).tolist()
+
+
+def sentence_count_scorer(records):
+    """Number of sentence endings ('。' and '.')"""
+    features = response_features([r.get('response') or '' for r in records])
+    return (features['maru'] + features['period']).tolist()
+
+
+SCORERS = {
+    'mt_bench': mt_bench_scorer,
+    'japanese_ratio': japanese_ratio_scorer,
+    'sentence_count': sentence_count_scorer
+}
+
+
+def resolve_scorer(spec):
+    """Built-in scorer name or 'module:function' for a custom one"""
+    if spec in SCORERS:
+        return SCORERS[spec]
+    if ':' not in spec:
+        raise ValueError(f"Unknown scorer '{spec}' (built-in: {', '.join(SCORERS)}; or module:function)")
+    module_name, function_name = spec.split(':', 1)
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def scorer_name(spec):
+    return spec.rsplit(':', 1)[-1]
+
+
+# MARK: - Streaming input
+
+class JsonReader:
+    """Incremental JSON reader that decodes one value at a time at a moving offset.
+
+    Consumed text is dropped only when the buffer is refilled, and a value
+    cut off at the buffer end is retried with geometrically larger reads,
+    so each byte is decoded O(1) times on average.
+    """
+
+    def __init__(self, f, chunk_size=READ_CHUNK):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size):
+        if self.eof:
+            return False
+        more = self.f.read(size)
+        self.buffer, self.pos = self.buffer[self.pos:] + more, 0
+        self.eof = not more
+        return bool(more)
+
+    def peek(self):
+        """Next non-whitespace character ('' at end of file), not consumed"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill(self.chunk_size):
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}', got '{found or 'end of file'}'")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number at the very end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill(size)
+            size *= 2
+
+    def members(self, close):
+        """Step through the elements of an array (or the pairs of an object) whose opening bracket was read"""
+        first = True
+        while True:
+            char = self.peek()
+            if char == close:
+                self.pos += 1
+                return
+            if not char:
+                raise ValueError('Unexpected end of JSON input')
+            if not first:
+                self.expect(',')
+            first = False
+            yield
+
+
+def iter_json_records(f, chunk_size=READ_CHUNK):
+    """Test records from a top-level JSON array, one record in memory at a time.
+
+    Model-level entries ({'model', ..., 'tests': [...]}) are streamed test by
+    test rather than decoded whole; fields before 'tests' (write_grouped_json
+    puts 'model' first) are attached to every test.
+    """
+    reader = JsonReader(f, chunk_size)
+    if reader.peek() != '[':
+        raise ValueError('Expected a JSON array')
+    reader.pos += 1
+    for _ in reader.members(']'):
+        if reader.peek() != '{':
+            reader.value()
+            continue
+        reader.pos += 1
+        fields, streamed = {}, False
+        for _ in reader.members('}'):
+            key = reader.value()
+            reader.expect(':')
+            if key != 'tests' or reader.peek() != '[':
+                fields[key] = reader.value()
+                continue
+            reader.pos += 1
+            streamed = True
+            for i, _ in enumerate(reader.members(']')):
+                test = reader.value()
+                if isinstance(test, dict):
+                    test.setdefault('model', fields.get('model'))
+                    test.setdefault('test_index', i)
+                    yield test
+        if not streamed:
+            yield fields
+
+
+def iter_input_records(path):
+    """Test records from mt_bench_results.json (array) or a JSONL stream.
+
+    Model-level entries ({'model', 'tests': [...]}) are flattened into their
+    tests, each tagged with 'model' and its position 'test_index'.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+        f.seek(0)
+        if head == '[':
+            yield from iter_json_records(f)
+            return
+
+    for element in read_results(path):
+        if isinstance(element, dict) and isinstance(element.get('tests'), list):
+            for i, test in enumerate(element['tests']):
+                record = dict(test)
+                record.setdefault('model', element.get('model'))
+                record.setdefault('test_index', i)
+                yield record
+        elif isinstance(element, dict):
+            yield element
+
+
+def iter_batches(records, batch_size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# MARK: - Pipeline
+
+_worker_scorers = None
+
+
+def _init_worker(specs):
+    global _worker_scorers
+    _worker_scorers = [(scorer_name(spec), resolve_scorer(spec)) for spec in specs]
+
+
+def _score_batch(batch):
+    """Run every scorer over one batch (in a worker process)"""
+    scored = [r for r in batch if r.get('response')]
+    results = {name: scorer(scored) for name, scorer in _worker_scorers} if scored else {}
+    for i, record in enumerate(scored):
+        record['rescored'] = {name: values[i] for name, values in results.items()}
+    return batch
+
+
+def _bounded_map(pool, batches, window):
+    """Ordered pool map that reads ahead at most `window` batches (Pool.imap reads everything)"""
+    pending = deque()
+    for batch in batches:
+        pending.append(pool.apply_async(_score_batch, (batch,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def rescore(input_path, output_path, specs=('mt_bench',), workers=None, batch_size=1000):
+    """Stream input_path through the scorers into output_path (JSONL), batch by batch.
+
+    Output keeps input order; each batch is written and flushed as soon as
+    it is scored, so an interrupted run leaves a valid prefix in
+    <output>.partial.
+    Returns per-model summaries of the new scores.
+    """
+    for spec in specs:
+        resolve_scorer(spec)  # fail fast on typos before starting workers
+    workers = workers or os.cpu_count() or 1
+    names = [scorer_name(spec) for spec in specs]
+    totals = {}
+    count = 0
+
+    tmp_path = f'{output_path}.partial'
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        batches = iter_batches(iter_input_records(input_path), batch_size)
+        if workers > 1:
+            pool = Pool(workers, initializer=_init_worker, initargs=(list(specs),))
+            scored_batches = _bounded_map(pool, batches, window=workers * 2)
+        else:
+            pool = None
+            _init_worker(list(specs))
+            scored_batches = map(_score_batch, batches)
+
+        try:
+            for batch in scored_batches:
+                for record in batch:
+                    out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    count += 1
+                    if 'rescored' not in record:
+                        continue
+                    model_totals = totals.setdefault(record.get('model'), {'records': 0, 'previous': 0.0,
+                                                                           'previous_count': 0,
+                                                                           **{n: 0.0 for n in names}})
+                    model_totals['records'] += 1
+                    for name in names:
+                        value = record['rescored'][name]
+                        if isinstance(value, (int, float)):
+                            model_totals[name] += value
+                    if isinstance(record.get('quality_score'), (int, float)):
+                        model_totals['previous'] += record['quality_score']
+                        model_totals['previous_count'] += 1
+                out.flush()
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    os.replace(tmp_path, output_path)
+
+    summaries = {}
+    for model, t in totals.items():
+        summary = {'records': t['records']}
+        for name in names:
+            summary[f'avg_{name}'] = t[name] / t['records']
+        if t['previous_count']:
+            summary['avg_previous_quality_score'] = t['previous'] / t['previous_count']
+        summaries[model] = summary
+    return count, summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score stored benchmark results offline")
+    parser.add_argument('input', help='mt_bench_results.json or a JSONL results stream')
+    parser.add_argument('-o', '--output', help='JSONL output (default: <input>.rescored.jsonl)')
+    parser.add_argument('--scorer', action='append',
+                        help=f"scorer to run, repeatable: {', '.join(SCORERS)} or module:function "
+                             "(default: mt_bench)")
+    parser.add_argument('--workers', type=int, help='worker processes (default: CPU count, 1 = in-process)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='records per worker task')
+    args = parser.parse_args()
+
+    specs = args.scorer or ['mt_bench']
+    output = args.output or f'{os.path.splitext(args.input)[0]}.rescored.jsonl'
+
+    print(f"🔁 Re-scoring {args.input} with {', '.join(specs)}")
+    start = time.time()
+    count, summaries = rescore(args.input, output, specs, args.workers, args.batch_size)
+    elapsed = time.time() - start
+
+    for model, summary in summaries.items():
+        parts = [f"{key[4:]} {value:.2f}" for key, value in summary.items() if key.startswith('avg_')]
+        print(f"   {model}: {summary['records']} responses, " + ', '.join(parts))
+    print(f"✅ {count} records in {elapsed:.1f}s ({count / elapsed if elapsed else 0:.0f}/s) → {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
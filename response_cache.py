@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI Response Cache
+ベンチマーク応答のコンテンツアドレス型ディスクキャッシュ（記録/再生、LRU容量制限）
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+from results_store import results_dir
+
+CACHE_DIR_NAME = 'response_cache'
+DIGESTS_FILE = 'digests.json'
+MODES = ('record', 'replay', 'auto')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Result fields worth replaying; timing is kept so reports look like the recorded run
+STORED_FIELDS = ('success', 'status', 'data', 'content', 'error', 'timing', 'counters', 'usage')
+
+
+def cache_key(digest, endpoint, messages, params):
+    """sha256 over the canonical JSON of everything that determines the output"""
+    canonical = json.dumps(
+        {'digest': digest, 'endpoint': endpoint, 'messages': messages, 'params': params},
+        sort_keys=True, ensure_ascii=False, separators=(',', ':')
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """On-disk chat response cache keyed by (model digest, messages, sampling params).
+
+    Modes:
+    - record: always call the server and store the response
+    - replay: serve only from the cache; a miss is an error, the server is never called
+    - auto:   serve hits, call the server and store on a miss
+
+    Entries are files named by their key. A hit touches the file's mtime,
+    and the least recently used files are evicted once the cache grows past
+    max_bytes. Model digests are saved alongside so replay works offline.
+    """
+
+    def __init__(self, mode='auto', directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        if mode not in MODES:
+            raise ValueError(f'Unknown cache mode: {mode}')
+        self.mode = mode
+        self.directory = directory or os.path.join(results_dir(), CACHE_DIR_NAME)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        self.digests = self._load_digests()
+        self._unknown = set()
+        self.size = sum(size for _, size, _ in self._entries())
+
+    # MARK: - Storage
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.json')
+
+    def _entries(self):
+        """(path, size, mtime) of every stored response"""
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.json'):
+                    stat = entry.stat()
+                    yield entry.path, stat.st_size, stat.st_mtime
+
+    def _load_digests(self):
+        try:
+            with open(os.path.join(self.directory, DIGESTS_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_digests(self):
+        path = os.path.join(self.directory, DIGESTS_FILE)
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.digests, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key, entry):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        body = json.dumps(entry, ensure_ascii=False).encode('utf-8')
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(body)
+
+        with self._lock:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp, path)
+            self.size += len(body) - previous
+            self.stats['stores'] += 1
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is back under 90% of max_bytes"""
+        target = self.max_bytes * 0.9
+        for path, size, _ in sorted(self._entries(), key=lambda e: e[2]):
+            if self.size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
+            self.stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            for path, _, _ in list(self._entries()):
+                os.remove(path)
+            self.size = 0
+
+    # MARK: - Lookup
+
+    def model_digest(self, client, model):
+        """Digest of the model's weights, so a re-pulled model never hits stale entries"""
+        if model in self.digests or model in self._unknown or self.mode == 'replay':
+            return self.digests.get(model, f'unknown:{model}')
+
+        result = client.tags(timeout=10)
+        with self._lock:
+            if result['success']:
+                for entry in (result['data'] or {}).get('models', []):
+                    self.digests[entry['name']] = entry.get('digest', '')
+                self._save_digests()
+            if model not in self.digests:
+                # Not installed (or server down): don't ask again on every request
+                self._unknown.add(model)
+        return self.digests.get(model, f'unknown:{model}')
+
+    def fetch(self, client, endpoint, model, messages, params, send):
+        """Return the cached result for this request, or call send() according to the mode"""
+        key = cache_key(self.model_digest(client, model), endpoint, messages, params)
+
+        if self.mode != 'record':
+            entry = self.get(key)
+            if entry is not None:
+                with self._lock:
+                    self.stats['hits'] += 1
+                result = {field: entry.get(field) for field in STORED_FIELDS}
+                result['cached'] = True
+                if result['timing']:
+                    client._record(result['timing'])
+                return result
+
+        with self._lock:
+            self.stats['misses'] += 1
+
+        if self.mode == 'replay':
+            return {
+                'success': False,
+                'status': None,
+                'data': None,
+                'content': None,
+                'error': f'Not in response cache (replay mode): {model}',
+                'timing': {'total': 0.0, 'model': 0.0, 'client_overhead': 0.0, 'source': 'cache'},
+                'counters': None,
+                'cached': False
+            }
+
+        result = send()
+        # Transport failures and server errors (overload, model load failures) say nothing
+        # about the model's answer and must not be replayed
+        if result['success'] and 200 <= (result['status'] or 0) < 300:
+            entry = {field: result.get(field) for field in STORED_FIELDS}
+            entry['model'] = model
+            entry['endpoint'] = endpoint
+            entry['recorded_at'] = time.time()
+            self.put(key, entry)
+        result['cached'] = False
+        return result
+
+    def print_stats(self):
+        total = self.stats['hits'] + self.stats['misses']
+        rate = self.stats['hits'] / total * 100 if total else 0.0
+        print(f"\n🗄️  Response cache ({self.mode}): {self.stats['hits']}/{total} hits ({rate:.0f}%), "
+              f"{self.stats['stores']} stored, {self.stats['evictions']} evicted, "
+              f"{self.size / 1024 / 1024:.1f}MB in {self.directory}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ChirAI response cache")
+    parser.add_argument('--dir', help='cache directory (default: <results dir>/response_cache)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('stats', help='show cache size and entry count')
+    commands.add_parser('clear', help='delete every cached response')
+    evict_cmd = commands.add_parser('evict', help='evict least recently used entries down to a size')
+    evict_cmd.add_argument('--max-mb', type=float, required=True)
+    args = parser.parse_args()
+
+    cache = ResponseCache('auto', args.dir)
+    if args.command == 'stats':
+        entries = list(cache._entries())
+        print(f"🗄️  {cache.directory}: {len(entries)} responses, {cache.size / 1024 / 1024:.1f}MB, "
+              f"{len(cache.digests)} model digests")
+    elif args.command == 'clear':
+        cache.clear()
+        print(f"🧹 Cleared {cache.directory}")
+    else:
+        cache.max_bytes = args.max_mb * 1024 * 1024
+        with cache._lock:
+            cache._evict()
+        print(f"🧹 Evicted {cache.stats['evictions']} responses, {cache.size / 1024 / 1024:.1f}MB left")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
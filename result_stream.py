@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI Result Stream
+テスト結果を1件ずつJSONLへ追記・フラッシュし、レポートはストリームから再構成
+"""
+
+import json
+import os
+import threading
+
+
+# Corrupt lines already warned about, so re-reading a stream per group stays quiet
+_reported = set()
+
+
+def truncate_partial_line(path, chunk_size=1 << 16):
+    """Cut a file back to its last complete line (a crash can leave half a record at the end)"""
+    with open(path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            start = max(0, pos - chunk_size)
+            f.seek(start)
+            newline = f.read(pos - start).rfind(b'\n')
+            if newline >= 0:
+                pos = start + newline + 1
+                break
+            pos = start
+        if pos < end:
+            f.truncate(pos)
+        return end - pos
+
+
+def open_for_append(path):
+    """Open a JSONL file for appending so new records never merge into a cut-off last line"""
+    if os.path.exists(path):
+        truncate_partial_line(path)
+    return open(path, 'a', encoding='utf-8')
+
+
+class ResultStream:
+    """Append-only JSONL writer: one record per finished test, flushed immediately.
+
+    A crash loses at most the test in flight; everything written before is
+    on disk and readable with read_results().
+    """
+
+    def __init__(self, path, append=False, fsync=False):
+        self.path = path
+        self.fsync = fsync
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = open_for_append(path) if append else open(path, 'w', encoding='utf-8')
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_results(path):
+    """Yield records from a JSONL stream, skipping (and reporting once) lines that are not valid JSON"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                if (path, number) not in _reported:
+                    _reported.add((path, number))
+                    cut = "" if line.endswith('\n') else " (cut off)"
+                    print(f"⚠️  Skipped corrupt line {number}{cut} in {os.path.basename(path)}")
+
+
+def group_keys(path, key, order=()):
+    """Distinct values of `key`: those listed in `order` first, then in first-seen order"""
+    seen = dict.fromkeys(order)
+    present = set()
+    for record in read_results(path):
+        present.add(record.get(key))
+        seen.setdefault(record.get(key), None)
+    return [value for value in seen if value in present]
+
+
+def iter_groups(path, key, order=()):
+    """(value, records) per distinct `key`, one pass over the file per group.
+
+    Only one group is held in memory at a time.
+    """
+    for value in group_keys(path, key, order):
+        yield value, [r for r in read_results(path) if r.get(key) == value]
+
+
+def write_grouped_json(path, json_path, key, wrap, order=()):
+    """Rebuild a grouped JSON document from a stream, one group at a time.
+
+    wrap(value, records) returns the JSON element for one group; elements
+    are written as they are built so the full document is never in memory.
+    """
+    with open(json_path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for i, (value, records) in enumerate(iter_groups(path, key, order)):
+            f.write(',\n' if i else '\n')
+            f.write(json.dumps(wrap(value, records), ensure_ascii=False, indent=2, default=str))
+        f.write('\n]')
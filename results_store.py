@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI Results Store
+ベンチマーク結果の追記型履歴DB（SQLite）と回帰検出
+"""
+
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import uuid
+from datetime import datetime
+
+from bench_stats import shift_test
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_NAME = 'benchmark_history.sqlite'
+
+# Metrics where a larger value is an improvement; everything else is a cost
+HIGHER_IS_BETTER = ('tokens_per_sec', 'throughput', 'quality_score', 'success', 'sustainable_rate')
+# Sizes and counts describe the workload rather than its performance
+NOT_COMPARED = ('_count', 'count', 'response_length', 'completion_tokens', 'requests', 'completed',
+                'target_rate', 'offered_rate', 'duration_s', 'concurrent_success')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    suite TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    git_revision TEXT,
+    host TEXT,
+    metadata TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL REFERENCES runs(run_id),
+    model TEXT NOT NULL,
+    test TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_run ON results(run_id);
+CREATE INDEX IF NOT EXISTS idx_results_key ON results(model, test, metric);
+CREATE INDEX IF NOT EXISTS idx_runs_suite ON runs(suite, started_at);
+"""
+# Runs recorded before sources were tagged were all live
+SOURCE_SQL = "COALESCE(json_extract(metadata, '$.source'), 'live')"
+RUN_KEYS = ('run_id', 'suite', 'started_at', 'git_revision', 'host', 'source')
+
+
+def results_dir(directory=None):
+    """Output directory for result files: argument, CHIRAI_RESULTS_DIR, or the repo root"""
+    path = directory or os.environ.get('CHIRAI_RESULTS_DIR') or REPO_DIR
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def results_path(filename, directory=None):
+    return os.path.join(results_dir(directory), filename)
+
+
+def git_revision():
+    try:
+        result = subprocess.run(
+            ['git', 'describe', '--always', '--dirty'],
+            capture_output=True, text=True, timeout=5, cwd=REPO_DIR
+        )
+        if result.returncode == 0:
+            return result.stdout.strip()
+    except Exception:
+        pass
+    return None
+
+
+def numeric_metrics(values, exclude=(), prefix=''):
+    """Keep numbers and lists of numbers from a result/details dict, flattening nested dicts"""
+    metrics = {}
+    if not isinstance(values, dict):
+        return metrics
+    for key, value in values.items():
+        if key in exclude:
+            continue
+        key = f'{prefix}{key}'
+        if isinstance(value, dict):
+            metrics.update(numeric_metrics(value, exclude, f'{key}_'))
+        elif isinstance(value, bool):
+            metrics[key] = 1.0 if value else 0.0
+        elif isinstance(value, (int, float)):
+            metrics[key] = float(value)
+        elif isinstance(value, list) and value and all(
+                isinstance(v, (int, float)) and not isinstance(v, bool) for v in value):
+            metrics[key] = [float(v) for v in value]
+    return metrics
+
+
+def run_source(client):
+    """'replay' for response-cache replays, 'mock' for mock_ollama_server, else 'live'.
+
+    Only live runs are real measurements worth keeping in the catalog.
+    """
+    cache = getattr(client, 'cache', None)
+    if cache is not None and cache.mode == 'replay':
+        return 'replay'
+    result = client.version(timeout=5)
+    if result['success'] and 'mock' in str((result['data'] or {}).get('version', '')):
+        return 'mock'
+    return 'live'
+
+
+def compared_metric(metric):
+    return not any(metric.endswith(suffix) for suffix in NOT_COMPARED)
+
+
+def higher_is_better(metric):
+    return any(metric.endswith(suffix) for suffix in HIGHER_IS_BETTER)
+
+
+class ResultsStore:
+    """Append-only benchmark history keyed by run, model, test and git revision"""
+
+    def __init__(self, directory=None):
+        self.path = os.path.join(results_dir(directory), DB_NAME)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # MARK: - Writing
+
+    def start_run(self, suite, started_at=None, metadata=None, run_id=None):
+        started_at = started_at or datetime.now()
+        run_id = run_id or f"{suite}-{started_at.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        with self.conn:
+            self.conn.execute(
+                'INSERT INTO runs (run_id, suite, started_at, git_revision, host, metadata) VALUES (?, ?, ?, ?, ?, ?)',
+                (run_id, suite, started_at.isoformat(), git_revision(), socket.gethostname(),
+                 json.dumps(metadata or {}, ensure_ascii=False))
+            )
+        return run_id
+
+    def record(self, run_id, model, test, metrics):
+        """Append metrics for one test; list values are stored as repeated samples"""
+        rows = []
+        for metric, value in metrics.items():
+            samples = value if isinstance(value, list) else [value]
+            rows.extend((run_id, model or '', test, metric, float(v)) for v in samples if v is not None)
+        with self.conn:
+            self.conn.executemany(
+                'INSERT INTO results (run_id, model, test, metric, value) VALUES (?, ?, ?, ?, ?)', rows
+            )
+        return len(rows)
+
+    # MARK: - Reading
+
+    def runs(self, suite=None, limit=20, source=None, host=None):
+        query = f'SELECT run_id, suite, started_at, git_revision, host, {SOURCE_SQL} FROM runs'
+        conditions, params = [], []
+        for column, value in (('suite', suite), (SOURCE_SQL, source), ('host', host)):
+            if value:
+                conditions.append(f'{column} = ?')
+                params.append(value)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY started_at DESC LIMIT ?'
+        params.append(limit)
+        return [dict(zip(RUN_KEYS, row)) for row in self.conn.execute(query, params)]
+
+    def run_info(self, run_id):
+        row = self.conn.execute(
+            f'SELECT run_id, suite, started_at, git_revision, host, {SOURCE_SQL} FROM runs WHERE run_id = ?',
+            (run_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(RUN_KEYS, row))
+
+    def samples(self, run_ids):
+        """{(model, test, metric): [values]} for the given runs"""
+        grouped = {}
+        if not run_ids:
+            return grouped
+        placeholders = ','.join('?' * len(run_ids))
+        for model, test, metric, value in self.conn.execute(
+                f'SELECT model, test, metric, value FROM results WHERE run_id IN ({placeholders})', run_ids):
+            grouped.setdefault((model, test, metric), []).append(value)
+        return grouped
+
+    def baseline_runs(self, run_id, window=5):
+        """Previous runs of the same suite and source, so mock runs never set a live baseline"""
+        current = self.run_info(run_id)
+        rows = self.conn.execute(
+            f'SELECT run_id FROM runs WHERE suite = ? AND {SOURCE_SQL} = ? AND started_at < ? '
+            'ORDER BY started_at DESC LIMIT ?',
+            (current['suite'], current['source'], current['started_at'], window)
+        )
+        return [row[0] for row in rows]
+
+    # MARK: - Regression detection
+
+    def compare(self, run_id, window=5, alpha=0.05, min_change=0.05, metrics=None):
+        """Flag metrics of `run_id` that got significantly worse than the previous `window` runs"""
+        baseline_ids = self.baseline_runs(run_id, window)
+        current = self.samples([run_id])
+        baseline = self.samples(baseline_ids)
+
+        findings = []
+        for key, values in sorted(current.items()):
+            model, test, metric = key
+            if metrics and metric not in metrics:
+                continue
+            if not metrics and not compared_metric(metric):
+                continue
+            reference = baseline.get(key, [])
+            if not reference:
+                continue
+
+            # Test for "worse": flip sign for metrics where higher is better
+            sign = -1.0 if higher_is_better(metric) else 1.0
+            t, p_value = shift_test([sign * v for v in values], [sign * v for v in reference])
+            if p_value is None:
+                continue
+
+            current_mean = sum(values) / len(values)
+            baseline_mean = sum(reference) / len(reference)
+            change = (current_mean - baseline_mean) / abs(baseline_mean) if baseline_mean else 0.0
+            worse_by = sign * change
+
+            findings.append({
+                'model': model,
+                'test': test,
+                'metric': metric,
+                'current_mean': current_mean,
+                'baseline_mean': baseline_mean,
+                'change': change,
+                't': t,
+                'p_value': p_value,
+                'regression': p_value < alpha and worse_by > min_change
+            })
+
+        return {
+            'run_id': run_id,
+            'baseline_runs': baseline_ids,
+            'findings': findings,
+            'regressions': [f for f in findings if f['regression']]
+        }
+
+
+def record_run(suite, records, started_at=None, metadata=None, directory=None, source='live'):
+    """Append one run to the store; records are (model, test, metrics) tuples.
+
+    source is run_source() of the client; it is kept in the run metadata.
+    """
+    with ResultsStore(directory) as store:
+        run_id = store.start_run(suite, started_at, {**(metadata or {}), 'source': source})
+        for model, test, metrics in records:
+            store.record(run_id, model, test, metrics)
+    return run_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ChirAI benchmark history")
+    parser.add_argument('--dir', help='results directory (default: CHIRAI_RESULTS_DIR or repo root)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    runs_cmd = commands.add_parser('runs', help='list recorded runs')
+    runs_cmd.add_argument('--suite')
+    runs_cmd.add_argument('--limit', type=int, default=20)
+
+    compare_cmd = commands.add_parser('compare', help='flag regressions against previous runs')
+    compare_cmd.add_argument('--run', help='run to check (default: latest run of --suite)')
+    compare_cmd.add_argument('--suite')
+    compare_cmd.add_argument('--baseline', type=int, default=5, help='number of previous runs in the baseline window')
+    compare_cmd.add_argument('--alpha', type=float, default=0.05)
+    compare_cmd.add_argument('--min-change', type=float, default=0.05, help='minimum relative change to flag')
+    compare_cmd.add_argument('--metric', action='append', help='restrict to these metrics')
+    compare_cmd.add_argument('--all', action='store_true', help='print every compared metric')
+
+    args = parser.parse_args()
+
+    with ResultsStore(args.dir) as store:
+        if args.command == 'runs':
+            for run in store.runs(args.suite, args.limit):
+                print(f"{run['started_at'][:19]}  {run['run_id']:<48} {run['git_revision'] or '-':<16} "
+                      f"{run['source']:<7} {run['host']}")
+            return 0
+
+        run_id = args.run
+        if not run_id:
+            latest = store.runs(args.suite, 1)
+            if not latest:
+                print("❌ No runs recorded")
+                return 1
+            run_id = latest[0]['run_id']
+        if store.run_info(run_id) is None:
+            print(f"❌ Unknown run: {run_id}")
+            return 1
+
+        report = store.compare(run_id, args.baseline, args.alpha, args.min_change, args.metric)
+
+    print(f"🔍 {run_id} vs {len(report['baseline_runs'])} previous runs")
+    shown = report['findings'] if args.all else report['regressions']
+    for f in shown:
+        icon = "🔴" if f['regression'] else "  "
+        print(f"{icon} {f['model'] or '-'} / {f['test']} / {f['metric']}: "
+              f"{f['baseline_mean']:.3f} → {f['current_mean']:.3f} "
+              f"({f['change'] * 100:+.1f}%, p={f['p_value']:.4f})")
+
+    if report['regressions']:
+        print(f"\n❌ {len(report['regressions'])} significant regressions")
+        return 1
+    print(f"\n✅ No significant regressions ({len(report['findings'])} metrics compared)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI Server Process Sampler
+/proc からOllamaサーバー（ランナー子プロセスを含む）のRSS・CPU・スレッド数を一定間隔で計測
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+from ollama_client import normalize_base_url
+
+PROC = '/proc'
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '::1', '0.0.0.0', '')
+LISTEN = '0A'
+# CPU over shorter windows is mostly clock-tick rounding
+MIN_CPU_WINDOW = 0.05
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def available():
+    """Process sampling needs Linux /proc"""
+    return os.path.isdir(os.path.join(PROC, 'self'))
+
+
+def _read(pid, name):
+    try:
+        with open(os.path.join(PROC, str(pid), name), 'r', encoding='utf-8', errors='replace') as f:
+            return f.read()
+    except OSError:
+        # The process exited or belongs to someone we may not inspect
+        return None
+
+
+def _pids():
+    return [int(entry) for entry in os.listdir(PROC) if entry.isdigit()]
+
+
+# MARK: - Discovery
+
+def pid_listening_on(port):
+    """The process with a listening TCP socket on port (needs access to its /proc/<pid>/fd)"""
+    inodes = set()
+    for table in ('net/tcp', 'net/tcp6'):
+        for line in (_read('self', table) or '').splitlines()[1:]:
+            fields = line.split()
+            if len(fields) > 9 and fields[3] == LISTEN and int(fields[1].rsplit(':', 1)[1], 16) == port:
+                inodes.add(fields[9])
+    if not inodes:
+        return None
+    targets = {f'socket:[{inode}]' for inode in inodes}
+    for pid in _pids():
+        fd_dir = os.path.join(PROC, str(pid), 'fd')
+        try:
+            if any(os.readlink(os.path.join(fd_dir, fd)) in targets for fd in os.listdir(fd_dir)):
+                return pid
+        except OSError:
+            continue
+    return None
+
+
+def pid_by_name(name='ollama'):
+    """An `ollama serve` process, for servers run by another user whose sockets we cannot map"""
+    for pid in _pids():
+        cmdline = (_read(pid, 'cmdline') or '').split('\0')
+        if cmdline and os.path.basename(cmdline[0]) == name and 'serve' in cmdline[1:]:
+            return pid
+    return None
+
+
+def find_server_pid(base_url=None, pid=None):
+    """Server pid: explicit (or OLLAMA_PID), else whoever listens on a local base_url port, else by name"""
+    pid = pid or os.environ.get('OLLAMA_PID')
+    if pid:
+        return int(pid)
+    if not available():
+        return None
+    url = urlparse(normalize_base_url(base_url))
+    if url.hostname in LOCAL_HOSTS or url.hostname is None:
+        found = pid_listening_on(url.port or 11434)
+        if found:
+            return found
+    return pid_by_name()
+
+
+def process_tree(root):
+    """root and all its descendants (Ollama runs each loaded model in a runner child)"""
+    children = {}
+    for pid in _pids():
+        stat = _read(pid, 'stat')
+        if stat:
+            children.setdefault(int(stat.rsplit(')', 1)[1].split()[1]), []).append(pid)
+    tree, pending = [], [root]
+    while pending:
+        pid = pending.pop()
+        tree.append(pid)
+        pending.extend(children.get(pid, []))
+    return tree
+
+
+# MARK: - Sampling
+
+def process_usage(pid):
+    """(rss_bytes, threads, cpu_ticks) of one process, None once it has exited"""
+    status, stat = _read(pid, 'status'), _read(pid, 'stat')
+    if not status or not stat:
+        return None
+    values = dict(line.split(':', 1) for line in status.splitlines() if ':' in line)
+    # Kernel threads have no VmRSS
+    rss_kb = int(values.get('VmRSS', '0 kB').split()[0])
+    fields = stat.rsplit(')', 1)[1].split()
+    return rss_kb * 1024, int(values.get('Threads', '0')), int(fields[11]) + int(fields[12])
+
+
+class ProcessSampler:
+    """Poll RSS, CPU and thread count of a process tree on a background thread.
+
+    The tree is re-read every sample so runners started mid-test are
+    counted. CPU is percent of one core over each interval (200 = two
+    cores busy). Use as a context manager or start()/stop(); stop()
+    returns the summary.
+    """
+
+    def __init__(self, pid, interval=0.25):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._ticks = {}
+        self._last = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        now = time.perf_counter()
+        usage = {pid: process_usage(pid) for pid in process_tree(self.pid)}
+        usage = {pid: u for pid, u in usage.items() if u is not None}
+        if not usage:
+            return None
+        ticks = {pid: u[2] for pid, u in usage.items()}
+        cpu = None
+        if self._last is None:
+            self._ticks, self._last = ticks, now
+        elif now - self._last >= MIN_CPU_WINDOW:
+            # Processes that appeared since the last sample used all their ticks inside the interval
+            busy = sum(t - self._ticks.get(pid, 0) for pid, t in ticks.items())
+            cpu = busy / CLOCK_TICKS / (now - self._last) * 100
+            self._ticks, self._last = ticks, now
+        sample = {
+            'time': now,
+            'rss_bytes': sum(u[0] for u in usage.values()),
+            'threads': sum(u[1] for u in usage.values()),
+            'processes': len(usage),
+            'cpu_percent': cpu
+        }
+        self.samples.append(sample)
+        return sample
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self.sample()
+        self._thread = threading.Thread(target=self._run, name='process-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        # A closing sample, so a test shorter than one interval still gets a reading
+        self.sample()
+        return self.summary()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def summary(self):
+        """Peak and average per metric, None if the process could not be read"""
+        if not self.samples:
+            return None
+        rss = [s['rss_bytes'] for s in self.samples]
+        threads = [s['threads'] for s in self.samples]
+        cpu = [s['cpu_percent'] for s in self.samples if s['cpu_percent'] is not None]
+        return {
+            'pid': self.pid,
+            'samples': len(self.samples),
+            'rss_peak_mb': max(rss) / 2**20,
+            'rss_avg_mb': sum(rss) / len(rss) / 2**20,
+            'cpu_peak_percent': max(cpu) if cpu else None,
+            'cpu_avg_percent': sum(cpu) / len(cpu) if cpu else None,
+            'threads_peak': max(threads),
+            'threads_avg': sum(threads) / len(threads),
+            'processes_peak': max(s['processes'] for s in self.samples)
+        }
+
+
+def describe(summary):
+    """One-line peak/average summary for test messages"""
+    cpu = (f", CPU {summary['cpu_avg_percent']:.0f}% avg / {summary['cpu_peak_percent']:.0f}% peak"
+           if summary['cpu_peak_percent'] is not None else "")
+    return (f"server RSS {summary['rss_peak_mb']:.1f}MB peak / {summary['rss_avg_mb']:.1f}MB avg{cpu}, "
+            f"{summary['threads_peak']} threads in {summary['processes_peak']} processes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sample RSS, CPU and threads of the Ollama process tree")
+    parser.add_argument('--pid', type=int, help='server pid (default: OLLAMA_PID, the base URL port, or `ollama serve`)')
+    parser.add_argument('--base-url', help='Ollama server (default: OLLAMA_HOST or localhost:11434)')
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds between samples')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds to sample')
+    args = parser.parse_args()
+
+    if not available():
+        print("❌ /proc is not available; process sampling needs Linux")
+        return 1
+    pid = find_server_pid(args.base_url, args.pid)
+    if pid is None:
+        print("❌ Ollama server process not found (pass --pid or set OLLAMA_PID)")
+        return 1
+
+    print(f"🔍 Sampling process tree of pid {pid} every {args.interval:g}s for {args.duration:g}s")
+    sampler = ProcessSampler(pid, args.interval)
+    sampler.start()
+    try:
+        deadline = time.perf_counter() + args.duration
+        shown = 0
+        while time.perf_counter() < deadline:
+            time.sleep(min(args.interval, max(0.0, deadline - time.perf_counter())))
+            for sample in sampler.samples[shown:]:
+                cpu = f"{sample['cpu_percent']:.0f}%" if sample['cpu_percent'] is not None else "-"
+                print(f"  RSS {sample['rss_bytes'] / 2**20:8.1f}MB, CPU {cpu:>5}, "
+                      f"{sample['threads']} threads, {sample['processes']} processes")
+            shown = len(sampler.samples)
+    except KeyboardInterrupt:
+        pass
+    summary = sampler.stop()
+    if summary is None:
+        print("❌ Process exited before it could be sampled")
+        return 1
+    print(f"\n📊 {describe(summary)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI Suite Harness
+テスト単位・スイート単位のタイムアウトと実行中リクエストのキャンセル
+"""
+
+import threading
+import time
+
+from ollama_client import cancel_requests, release_cancellation
+
+PASSED = 'passed'
+FAILED = 'failed'
+TIMEOUT = 'timeout'
+
+
+class SuiteDeadline:
+    """Wall-clock budget shared by every test of one suite run"""
+
+    def __init__(self, seconds=None):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds if seconds else None
+
+    def remaining(self):
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def budget(self, timeout):
+        """Per-test timeout clipped to what is left of the suite"""
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        if timeout is None:
+            return remaining
+        return min(timeout, remaining)
+
+
+def run_with_timeout(func, timeout=None, grace=2.0):
+    """Run func in a daemon thread and cancel its HTTP requests if it overruns.
+
+    Returns {'outcome': 'completed' | 'error' | 'timeout', 'value', 'error',
+    'duration', 'cancelled'}. A test that ignores cancellation is abandoned
+    after `grace` seconds; being a daemon thread it cannot block exit.
+    Only requests made from the test's own thread are cancelled; helper
+    threads it starts end at their read timeout.
+    """
+    box = {}
+
+    def target():
+        try:
+            box['value'] = func()
+        except Exception as e:
+            box['error'] = e
+        finally:
+            release_cancellation(threading.get_ident())
+
+    worker = threading.Thread(target=target, name='suite-test', daemon=True)
+    start = time.time()
+    worker.start()
+    worker.join(timeout)
+
+    if worker.is_alive():
+        cancelled = cancel_requests(worker.ident)
+        worker.join(grace)
+        return {
+            'outcome': TIMEOUT,
+            'value': None,
+            'error': None,
+            'duration': time.time() - start,
+            'cancelled': cancelled
+        }
+
+    return {
+        'outcome': 'error' if 'error' in box else 'completed',
+        'value': box.get('value'),
+        'error': box.get('error'),
+        'duration': time.time() - start,
+        'cancelled': 0
+    }
+
+
+def execute_test(test_func, timeout=None, deadline=None):
+    """Run one suite test; returns status (passed/failed/timeout), success, message, details, duration.
+
+    test_func returns the suites' usual {'success', 'message', 'details'} dict.
+    Exceptions are reported via 'exception' so each suite keeps its own wording.
+    """
+    if deadline is not None:
+        if deadline.expired():
+            return {
+                'status': TIMEOUT,
+                'success': False,
+                'message': f'Suite deadline ({deadline.seconds:g}s) reached before start',
+                'details': {},
+                'duration': 0.0,
+                'exception': None
+            }
+        timeout = deadline.budget(timeout)
+
+    run = run_with_timeout(test_func, timeout)
+
+    if run['outcome'] == TIMEOUT:
+        message = f'Timed out after {timeout:.1f}s'
+        if run['cancelled']:
+            message += f" ({run['cancelled']} in-flight requests cancelled)"
+        return {
+            'status': TIMEOUT,
+            'success': False,
+            'message': message,
+            'details': {},
+            'duration': run['duration'],
+            'exception': None
+        }
+
+    if run['outcome'] == 'error':
+        return {
+            'status': FAILED,
+            'success': False,
+            'message': str(run['error']),
+            'details': {},
+            'duration': run['duration'],
+            'exception': run['error']
+        }
+
+    result = run['value'] or {}
+    success = result.get('success', False)
+    return {
+        'status': PASSED if success else FAILED,
+        'success': success,
+        'message': result.get('message', ''),
+        'details': result.get('details', {}),
+        'duration': run['duration'],
+        'exception': None
+    }
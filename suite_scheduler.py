@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI Suite Scheduler
+依存関係とリソースグループを考慮したテストの並列実行
+"""
+
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class ScheduledTest:
+    def __init__(self, name, func, depends_on=(), resources=(), exclusive=False):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.resources = tuple(resources)
+        self.exclusive = exclusive
+
+
+class SuiteScheduler:
+    """Run declared tests on a worker pool.
+
+    - depends_on: tests that must finish (successfully) first; if one
+      fails, `on_skip(name, failed)` is used instead of running the test.
+    - resources: named groups such as "model:gemma3:1b"; at most
+      resource_limits[name] (default `default_limit`) tests hold a group
+      at once.
+    - exclusive: the test runs alone and acts as a barrier in declaration
+      order, so latency measurements never overlap other traffic.
+    """
+
+    def __init__(self, max_workers=4, resource_limits=None, default_limit=1,
+                 succeeded=bool, on_skip=None):
+        self.max_workers = max_workers
+        self.resource_limits = resource_limits or {}
+        self.default_limit = default_limit
+        self.succeeded = succeeded
+        self.on_skip = on_skip or (lambda name, failed: None)
+        self.tests = []
+
+    def add(self, name, func, depends_on=(), resources=(), exclusive=False):
+        if any(t.name == name for t in self.tests):
+            raise ValueError(f'Duplicate test name: {name}')
+        self.tests.append(ScheduledTest(name, func, depends_on, resources, exclusive))
+
+    def _limit(self, resource):
+        return self.resource_limits.get(resource, self.default_limit)
+
+    def run(self):
+        """Run everything; returns {name: result} in declaration order"""
+        names = {t.name for t in self.tests}
+        for test in self.tests:
+            unknown = [d for d in test.depends_on if d not in names]
+            if unknown:
+                raise ValueError(f'{test.name} depends on unknown tests: {unknown}')
+
+        pending = list(self.tests)
+        running = {}
+        results = {}
+        in_use = Counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                exclusive_running = any(t.exclusive for t in running.values())
+
+                for test in list(pending):
+                    waiting = [d for d in test.depends_on if d not in results]
+                    if waiting:
+                        if test.exclusive:
+                            break
+                        continue
+
+                    failed = [d for d in test.depends_on if not self.succeeded(results[d])]
+                    if failed:
+                        pending.remove(test)
+                        results[test.name] = self.on_skip(test.name, failed)
+                        continue
+
+                    if exclusive_running or len(running) >= self.max_workers:
+                        break
+                    if test.exclusive:
+                        if not running:
+                            pending.remove(test)
+                            running[pool.submit(test.func)] = test
+                        break
+                    if any(in_use[r] >= self._limit(r) for r in test.resources):
+                        continue
+
+                    pending.remove(test)
+                    in_use.update(test.resources)
+                    running[pool.submit(test.func)] = test
+
+                if not running:
+                    if pending and not any(
+                            all(d in results for d in t.depends_on) for t in pending):
+                        raise ValueError(f'Dependency cycle among: {[t.name for t in pending]}')
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    test = running.pop(future)
+                    in_use.subtract(test.resources)
+                    try:
+                        results[test.name] = future.result()
+                    except Exception as e:
+                        results[test.name] = e
+
+        return {t.name: results.get(t.name) for t in self.tests}
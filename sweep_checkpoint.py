@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI Sweep Checkpoint
+(モデル, プロンプト, 繰り返し, エンドポイント) セル単位の完了記録と --resume による再開
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from result_stream import open_for_append
+
+# Settings that change what a cell measures; a resumed sweep must match them
+MATCHED_SETTINGS = ('suite', 'prompts', 'backend', 'stream')
+
+
+def prompts_digest(test_cases):
+    """Short digest of the prompt set, so resumed cells refer to the same prompts"""
+    canonical = json.dumps(test_cases, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def cell_key(model, index, repetition, endpoint=None):
+    return (model, index, repetition, endpoint)
+
+
+class SweepCheckpoint:
+    """Append-only log of completed sweep cells.
+
+    The first line holds the sweep settings; every later line is one
+    completed (model, prompt index, repetition, endpoint) cell, flushed as
+    soon as its result is on disk. Only successful cells are logged, so
+    failures are retried on resume.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.settings = None
+        self.done = set()
+        self._lock = threading.Lock()
+        self._file = None
+
+    def start(self, settings, resume=False):
+        """Open the checkpoint; returns the number of cells already done.
+
+        Without resume any previous checkpoint is discarded. Resuming with
+        different MATCHED_SETTINGS raises ValueError: those cells measured
+        something else.
+        """
+        if resume and os.path.exists(self.path):
+            previous, self.done = self._load()
+            mismatched = [key for key in MATCHED_SETTINGS if previous.get(key) != settings.get(key)]
+            if mismatched:
+                raise ValueError(f"Checkpoint {self.path} was written with different "
+                                 f"{', '.join(mismatched)}; run without --resume to start over")
+            self._file = open_for_append(self.path)
+        else:
+            self.done = set()
+            self._file = open(self.path, 'w', encoding='utf-8')
+            self._append({'settings': settings})
+        self.settings = settings
+        return len(self.done)
+
+    def _load(self):
+        settings, done = {}, set()
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut off by a crash: that cell simply runs again
+                    continue
+                if 'settings' in entry:
+                    settings = entry['settings']
+                elif 'cell' in entry:
+                    done.add(cell_key(*entry['cell']))
+        return settings, done
+
+    def _append(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def is_done(self, model, index, repetition, endpoint=None):
+        return cell_key(model, index, repetition, endpoint) in self.done
+
+    def mark_done(self, model, index, repetition, endpoint=None):
+        with self._lock:
+            key = cell_key(model, index, repetition, endpoint)
+            if key not in self.done:
+                self.done.add(key)
+                self._append({'cell': list(key)})
+
+    def close(self):
+        with self._lock:
+            if self._file is not None and not self._file.closed:
+                self._file.close()
@@ -1,14 +1,17 @@
 #!/usr/bin/env python3
 
-import subprocess
 import json
 import time
-import os
 from datetime import datetime
 import sys
 
+from model_catalog import get_model_index
+from ollama_client import OllamaClient, get_client
+from server_process import ProcessSampler, describe, find_server_pid
+from suite_harness import TIMEOUT, SuiteDeadline, execute_test
+
 class WisbeeTestDashboard:
-    def __init__(self):
+    def __init__(self, test_timeout=30, suite_timeout=None, server_pid=None, sample_interval=0.25):
         self.test_categories = {
             "Infrastructure Tests": [
                 ("Ollama Service Health", self.test_ollama_health),
@@ -38,6 +41,12 @@ class WisbeeTestDashboard:
         }
         self.results = {}
         self.start_time = datetime.now()
+        self.client = get_client()
+        self.test_timeout = test_timeout
+        self.deadline = SuiteDeadline(suite_timeout)
+        # Ollamaサーバーのプロセスツリーを各テスト中にサンプリング
+        self.server_pid = find_server_pid(self.client.base_url, server_pid)
+        self.sample_interval = sample_interval
 
     def print_header(self):
         print("🧪 Wisbee iOS テストダッシュボード")
@@ -59,53 +68,44 @@ class WisbeeTestDashboard:
         print(f"\n📊 総テスト数: {total_tests}")
         print("")
 
-    def run_test(self, category, test_name, test_func):
-        """単一テストを実行"""
+    def run_test(self, category, test_name, test_func, timeout=None):
+        """単一テストを実行（タイムアウト時は実行中のリクエストをキャンセル）"""
         print(f"🔄 実行中: {test_name}")
-        start_time = time.time()
+        sampler = ProcessSampler(self.server_pid, self.sample_interval).start() if self.server_pid else None
+        outcome = execute_test(test_func, timeout or self.test_timeout, self.deadline)
+        server_process = sampler.stop() if sampler else None
+        duration = outcome['duration']
         
-        try:
-            result = test_func()
-            duration = time.time() - start_time
-            success = result.get('success', False)
-            
-            if category not in self.results:
-                self.results[category] = []
-            
-            self.results[category].append({
-                'name': test_name,
-                'success': success,
-                'duration': duration,
-                'message': result.get('message', ''),
-                'details': result.get('details', '')
-            })
-            
-            status = "✅ 成功" if success else "❌ 失敗"
+        if category not in self.results:
+            self.results[category] = []
+        
+        self.results[category].append({
+            'name': test_name,
+            'success': outcome['success'],
+            'status': outcome['status'],
+            'duration': duration,
+            'message': outcome['message'],
+            'details': outcome['details'] or '',
+            'server_process': server_process
+        })
+        
+        if outcome['exception'] is not None:
+            print(f"❌ 失敗 {test_name} - 例外: {outcome['message']}")
+        elif outcome['status'] == TIMEOUT:
+            print(f"⏰ タイムアウト {test_name} ({duration:.2f}s)")
+            print(f"   {outcome['message']}")
+        else:
+            status = "✅ 成功" if outcome['success'] else "❌ 失敗"
             print(f"{status} {test_name} ({duration:.2f}s)")
-            if not success:
-                print(f"   エラー: {result.get('message', 'Unknown error')}")
-                
-        except Exception as e:
-            duration = time.time() - start_time
-            if category not in self.results:
-                self.results[category] = []
-            
-            self.results[category].append({
-                'name': test_name,
-                'success': False,
-                'duration': duration,
-                'message': str(e),
-                'details': ''
-            })
-            print(f"❌ 失敗 {test_name} - 例外: {str(e)}")
+            if not outcome['success']:
+                print(f"   エラー: {outcome['message'] or 'Unknown error'}")
 
     # Test Implementations
     def test_ollama_health(self):
         try:
-            result = subprocess.run(['curl', '-s', 'http://localhost:11434/api/tags'], 
-                                  capture_output=True, text=True, timeout=5)
-            if result.returncode == 0:
-                data = json.loads(result.stdout)
+            result = self.client.tags(timeout=5)
+            if result['success']:
+                data = result['data']
                 model_count = len(data.get('models', []))
                 return {
                     'success': True, 
@@ -118,15 +118,14 @@ class WisbeeTestDashboard:
 
     def test_api_endpoints(self):
         endpoints = [
-            ('http://localhost:11434/api/tags', 'モデル一覧'),
-            ('http://localhost:11434/api/version', 'バージョン情報')
+            ('/api/tags', 'モデル一覧'),
+            ('/api/version', 'バージョン情報')
         ]
         
-        for url, desc in endpoints:
+        for path, desc in endpoints:
             try:
-                result = subprocess.run(['curl', '-s', url], 
-                                      capture_output=True, text=True, timeout=3)
-                if result.returncode != 0:
+                result = self.client.get(path, timeout=3)
+                if result['status'] is None:
                     return {'success': False, 'message': f'{desc} エンドポイント失敗'}
             except:
                 return {'success': False, 'message': f'{desc} タイムアウト'}
@@ -136,17 +135,9 @@ class WisbeeTestDashboard:
     def test_model_availability(self):
         required_models = ['gemma3:1b', 'qwen2.5:3b']
         try:
-            result = subprocess.run(['curl', '-s', 'http://localhost:11434/api/tags'], 
-                                  capture_output=True, text=True, timeout=5)
-            if result.returncode == 0:
-                data = json.loads(result.stdout)
-                available_models = [m['name'] for m in data.get('models', [])]
-                
-                missing = []
-                for model in required_models:
-                    if not any(model in available for available in available_models):
-                        missing.append(model)
-                
+            index = get_model_index(self.client).refresh()
+            if index.models:
+                missing = index.missing(required_models)
                 if missing:
                     return {'success': False, 'message': f'不足モデル: {", ".join(missing)}'}
                 return {'success': True, 'message': '必要モデル全て利用可能'}
@@ -165,28 +156,17 @@ class WisbeeTestDashboard:
 
     def _test_chat(self, model, message, test_type):
         try:
-            data = {
-                'model': model,
-                'messages': [{'role': 'user', 'content': message}],
-                'stream': False
-            }
+            result = self.client.chat(model, message, timeout=10)
             
-            result = subprocess.run([
-                'curl', '-s', '-X', 'POST',
-                'http://localhost:11434/v1/chat/completions',
-                '-H', 'Content-Type: application/json',
-                '-d', json.dumps(data)
-            ], capture_output=True, text=True, timeout=10)
-            
-            if result.returncode == 0:
-                response_data = json.loads(result.stdout)
-                if 'choices' in response_data and response_data['choices']:
-                    content = response_data['choices'][0]['message']['content']
-                    return {
-                        'success': True, 
-                        'message': f'{test_type} 成功',
-                        'details': f'応答: {content[:50]}...'
-                    }
+            if result['success']:
+                content = result['content']
+                timing = result['timing']
+                return {
+                    'success': True, 
+                    'message': f'{test_type} 成功',
+                    'details': f'応答: {content[:50]}... '
+                               f'(モデル {timing["model"]:.2f}s / オーバーヘッド {timing["client_overhead"] * 1000:.0f}ms)'
+                }
             return {'success': False, 'message': f'{test_type} 応答なし'}
         except Exception as e:
             return {'success': False, 'message': f'{test_type} エラー: {str(e)}'}
@@ -231,15 +211,17 @@ class WisbeeTestDashboard:
         return {'success': False, 'message': f'並行処理: {success_count}/3 成功'}
 
     def test_memory_usage(self):
-        # Simplified memory test
-        try:
-            result = subprocess.run(['ps', '-o', 'pid,rss', '-p', str(os.getpid())], 
-                                  capture_output=True, text=True)
-            if result.returncode == 0:
-                return {'success': True, 'message': 'メモリ使用量: 正常範囲'}
-            return {'success': False, 'message': 'メモリ測定失敗'}
-        except:
-            return {'success': False, 'message': 'メモリテストエラー'}
+        # テスト実行側ではなくOllamaサーバーのメモリを応答中に計測
+        if not self.server_pid:
+            return {'success': True, 'message': 'メモリテスト: サーバープロセス未検出のためスキップ'}
+        with ProcessSampler(self.server_pid, interval=min(self.sample_interval, 0.1)) as sampler:
+            result = self._test_chat('gemma3:1b', '日本の四季について簡単に説明してください。', 'メモリ')
+        summary = sampler.summary()
+        if summary is None:
+            return {'success': False, 'message': f'メモリ測定失敗 (pid {self.server_pid})'}
+        if not result['success']:
+            return {'success': False, 'message': f"{result['message']} ({describe(summary)})"}
+        return {'success': True, 'message': f"メモリ使用量: {describe(summary)}", 'details': summary}
 
     def test_chat_interface(self):
         # Simulated UI test
@@ -255,21 +237,10 @@ class WisbeeTestDashboard:
 
     def test_invalid_model(self):
         try:
-            data = {
-                'model': 'invalid:model',
-                'messages': [{'role': 'user', 'content': 'test'}],
-                'stream': False
-            }
-            
-            result = subprocess.run([
-                'curl', '-s', '-X', 'POST',
-                'http://localhost:11434/v1/chat/completions',
-                '-H', 'Content-Type: application/json',
-                '-d', json.dumps(data)
-            ], capture_output=True, text=True, timeout=5)
+            result = self.client.chat('invalid:model', 'test', timeout=5)
             
             # Should fail or return error
-            if result.returncode != 0 or 'error' in result.stdout.lower():
+            if not result['success']:
                 return {'success': True, 'message': '無効モデル: 正しくエラー処理'}
             return {'success': False, 'message': '無効モデル: エラー処理されず'}
         except:
@@ -282,12 +253,10 @@ class WisbeeTestDashboard:
     def test_network_error(self):
         # Test with wrong port
         try:
-            result = subprocess.run([
-                'curl', '-s', '--connect-timeout', '2',
-                'http://localhost:99999/api/tags'
-            ], capture_output=True, text=True)
+            with OllamaClient('http://localhost:99999', connect_timeout=2) as client:
+                result = client.tags()
             
-            if result.returncode != 0:
+            if not result['success']:
                 return {'success': True, 'message': 'ネットワークエラー: 正しく処理'}
             return {'success': False, 'message': 'ネットワークエラー: 検出されず'}
         except:
@@ -335,7 +304,8 @@ class WisbeeTestDashboard:
             failed_tests = [test for test in tests if not test['success']]
             if failed_tests:
                 for test in failed_tests:
-                    print(f"    ❌ {test['name']}: {test['message']}")
+                    icon = "⏰" if test.get('status') == TIMEOUT else "❌"
+                    print(f"    {icon} {test['name']}: {test['message']}")
         
         overall_percentage = (total_passed / total_tests * 100) if total_tests > 0 else 0
         duration = (datetime.now() - self.start_time).total_seconds()
@@ -353,9 +323,28 @@ class WisbeeTestDashboard:
         else:
             print("❌ 注意が必要です。複数の問題があります。")
         
+        sampled = [test for tests in self.results.values() for test in tests if test.get('server_process')]
+        if sampled:
+            print("\n🧠 Ollamaサーバーのリソース使用量 (ピークRSS順):")
+            for test in sorted(sampled, key=lambda t: -t['server_process']['rss_peak_mb']):
+                print(f"    {test['name']}: {describe(test['server_process'])}")
+        
+        self.client.print_overhead_report()
+        
         print("\n📱 アプリは現在シミュレータで実行中です。")
         print("🔧 XcodeとSimulatorが開いています。")
 
 if __name__ == "__main__":
-    dashboard = WisbeeTestDashboard()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Wisbee iOS test dashboard")
+    parser.add_argument('--test-timeout', type=float, default=30, help='seconds before a test is cancelled')
+    parser.add_argument('--suite-timeout', type=float, help='wall-clock budget for the whole run in seconds')
+    parser.add_argument('--server-pid', type=int,
+                        help='Ollama server pid to sample (default: OLLAMA_PID, the OLLAMA_HOST port, or `ollama serve`)')
+    parser.add_argument('--sample-interval', type=float, default=0.25, help='seconds between server samples')
+    args = parser.parse_args()
+    
+    dashboard = WisbeeTestDashboard(test_timeout=args.test_timeout, suite_timeout=args.suite_timeout,
+                                    server_pid=args.server_pid, sample_interval=args.sample_interval)
     dashboard.run_all_tests()
\ No newline at end of file
@@ -1,9 +1,24 @@
 #!/usr/bin/env python3
+import argparse
 import json
-import requests
+import os
 import time
 from datetime import datetime
 
+from bench_stats import summarize_counters, throughput_summary
+from benchmark_runner import AsyncBenchmarkRunner
+from model_catalog import MEASUREMENTS_FILE, get_model_index, record_performance
+from model_residency import LOAD_THRESHOLD, ModelLoadLedger, residency_order, resident_models
+from ollama_client import get_client, normalize_base_url
+from ollama_pool import POLICIES, BalancedClient, get_pool
+from quality_scoring import score_response
+from response_cache import ResponseCache
+from result_stream import ResultStream, read_results, write_grouped_json
+from results_store import numeric_metrics, record_run, results_path, run_source
+from sweep_checkpoint import SweepCheckpoint, cell_key, prompts_digest
+from token_accounting import get_token_counter
+from test_variant_models import VARIANT_MODELS
+
 # MT-Bench Japanese test cases
 MT_BENCH_JAPANESE = [
     # Writing & Reasoning
@@ -49,10 +64,126 @@ MT_BENCH_JAPANESE = [
     }
 ]
 
+# One JSON line per finished test; the grouped JSON and the report are built from it
+STREAM_FILE = "mt_bench_results.jsonl"
+
 class LLMTester:
-    def __init__(self, base_url="http://localhost:11434/v1"):
+    def __init__(self, base_url=None, max_connections=4, stream=False, backend="openai", cache=None,
+                 results_file=None, endpoints=None, balance=False, routing="least-outstanding",
+                 minimize_swaps=False):
         self.base_url = base_url
+        # Every cell runs on each endpoint; the first one is the default client
+        self.endpoints = [normalize_base_url(url) for url in (endpoints or [base_url])]
+        if balance and len(self.endpoints) > 1:
+            # One logical endpoint: cells are spread over the hosts instead of repeated on each
+            pool = get_pool(self.endpoints, policy=routing, max_connections=max_connections)
+            self.endpoints = [pool.base_url]
+            self.clients = {pool.base_url: pool}
+        else:
+            self.clients = {url: get_client(url, max_connections=max_connections) for url in self.endpoints}
+        self.client = self.clients[self.endpoints[0]]
+        if cache is not None:
+            # Streaming requests are never cached: their timings are the point
+            for client in self.clients.values():
+                client.cache = cache
+        self.stream = stream
+        # "openai" uses /v1/chat/completions, "native" uses /api/chat with server eval counters
+        self.backend = backend
+        # Per-model run metadata only; test records go straight to the result stream
         self.results = []
+        self.results_file = results_file or results_path(STREAM_FILE)
+        self.result_stream = None
+        # Completed (model, prompt, repetition) cells; see start_sweep
+        self.checkpoint = None
+        # Cells finished by this invocation; only these are new history samples
+        self.recorded = set()
+        self.repetitions = 1
+        # Run models one at a time, resident first, each loaded before its cells are timed
+        self.minimize_swaps = minimize_swaps
+        self.loads = ModelLoadLedger()
+        # Prompt/completion token counts per model family, attached to every record
+        self.tokens = get_token_counter()
+    
+    def order_models(self, models):
+        """Models in residency order: the ones already loaded on the first endpoint run first"""
+        if not self.minimize_swaps:
+            return list(models)
+        resident = [] if self.replaying() else resident_models(self.client) or []
+        ordered = residency_order(models, lambda model: [model], resident)
+        print(f"🧭 Model order: {', '.join(ordered)} (resident: {', '.join(resident) or 'none'})")
+        return ordered
+    
+    def replaying(self):
+        return self.client.cache is not None and self.client.cache.mode == 'replay'
+    
+    def prepare_model(self, model_name):
+        """Load a model on every endpoint before its cells run; returns the load time.
+        
+        The load is recorded in the ledger and the model metadata, so it
+        never shows up in the per-prompt response times.
+        """
+        if self.replaying():
+            return 0.0
+        load_time = 0.0
+        for endpoint, client in self.clients.items():
+            result = client.preload(model_name, timeout=300)
+            if not result['success']:
+                print(f"⚠️  Preloading {model_name} @ {endpoint} failed: {result['error']}")
+                continue
+            # A resident model reports a few ms of load_duration: not a load
+            if (result['load_time'] or 0) > LOAD_THRESHOLD:
+                self.loads.record(model_name, result['load_time'], endpoint)
+                load_time += result['load_time']
+        print(f"📦 {model_name} loaded ({load_time:.2f}s, excluded from response times)")
+        return load_time
+    
+    def start_sweep(self, test_cases, models, repetitions=1, resume=False):
+        """Open the checkpoint and result stream; returns the number of cells already done"""
+        self.repetitions = repetitions
+        self.checkpoint = SweepCheckpoint(f"{os.path.splitext(self.results_file)[0]}.checkpoint.jsonl")
+        done = self.checkpoint.start({
+            "suite": "mt_bench",
+            "prompts": prompts_digest(test_cases),
+            "backend": self.backend,
+            "stream": self.stream,
+            "models": models,
+            "endpoints": self.endpoints,
+            "repetitions": repetitions
+        }, resume=resume)
+        # Results of earlier attempts stay in the stream when resuming
+        self.result_stream = ResultStream(self.results_file, append=resume and done > 0)
+        if resume:
+            total = len(models) * len(test_cases) * repetitions * len(self.endpoints)
+            print(f"♻️  Resuming: {done}/{total} cells already done ({os.path.basename(self.checkpoint.path)})")
+        return done
+    
+    def pending_cells(self, model_name, test_cases):
+        """(index, repetition, endpoint, test) cells of this model still to run"""
+        return [
+            (i, repetition, endpoint, test)
+            for repetition in range(self.repetitions)
+            for i, test in enumerate(test_cases)
+            for endpoint in self.endpoints
+            if self.checkpoint is None or not self.checkpoint.is_done(model_name, i, repetition, endpoint)
+        ]
+    
+    def record_result(self, model_name, index, result, repetition=0, endpoint=None):
+        """Append one finished test to the JSONL stream (thread-safe, flushed), then checkpoint it"""
+        endpoint = endpoint or self.endpoints[0]
+        if self.result_stream is None:
+            self.result_stream = ResultStream(self.results_file)
+        self.result_stream.write({
+            "model": model_name,
+            "test_index": index,
+            "repetition": repetition,
+            "endpoint": endpoint,
+            "recorded_at": datetime.now().isoformat(),
+            **result
+        })
+        self.recorded.add(cell_key(model_name, index, repetition, endpoint))
+        # Failed cells stay pending so --resume retries them
+        if self.checkpoint is not None and result.get('response'):
+            self.checkpoint.mark_done(model_name, index, repetition, endpoint)
         
     def test_model(self, model_name, test_cases):
         print(f"\n🧪 Testing model: {model_name}")
@@ -60,125 +191,247 @@ class LLMTester:
         
         model_results = {
             "model": model_name,
-            "timestamp": datetime.now().isoformat(),
-            "tests": []
+            "timestamp": datetime.now().isoformat()
         }
         
-        for i, test in enumerate(test_cases, 1):
-            print(f"\n📝 Test {i}/{len(test_cases)} - {test['category']}")
+        cells = self.pending_cells(model_name, test_cases)
+        if not cells:
+            print("♻️  All cells already done - skipped")
+        elif self.minimize_swaps:
+            model_results["preload_time"] = self.prepare_model(model_name)
+        
+        for i, repetition, endpoint, test in cells:
+            label = f" (repetition {repetition + 1}/{self.repetitions})" if self.repetitions > 1 else ""
+            if len(self.endpoints) > 1:
+                label += f" @ {endpoint}"
+            print(f"\n📝 Test {i + 1}/{len(test_cases)}{label} - {test['category']}")
             print(f"Question: {test['question'][:50]}...")
             
-            start_time = time.time()
-            response = self.send_request(model_name, test['question'])
-            end_time = time.time()
+            result = self.run_single_test(model_name, test, endpoint)
             
-            response_time = end_time - start_time
-            
-            if response:
-                print(f"✅ Response received in {response_time:.2f}s")
-                print(f"Response preview: {response[:100]}...")
-                
-                # Analyze response quality
-                quality_score = self.analyze_response_quality(
-                    test['question'], 
-                    response, 
-                    test['type']
-                )
-                
-                model_results["tests"].append({
-                    "category": test['category'],
-                    "question": test['question'],
-                    "response": response,
-                    "response_time": response_time,
-                    "quality_score": quality_score,
-                    "type": test['type']
-                })
+            if result.get('response'):
+                print(f"✅ Response received in {result['response_time']:.2f}s")
+                if result.get('ttft') is not None:
+                    print(f"First token after {result['ttft']:.2f}s, "
+                          f"{result.get('decode_tokens_per_sec') or 0:.1f} tokens/s")
+                print(f"Response preview: {result['response'][:100]}...")
             else:
                 print("❌ Failed to get response")
-                model_results["tests"].append({
-                    "category": test['category'],
-                    "question": test['question'],
-                    "response": None,
-                    "error": "Failed to get response",
-                    "response_time": response_time
-                })
+            
+            self.record_result(model_name, i, result, repetition, endpoint)
         
         self.results.append(model_results)
         return model_results
     
-    def send_request(self, model, prompt):
-        try:
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                json={
-                    "model": model,
-                    "messages": [{"role": "user", "content": prompt}],
-                    "temperature": 0.7,
-                    "max_tokens": 500
-                },
-                timeout=30
+    def run_single_test(self, model_name, test, endpoint=None):
+        """Send one prompt (to the given endpoint, default the first) and build its result record"""
+        client = self.clients.get(endpoint, self.client)
+        start_time = time.time()
+        if self.backend == "native":
+            response, stream_stats = self.send_native_request(model_name, test['question'], client)
+        elif self.stream:
+            response, stream_stats = self.send_stream_request(model_name, test['question'], client)
+        else:
+            response, stream_stats = self.send_request(model_name, test['question'], client)
+        end_time = time.time()
+        
+        response_time = end_time - start_time
+        
+        if response:
+            # Analyze response quality
+            quality_score = self.analyze_response_quality(
+                test['question'], 
+                response, 
+                test['type']
             )
             
-            if response.status_code == 200:
-                data = response.json()
-                return data['choices'][0]['message']['content']
-            else:
-                print(f"Error: HTTP {response.status_code}")
-                return None
-                
-        except Exception as e:
-            print(f"Error: {e}")
-            return None
+            record = {
+                "category": test['category'],
+                "question": test['question'],
+                "response": response,
+                "response_time": response_time,
+                "quality_score": quality_score,
+                "type": test['type']
+            }
+            if stream_stats:
+                record.update(stream_stats)
+            # Server counts when the backend reports them, the model's tokenizer otherwise
+            record.update(self.tokens.usage(model_name, test['question'], response, stream_stats))
+            return record
+        
+        return {
+            "category": test['category'],
+            "question": test['question'],
+            "response": None,
+            "error": "Failed to get response",
+            "response_time": response_time,
+            **self.tokens.usage(model_name, test['question'])
+        }
     
-    def analyze_response_quality(self, question, response, test_type):
-        """Simple quality analysis"""
-        score = 0
-        max_score = 10
-        
-        # Basic checks
-        if response and len(response) > 10:
-            score += 2  # Response exists and has content
-        
-        # Japanese language check
-        if any(ord(char) > 0x3000 for char in response):
-            score += 2  # Contains Japanese characters
-        
-        # Type-specific checks
-        if test_type == "math_reasoning":
-            if any(char in response for char in "0123456789+-*/="):
-                score += 2  # Contains numbers/math
-        elif test_type == "code_generation":
-            if "def" in response or "function" in response:
-                score += 2  # Contains code structure
-        elif test_type == "translation":
-            if any(ord(char) < 128 for char in response):
-                score += 2  # Contains English characters
+    def send_request(self, model, prompt, client=None):
+        result = (client or self.client).chat(
+            model,
+            prompt,
+            timeout=30,
+            temperature=0.7,
+            max_tokens=500
+        )
+        
+        if result['success']:
+            return result['content'], result.get('usage')
+        
+        if result['status'] is not None:
+            print(f"Error: HTTP {result['status']}")
         else:
-            score += 2  # Default points for other types
+            print(f"Error: {result['error']}")
+        return None, None
+    
+    def send_native_request(self, model, prompt, client=None):
+        """Send via /api/chat and return (content, server eval counters)"""
+        result = (client or self.client).native_chat(
+            model,
+            prompt,
+            timeout=30,
+            options={"temperature": 0.7, "num_predict": 500}
+        )
         
-        # Length appropriateness
-        if 50 < len(response) < 1000:
-            score += 2  # Reasonable length
-        elif len(response) > 20:
-            score += 1  # At least some content
+        if result['success']:
+            return result['content'], result['counters']
         
-        # Coherence check (simple)
-        if response.count('。') > 0 or response.count('.') > 0:
-            score += 2  # Has sentence endings
+        if result['status'] is not None:
+            print(f"Error: HTTP {result['status']}")
+        else:
+            print(f"Error: {result['error']}")
+        return None, None
+    
+    def send_stream_request(self, model, prompt, client=None):
+        """Stream the completion and return (content, per-token timing metrics)"""
+        result = (client or self.client).stream_chat(
+            model,
+            prompt,
+            timeout=30,
+            temperature=0.7,
+            max_tokens=500
+        )
         
-        return min(score, max_score)
+        if result['success'] and result['content']:
+            # The server's token counts go along so the report does not fall back to estimates
+            usage = result.get('usage') or {}
+            stats = dict(result['stream'])
+            stats.update({key: usage[key] for key in ('prompt_tokens', 'completion_tokens') if usage.get(key)})
+            return result['content'], stats
+        
+        if result['status'] is not None and result['status'] != 200:
+            print(f"Error: HTTP {result['status']}")
+        else:
+            print(f"Error: {result['error'] or 'empty stream'}")
+        return None, None
+    
+    def analyze_response_quality(self, question, response, test_type):
+        """Simple quality analysis (rubric in quality_scoring.score_batch)"""
+        return score_response(response, test_type)
+    
+    @staticmethod
+    def latest_per_cell(tests):
+        """One record per (prompt, repetition, endpoint): a resumed run's retry replaces the earlier attempt"""
+        cells = {}
+        for test in tests:
+            cells[(test.get('test_index', 0), test.get('repetition', 0), test.get('endpoint') or '')] = test
+        return [cells[key] for key in sorted(cells)]
+    
+    def load_tests(self):
+        """Test records per model from the stream; responses stay on disk"""
+        # Models in run order, not completion order
+        tests_by_model = {r['model']: [] for r in self.results}
+        for record in read_results(self.results_file):
+            record['success'] = bool(record.pop('response', None))
+            tests_by_model.setdefault(record['model'], []).append(record)
+        return {model: self.latest_per_cell(tests) for model, tests in tests_by_model.items() if tests}
+    
+    def write_grouped_results(self, path, metadata):
+        """mt_bench_results.json ([{model, timestamp, tests}]) rebuilt from the stream one model at a time"""
+        stream_only = ('model', 'test_index', 'recorded_at')
+        
+        def wrap(model, tests):
+            tests = self.latest_per_cell(tests)
+            entry = dict(metadata.get(model) or {"model": model, "timestamp": tests[0].get('recorded_at')})
+            entry["tests"] = [{k: v for k, v in t.items() if k not in stream_only} for t in tests]
+            return entry
+        
+        write_grouped_json(self.results_file, path, 'model', wrap, order=list(metadata))
+    
+    def report_endpoints(self, tests_by_model):
+        """Per-endpoint latency distribution and throughput for every model (multi-endpoint runs only)"""
+        by_endpoint = {}
+        for model, tests in tests_by_model.items():
+            for test in tests:
+                by_endpoint.setdefault(model, {}).setdefault(test.get('endpoint') or self.endpoints[0], []).append(test)
+        hosts = {endpoint for endpoints in by_endpoint.values() for endpoint in endpoints}
+        if len(hosts) < 2:
+            return None
+        
+        print("\n" + "=" * 60)
+        print("🖥️  PER-ENDPOINT PERFORMANCE")
+        print("=" * 60)
+        
+        report = {'models': {}, 'fastest': {}}
+        for model, endpoints in by_endpoint.items():
+            summaries = {endpoint: throughput_summary(tests) for endpoint, tests in endpoints.items()}
+            # Fastest = lowest median latency among endpoints that answered every cell
+            complete = {e: s for e, s in summaries.items() if s['succeeded'] == s['requests']} or summaries
+            fastest = min(complete, key=lambda e: complete[e]['latency']['p50'])
+            report['models'][model] = summaries
+            report['fastest'][model] = fastest
+            
+            print(f"\n🤖 {model}")
+            for endpoint, summary in summaries.items():
+                latency = summary['latency']
+                tokens = f", {summary['tokens_per_sec']:.1f} tok/s" if summary['tokens_per_sec'] else ""
+                print(f"  {'⭐' if endpoint == fastest else '  '} {endpoint}: "
+                      f"{summary['succeeded']}/{summary['requests']} ok, "
+                      f"p50/p90/p99 {latency['p50']:.2f}/{latency['p90']:.2f}/{latency['p99']:.2f}s, "
+                      f"{summary['requests_per_sec'] or 0:.2f} req/s{tokens}")
+        
+        print("\n📈 All models per endpoint:")
+        report['endpoints'] = {}
+        for endpoint in sorted(hosts):
+            tests = [t for endpoints in by_endpoint.values() for t in endpoints.get(endpoint, [])]
+            summary = throughput_summary(tests)
+            report['endpoints'][endpoint] = summary
+            print(f"  {endpoint}: {summary['succeeded']}/{summary['requests']} ok, "
+                  f"p50 {summary['latency']['p50']:.2f}s, {summary['requests_per_sec'] or 0:.2f} req/s")
+        return report
+    
+    def report_model_loads(self, model, tests, metadata):
+        """Loads before and during the model's cells, and response time without them"""
+        # load_duration is only known with the native backend
+        in_test = [t['load_duration'] for t in tests if (t.get('load_duration') or 0) > LOAD_THRESHOLD]
+        preload_time = metadata.get('preload_time') or 0.0
+        if not in_test and not preload_time:
+            return
+        load_time = preload_time + sum(in_test)
+        loads = len(in_test) + (1 if preload_time else 0)
+        timed = [t for t in tests if t.get('response_time') is not None]
+        excl_load = sum(t['response_time'] - (t.get('load_duration') or 0) for t in timed) / max(len(timed), 1)
+        print(f"Model Loads: {loads} ({load_time:.2f}s, {len(in_test)} during tests)")
+        print(f"Avg Response Time excl. load: {excl_load:.2f}s")
     
     def generate_report(self):
+        if self.result_stream is not None:
+            self.result_stream.close()
+            self.result_stream = None
+        if self.checkpoint is not None:
+            self.checkpoint.close()
+        
         print("\n" + "=" * 60)
         print("📊 TEST RESULTS SUMMARY")
         print("=" * 60)
         
-        for model_result in self.results:
-            model = model_result['model']
-            tests = model_result['tests']
-            
+        metadata = {r['model']: dict(r) for r in self.results}
+        tests_by_model = self.load_tests()
+        for model, tests in tests_by_model.items():
             total_tests = len(tests)
-            successful_tests = sum(1 for t in tests if t.get('response'))
+            successful_tests = sum(1 for t in tests if t['success'])
             avg_response_time = sum(t.get('response_time', 0) for t in tests) / total_tests
             avg_quality = sum(t.get('quality_score', 0) for t in tests) / total_tests
             
@@ -187,6 +440,37 @@ class LLMTester:
             print(f"Avg Response Time: {avg_response_time:.2f}s")
             print(f"Avg Quality Score: {avg_quality:.1f}/10")
             
+            counted = [t for t in tests if t.get('completion_tokens') and t.get('response_time')]
+            if counted:
+                completion = sum(t['completion_tokens'] for t in counted)
+                sources = sorted({t.get('token_source', 'estimate') for t in counted})
+                print(f"Avg Tokens: {sum(t['prompt_tokens'] for t in counted) / len(counted):.0f} prompt / "
+                      f"{completion / len(counted):.0f} completion ({', '.join(sources)})")
+                print(f"End-to-end Throughput: {completion / sum(t['response_time'] for t in counted):.1f} tokens/s")
+            
+            streamed = [t for t in tests if t.get('ttft') is not None]
+            if streamed:
+                avg_ttft = sum(t['ttft'] for t in streamed) / len(streamed)
+                rates = [t['decode_tokens_per_sec'] for t in streamed if t.get('decode_tokens_per_sec')]
+                avg_rate = sum(rates) / len(rates) if rates else 0
+                itl = {}
+                for key in ('itl_p50', 'itl_p90', 'itl_p99'):
+                    values = [t[key] for t in streamed if t.get(key) is not None]
+                    itl[key] = sum(values) * 1000 / len(values) if values else 0
+                print(f"Avg Time to First Token: {avg_ttft:.2f}s")
+                print(f"Avg Decode Speed: {avg_rate:.1f} tokens/s")
+                print(f"Inter-token Latency p50/p90/p99: "
+                      f"{itl['itl_p50']:.1f}/{itl['itl_p90']:.1f}/{itl['itl_p99']:.1f}ms")
+            
+            self.report_model_loads(model, tests, metadata.get(model, {}))
+            
+            counters = summarize_counters(tests)
+            if counters:
+                metadata.setdefault(model, {"model": model})['server_counters'] = counters
+                print(f"Cold Load: {counters['cold_load_time']:.2f}s")
+                print(f"Prefill: {counters['prefill_tokens_per_sec'] or 0:.1f} tokens/s, "
+                      f"Decode: {counters['decode_tokens_per_sec'] or 0:.1f} tokens/s")
+            
             # Category breakdown
             print("\nCategory Performance:")
             categories = {}
@@ -200,30 +484,169 @@ class LLMTester:
                 avg_cat_score = sum(scores) / len(scores)
                 print(f"  {cat}: {avg_cat_score:.1f}/10")
         
+        endpoint_report = self.report_endpoints(tests_by_model)
+        
         # Save detailed results
-        with open('/Users/yuki/wisbee-iOS/mt_bench_results.json', 'w', encoding='utf-8') as f:
-            json.dump(self.results, f, ensure_ascii=False, indent=2)
+        self.write_grouped_results(results_path('mt_bench_results.json'), metadata)
+        if endpoint_report:
+            with open(results_path('mt_bench_endpoints.json'), 'w', encoding='utf-8') as f:
+                json.dump(endpoint_report, f, ensure_ascii=False, indent=2)
+        
+        print(f"\n💾 Per-test stream: {os.path.basename(self.results_file)}")
+        print(f"💾 Detailed results saved to: mt_bench_results.json")
+        if endpoint_report:
+            print(f"💾 Per-endpoint summary saved to: mt_bench_endpoints.json")
+        
+        if self.loads.loads:
+            self.loads.print_summary("\n🔁 Model loads (preloads outside response times)")
+        
+        for client in self.clients.values():
+            if isinstance(client, BalancedClient):
+                client.print_pool_report()
+        
+        if self.client.cache is not None:
+            self.client.cache.print_stats()
+        
+        return tests_by_model, bool(endpoint_report)
+    
+    def save_run(self, tests_by_model, by_endpoint=False):
+        """Append this invocation's cells to the history and their server counters to the catalog measurements.
+        
+        Kept apart from generate_report so rebuilding a report from a saved
+        stream (--report-only) never records the same run twice; a resumed
+        sweep records only the cells it ran itself.
+        """
+        print()
+        new_tests = {
+            model: [t for t in tests if cell_key(model, t.get('test_index', 0), t.get('repetition', 0),
+                                                 t.get('endpoint')) in self.recorded]
+            for model, tests in tests_by_model.items()
+        }
+        new_tests = {model: tests for model, tests in new_tests.items() if tests}
+        if not new_tests:
+            print(f"💾 No new cells in this run - nothing appended to benchmark_history.sqlite")
+            return
         
-        print(f"\n💾 Detailed results saved to: mt_bench_results.json")
+        records = []
+        for model, tests in new_tests.items():
+            for test in tests:
+                metrics = numeric_metrics(test, exclude=('started_at', 'test_index', 'repetition'))
+                metrics['success'] = test['success']
+                name = test['category']
+                if by_endpoint:
+                    name += f" @ {test.get('endpoint')}"
+                records.append((model, name, metrics))
+        source = run_source(self.client)
+        if source == 'replay':
+            print(f"💾 Replayed responses are not appended to benchmark_history.sqlite")
+        else:
+            run_id = record_run('mt_bench', records, source=source,
+                                metadata={'backend': self.backend, 'stream': self.stream,
+                                          'repetitions': self.repetitions, 'endpoints': self.endpoints})
+            print(f"💾 Run {run_id} appended to: benchmark_history.sqlite")
+        
+        performance = {model: summarize_counters(tests) for model, tests in new_tests.items()}
+        performance = {model: counters for model, counters in performance.items() if counters}
+        if performance and source != 'live':
+            print(f"📚 Server counters not recorded for a {source} run")
+        elif performance:
+            skipped = record_performance(performance)
+            print(f"📚 Server counters recorded in {MEASUREMENTS_FILE}")
+            if skipped:
+                print(f"   (not in catalog: {', '.join(skipped)})")
 
 def main():
-    tester = LLMTester()
+    parser = argparse.ArgumentParser(description="MT-Bench Japanese sweep against local Ollama models")
+    parser.add_argument("--sequential", action="store_true",
+                        help="send one prompt at a time (original behaviour)")
+    parser.add_argument("--model-concurrency", type=int, default=2,
+                        help="max in-flight requests per model")
+    parser.add_argument("--server-concurrency", type=int, default=4,
+                        help="max in-flight requests per Ollama server")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream responses and record time-to-first-token and tokens/sec")
+    parser.add_argument("--backend", choices=["openai", "native"], default="openai",
+                        help="native uses /api/chat and records Ollama's load/prefill/decode counters")
+    parser.add_argument("--cache", choices=["record", "replay", "auto"],
+                        help="cache responses on disk: record, replay (no Ollama calls) or auto")
+    parser.add_argument("--cache-dir", help="response cache directory (default: <results dir>/response_cache)")
+    parser.add_argument("--repetitions", type=int, default=1, help="run every prompt this many times per model")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip (model, prompt, repetition) cells completed by an earlier run")
+    parser.add_argument("--models", nargs="+", help="models to test (default: gemma3:1b gemma3:4b jaahas/qwen3-abliterated:0.6b)")
+    parser.add_argument("--variants", action="store_true", help="also test the variant models")
+    parser.add_argument("--endpoint", action="append", dest="endpoints", metavar="URL",
+                        help="Ollama server to benchmark, repeatable: every cell runs on each endpoint "
+                             "(default: OLLAMA_HOST or localhost:11434)")
+    parser.add_argument("--balance", action="store_true",
+                        help="spread cells over the --endpoint hosts through a load-balanced pool instead of "
+                             "running every cell on each")
+    parser.add_argument("--routing", choices=POLICIES, default="least-outstanding", help="pool routing policy")
+    parser.add_argument("--minimize-swaps", action="store_true",
+                        help="run models one at a time, resident model first, loading each before its cells")
+    parser.add_argument("--report-only", nargs="?", const="", metavar="JSONL",
+                        help=f"rebuild the report from a saved result stream (default: {STREAM_FILE}) without testing")
+    args = parser.parse_args()
+    if args.stream and args.backend == "native":
+        parser.error("--stream is only available with the openai backend")
+    
+    tester = LLMTester(
+        max_connections=args.server_concurrency,
+        stream=args.stream,
+        backend=args.backend,
+        cache=ResponseCache(args.cache, args.cache_dir) if args.cache else None,
+        results_file=args.report_only or None,
+        endpoints=args.endpoints,
+        balance=args.balance,
+        routing=args.routing,
+        minimize_swaps=args.minimize_swaps
+    )
+    
+    if args.report_only is not None:
+        tester.generate_report()
+        return
     
     # Test available models
-    models_to_test = [
+    models_to_test = args.models or [
         "gemma3:1b",
         "gemma3:4b", 
         "jaahas/qwen3-abliterated:0.6b"
     ]
+    if args.variants:
+        models_to_test += [m for m in VARIANT_MODELS if m not in models_to_test]
+    index = None if tester.replaying() else get_model_index(tester.client).refresh()
+    if index is not None and index.models:
+        missing = index.missing(models_to_test)
+        if missing:
+            print(f"⚠️  Not installed, skipped: {', '.join(missing)}")
+            models_to_test = [m for m in models_to_test if m not in missing]
+    models_to_test = tester.order_models(models_to_test)
+    
+    try:
+        tester.start_sweep(MT_BENCH_JAPANESE, models_to_test, args.repetitions, args.resume)
+    except ValueError as e:
+        parser.error(str(e))
     
-    for model in models_to_test:
-        try:
-            tester.test_model(model, MT_BENCH_JAPANESE)
-        except Exception as e:
-            print(f"Error testing {model}: {e}")
+    try:
+        if args.sequential:
+            for model in models_to_test:
+                try:
+                    tester.test_model(model, MT_BENCH_JAPANESE)
+                except Exception as e:
+                    print(f"Error testing {model}: {e}")
+        else:
+            runner = AsyncBenchmarkRunner(
+                tester,
+                model_concurrency=args.model_concurrency,
+                server_concurrency=args.server_concurrency
+            )
+            runner.run(models_to_test, MT_BENCH_JAPANESE)
+    except KeyboardInterrupt:
+        # Everything finished so far is already in the stream
+        print("\n⚠️  Interrupted - reporting the results streamed so far")
     
     # Generate final report
-    tester.generate_report()
+    tester.save_run(*tester.generate_report())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
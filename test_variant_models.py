@@ -4,6 +4,16 @@ import requests
 import time
 from datetime import datetime
 
+from model_recommender import measured_ranking
+from ollama_client import get_client, normalize_base_url
+from quality_scoring import contains_japanese
+from result_stream import ResultStream, read_results
+from results_store import numeric_metrics, record_run, results_path, run_source
+from token_accounting import get_token_counter
+
+# One JSON line per finished test; the summary is built from it
+STREAM_FILE = "variant_models_test.jsonl"
+
 # Variant models to test
 VARIANT_MODELS = [
     "variant-iter1-8262349e:latest",  # Gemma3 4.3B variant
@@ -39,9 +49,38 @@ QUICK_TESTS = [
     }
 ]
 
-def test_variant_models():
-    base_url = "http://localhost:11434/v1/chat/completions"
+def summarize_stream(path):
+    """Per-model results (the variant_models_test.json layout) from the JSONL stream"""
     results = {}
+    for record in read_results(path):
+        model = record.pop("model")
+        model_type = record.pop("model_type")
+        results.setdefault(model, {
+            "model": model,
+            "type": model_type,
+            "tests": [],
+            "avg_response_time": 0,
+            "japanese_support": True
+        })["tests"].append(record)
+    
+    for model_results in results.values():
+        # Calculate average response time
+        successful_tests = [t for t in model_results["tests"] if t.get("success")]
+        if successful_tests:
+            model_results["avg_response_time"] = sum(t["response_time"] for t in successful_tests) / len(successful_tests)
+            completion_tokens = sum(t.get("completion_tokens") or 0 for t in successful_tests)
+            model_results["tokens_per_sec"] = completion_tokens / sum(t["response_time"] for t in successful_tests)
+            
+        # Check overall Japanese support
+        japanese_tests = [t for t in successful_tests if t.get("has_japanese")]
+        model_results["japanese_support"] = len(japanese_tests) > len(successful_tests) / 2
+    return results
+
+def test_variant_models():
+    started_at = datetime.now()
+    base_url = f"{normalize_base_url()}/v1/chat/completions"
+    stream = ResultStream(results_path(STREAM_FILE))
+    tokens = get_token_counter()
     
     print("🧪 Testing Variant Models for Japanese Support")
     print("=" * 60)
@@ -51,15 +90,7 @@ def test_variant_models():
         model_type = "Gemma3" if "8262349e" in model else "Qwen3"
         print(f"   Type: {model_type} variant")
         
-        model_results = {
-            "model": model,
-            "type": model_type,
-            "tests": [],
-            "avg_response_time": 0,
-            "japanese_support": True
-        }
-        
-        total_time = 0
+        record = {"model": model, "model_type": model_type}
         
         for test in QUICK_TESTS:
             print(f"\n   📝 {test['category']}: ", end="", flush=True)
@@ -81,24 +112,26 @@ def test_variant_models():
                     data = response.json()
                     content = data['choices'][0]['message']['content']
                     response_time = time.time() - start_time
-                    total_time += response_time
                     
                     # Check for Japanese characters
-                    has_japanese = any(ord(char) > 0x3000 for char in content)
+                    has_japanese = bool(contains_japanese([content])[0])
                     
                     print(f"✅ ({response_time:.1f}s)")
                     print(f"      Response: {content[:100]}...")
                     
-                    model_results["tests"].append({
+                    stream.write({
+                        **record,
                         "category": test['category'],
                         "success": True,
                         "response_time": response_time,
                         "has_japanese": has_japanese,
-                        "preview": content[:100]
+                        "preview": content[:100],
+                        **tokens.usage(model, test['question'], content, data.get('usage'))
                     })
                 else:
                     print(f"❌ Error {response.status_code}")
-                    model_results["tests"].append({
+                    stream.write({
+                        **record,
                         "category": test['category'],
                         "success": False,
                         "error": f"HTTP {response.status_code}"
@@ -106,22 +139,15 @@ def test_variant_models():
                     
             except Exception as e:
                 print(f"❌ {str(e)}")
-                model_results["tests"].append({
+                stream.write({
+                    **record,
                     "category": test['category'],
                     "success": False,
                     "error": str(e)
                 })
-        
-        # Calculate average response time
-        successful_tests = [t for t in model_results["tests"] if t.get("success")]
-        if successful_tests:
-            model_results["avg_response_time"] = total_time / len(successful_tests)
-            
-        # Check overall Japanese support
-        japanese_tests = [t for t in successful_tests if t.get("has_japanese")]
-        model_results["japanese_support"] = len(japanese_tests) > len(successful_tests) / 2
-        
-        results[model] = model_results
+    
+    stream.close()
+    results = summarize_stream(stream.path)
     
     # Summary
     print("\n" + "=" * 60)
@@ -134,17 +160,33 @@ def test_variant_models():
         print(f"  Type: {data['type']} variant")
         print(f"  Success Rate: {success_rate:.0f}%")
         print(f"  Avg Response Time: {data['avg_response_time']:.1f}s")
+        if data.get('tokens_per_sec'):
+            print(f"  Throughput: {data['tokens_per_sec']:.1f} tokens/s")
         print(f"  Japanese Support: {'✅ Yes' if data['japanese_support'] else '❌ No'}")
     
     # Save results
-    with open('/Users/yuki/wisbee-iOS/variant_models_test.json', 'w', encoding='utf-8') as f:
+    with open(results_path('variant_models_test.json'), 'w', encoding='utf-8') as f:
         json.dump(results, f, ensure_ascii=False, indent=2)
     
-    print(f"\n💾 Results saved to: variant_models_test.json")
+    print(f"\n💾 Per-test stream: {STREAM_FILE}")
+    print(f"💾 Results saved to: variant_models_test.json")
+    
+    records = [
+        (model, test['category'], numeric_metrics(test))
+        for model, data in results.items()
+        for test in data["tests"]
+    ]
+    run_id = record_run('variant_models', records, started_at, source=run_source(get_client()))
+    print(f"💾 Run {run_id} appended to: benchmark_history.sqlite")
     
-    # Recommendation
+    # Recommendation: the measured Japanese-quality ranking when model_recommender.py has run
     print("\n🎯 RECOMMENDATION:")
-    if results.get("variant-iter1-8262349e:latest", {}).get("japanese_support"):
+    ranked = [e for e in measured_ranking("japanese_quality") if e["name"] in results]
+    if ranked:
+        for entry in ranked:
+            marker = "⭐ Pareto-optimal" if entry["frontier"] else f"dominated by {', '.join(entry['dominated_by'])}"
+            print(f"{entry['rank']}. {entry['name']} - {marker}")
+    elif results.get("variant-iter1-8262349e:latest", {}).get("japanese_support"):
         print("variant-iter1-8262349e:latest (Gemma3 4.3B) can be used as alternative to qwen3-4b-instruct")
     else:
         print("These variant models may not be suitable for Japanese tasks")
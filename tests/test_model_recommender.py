@@ -0,0 +1,37 @@
+"""Which recorded runs the recommender ranks on"""
+
+from model_recommender import measured_metrics, measured_runs
+from results_store import ResultsStore, record_run
+
+
+def record(directory, metrics, model='gemma3:1b', suite='mt_bench', source='live'):
+    return record_run(suite, [(model, 'writing', metrics)], directory=str(directory), source=source)
+
+
+def test_runs_by_kind(tmp_path):
+    native = record(tmp_path, {'response_time': [2.0], 'total_duration': [1.9], 'eval_count': [100],
+                               'eval_duration': [1.5], 'quality_score': [8]})
+    replayed = record(tmp_path, {'response_time': [0.0002], 'total_duration': [1.9], 'eval_count': [100],
+                                 'eval_duration': [1.5], 'quality_score': [8]})
+    record(tmp_path, {'response_time': [2.0], 'eval_count': [100], 'eval_duration': [1.5]}, source='mock')
+    openai = record(tmp_path, {'response_time': [4.0], 'quality_score': [6]}, suite='variant_models')
+    streamed = record(tmp_path, {'response_time': [3.0], 'decode_tokens_per_sec': [40], 'quality_score': [9]},
+                      model='gemma3:4b')
+
+    with ResultsStore(str(tmp_path)) as store:
+        run_ids, counter_run_ids, dropped = measured_runs(store)
+        metrics = measured_metrics(store, run_ids, counter_run_ids)
+
+    assert sorted(run_ids) == sorted([native, openai, streamed])
+    assert sorted(counter_run_ids) == sorted([native, streamed])
+    assert dropped == [replayed]
+    # Client-side timings from the openai run still count for latency and quality
+    assert metrics['gemma3:1b'] == {'latency_s': 3.0, 'quality_score': 7.0, 'decode_tokens_per_sec': 100 / 1.5}
+    assert metrics['gemma3:4b'] == {'latency_s': 3.0, 'quality_score': 9.0, 'decode_tokens_per_sec': 40.0}
+
+
+def test_other_hosts_are_excluded(tmp_path):
+    record(tmp_path, {'response_time': [2.0], 'quality_score': [8]})
+
+    with ResultsStore(str(tmp_path)) as store:
+        assert measured_runs(store, host='elsewhere') == ([], [], [])
@@ -0,0 +1,58 @@
+"""A balanced pool of N hosts gets N times the per-host concurrency"""
+
+import threading
+
+import pytest
+
+from benchmark_runner import AsyncBenchmarkRunner
+from mock_ollama_server import MockOllamaServer
+from test_japanese_llm import LLMTester
+
+MODEL = 'gemma3:1b'
+PER_HOST = 2
+PROMPTS = [{'category': 'writing', 'question': f'質問 {i}', 'type': 'writing'} for i in range(12)]
+
+
+@pytest.fixture
+def hosts():
+    servers = [MockOllamaServer().start() for _ in range(3)]
+    yield [server.base_url for server in servers]
+    for server in servers:
+        server.stop()
+
+
+def peak_concurrency(tmp_path, endpoints):
+    """(executor threads, most tests running at once) for a sweep whose tests wait for each other"""
+    tester = LLMTester(max_connections=PER_HOST, endpoints=endpoints, balance=True,
+                       results_file=str(tmp_path / f'{len(endpoints)}_hosts.jsonl'))
+    tester.start_sweep(PROMPTS, [MODEL])
+    runner = AsyncBenchmarkRunner(tester, model_concurrency=len(PROMPTS), server_concurrency=PER_HOST)
+    slots = runner._server_slots(tester.endpoints[0])
+    # Every test blocks until `slots` tests run together, so a smaller pool or semaphore breaks the barrier
+    barrier = threading.Barrier(slots, timeout=5)
+    lock = threading.Lock()
+    state = {'running': 0, 'peak': 0, 'workers': None}
+
+    def run_single_test(model_name, test, endpoint=None):
+        with lock:
+            state['running'] += 1
+            state['peak'] = max(state['peak'], state['running'])
+            state['workers'] = runner._executor._max_workers
+        try:
+            barrier.wait()
+            return {'category': test['category'], 'response': 'ok', 'response_time': 0.0}
+        finally:
+            with lock:
+                state['running'] -= 1
+
+    tester.run_single_test = run_single_test
+    results = runner.run([MODEL], PROMPTS)
+    tester.result_stream.close()
+    tester.checkpoint.close()
+    assert all(t['response_time'] == 0.0 for t in results[0]['tests'])
+    return slots, state['workers'], state['peak']
+
+
+def test_pool_slots_scale_with_hosts(tmp_path, hosts):
+    assert peak_concurrency(tmp_path, hosts[:1]) == (PER_HOST, PER_HOST, PER_HOST)
+    assert peak_concurrency(tmp_path, hosts) == (3 * PER_HOST, 3 * PER_HOST, 3 * PER_HOST)
@@ -0,0 +1,72 @@
+"""Batched MT-Bench scoring must agree with the original per-character rubric"""
+
+import json
+import random
+import sys
+
+import pytest
+
+import quality_scoring
+from quality_scoring import contains_japanese, reference_score, score_batch, score_response
+
+TYPES = ['math_reasoning', 'code_generation', 'translation', 'creative_writing', '']
+
+EDGE_CASES = [
+    '',
+    'a' * 10, 'a' * 11, 'a' * 20, 'a' * 21, 'a' * 50, 'a' * 51, 'a' * 999, 'a' * 1000,
+    '　' * 30,                      # ideographic space is not "Japanese"
+    '、' * 30,                      # one above is
+    'こんにちは。', 'Hello.', '1+1=2', 'def f(): pass', 'function f() {}',
+    '日本語のみの回答です', 'カタカナ', '漢字\U00020000です',   # astral plane kanji
+    '\ud800 lone surrogate',
+]
+
+
+def random_corpus(count, seed=0):
+    rng = random.Random(seed)
+    alphabet = 'abc XYZ 0123+=.。こんにちはカタカナ漢字　é！\U0001F338def function'
+    return [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 1200))) for _ in range(count)]
+
+
+def assert_matches_reference(responses, types):
+    expected = [reference_score(r, t) for r, t in zip(responses, types)]
+    assert score_batch(responses, types).tolist() == expected
+
+
+@pytest.mark.parametrize('test_type', TYPES)
+def test_edge_cases(test_type):
+    assert_matches_reference(EDGE_CASES, [test_type] * len(EDGE_CASES))
+
+
+def test_random_corpus():
+    responses = random_corpus(300)
+    types = [TYPES[i % len(TYPES)] for i in range(len(responses))]
+    assert_matches_reference(responses, types)
+
+
+def test_chunk_boundaries(monkeypatch):
+    # Small chunks force responses to straddle and exceed the chunk size
+    monkeypatch.setattr(quality_scoring, 'CHUNK_CODE_POINTS', 64)
+    responses = random_corpus(50, seed=1) + ['', '', 'x' * 200]
+    types = [TYPES[i % len(TYPES)] for i in range(len(responses))]
+    assert_matches_reference(responses, types)
+
+
+def test_single_response_helpers():
+    assert score_response('こんにちは、元気です。' * 5, 'creative_writing') == 10
+    assert score_response('', 'math_reasoning') == 0
+    assert contains_japanese(['hello', 'こんにちは', '　']).tolist() == [False, True, False]
+
+
+def test_self_check_cli(tmp_path, monkeypatch, capsys):
+    responses = random_corpus(40, seed=2)
+    results = [{
+        'model': 'gemma3:1b',
+        'tests': [{'type': TYPES[i % len(TYPES)], 'response': r} for i, r in enumerate(responses)]
+    }]
+    path = tmp_path / 'mt_bench_results.json'
+    path.write_text(json.dumps(results, ensure_ascii=False), encoding='utf-8')
+
+    monkeypatch.setattr(sys, 'argv', ['quality_scoring.py', str(path), '--repeat', '2'])
+    assert quality_scoring.main() == 0
+    assert 'identical to the reference rubric' in capsys.readouterr().out
@@ -0,0 +1,84 @@
+"""Regression detection: the t-test behind compare() and the per-source baselines"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from bench_stats import shift_test, student_t_sf
+from results_store import ResultsStore
+
+
+@pytest.mark.parametrize('t, df, tail', [
+    (0.0, 5, 0.5),
+    (2.776, 4, 0.025),     # two-sided 5% critical values from the t table
+    (2.228, 10, 0.025),
+    (1.812, 10, 0.05),
+    (-1.812, 10, 0.95),
+])
+def test_student_t_tail_matches_table(t, df, tail):
+    assert student_t_sf(t, df) == pytest.approx(tail, abs=5e-4)
+
+
+def test_welch_shift():
+    # Means 6 vs 2, unit variances: t = 4 / sqrt(2/3), Welch df = 4
+    t, p_value = shift_test([5, 6, 7], [1, 2, 3])
+    assert t == pytest.approx(4.899, abs=1e-3)
+    assert p_value == pytest.approx(student_t_sf(t, 4))
+    assert p_value < 0.01
+
+    # One-sided: a smaller current sample is not a shift
+    t, p_value = shift_test([1, 2, 3], [5, 6, 7])
+    assert t < 0 and p_value > 0.99
+
+
+def test_single_sample_uses_prediction_interval():
+    baseline = [10.0, 10.2, 9.8, 10.1, 9.9]
+    _, inside = shift_test([10.1], baseline)
+    _, outside = shift_test([12.0], baseline)
+    assert inside > 0.2
+    assert outside < 0.001
+
+
+def test_degenerate_inputs():
+    assert shift_test([], [1, 2, 3]) == (None, None)
+    assert shift_test([1, 2], [1]) == (None, None)
+    # One current sample needs three baseline samples
+    assert shift_test([1], [1, 2]) == (None, None)
+    # Zero variance: any increase is certain, anything else is not a shift
+    assert shift_test([2, 2], [1, 1]) == (float('inf'), 0.0)
+    assert shift_test([1, 1], [1, 1]) == (0.0, 1.0)
+
+
+def test_compare_flags_slowdown_against_same_source(tmp_path):
+    start = datetime(2026, 1, 1)
+    with ResultsStore(str(tmp_path)) as store:
+        def run(day, latencies, speed, source='live'):
+            run_id = store.start_run('suite', start + timedelta(days=day), {'source': source})
+            store.record(run_id, 'gemma3:1b', 'chat', {'latency': latencies, 'tokens_per_sec': speed})
+            return run_id
+
+        for day in range(3):
+            run(day, [1.0, 1.1, 0.9], [50.0, 51.0, 49.0])
+        # Much faster mock runs must not become the live baseline
+        run(3, [0.01, 0.02, 0.01], [900.0, 910.0, 905.0], source='mock')
+        current = run(4, [2.0, 2.1, 1.9], [30.0, 31.0, 29.0])
+
+        report = store.compare(current)
+
+    assert len(report['baseline_runs']) == 3
+    flagged = {f['metric']: f for f in report['regressions']}
+    assert set(flagged) == {'latency', 'tokens_per_sec'}
+    assert flagged['latency']['baseline_mean'] == pytest.approx(1.0)
+    assert flagged['tokens_per_sec']['change'] == pytest.approx(-0.4)
+
+
+def test_compare_ignores_noise(tmp_path):
+    start = datetime(2026, 1, 1)
+    with ResultsStore(str(tmp_path)) as store:
+        for day, latencies in enumerate(([1.0, 1.2, 0.8], [1.1, 0.9, 1.0], [1.05, 0.95, 1.0])):
+            run_id = store.start_run('suite', start + timedelta(days=day))
+            store.record(run_id, 'gemma3:1b', 'chat', {'latency': latencies})
+
+        report = store.compare(run_id)
+
+    assert report['findings'] and report['regressions'] == []
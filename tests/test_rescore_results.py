@@ -0,0 +1,91 @@
+"""Offline re-scoring: streamed JSON input and the write-partial-then-rename output"""
+
+import io
+import json
+
+import pytest
+
+import rescore_results
+from quality_scoring import reference_score
+from rescore_results import iter_json_records, rescore
+
+RESULTS = [
+    {'model': 'gemma3:1b', 'timestamp': 1.5, 'tests': [
+        {'type': 'math_reasoning', 'response': '1+1=2です。', 'quality_score': 8},
+        {'type': 'code_generation', 'response': 'def f(): return 12345678901234567890'},
+        {'type': 'translation', 'response': ''},
+    ]},
+    {'model': 'qwen3:0.6b', 'tests': [
+        {'type': 'creative_writing', 'response': '昔々あるところに' * 10, 'quality_score': 6},
+    ]},
+]
+
+
+def flattened():
+    return [{**test, 'model': entry['model'], 'test_index': i}
+            for entry in RESULTS for i, test in enumerate(entry['tests'])]
+
+
+@pytest.fixture
+def results_file(tmp_path):
+    path = tmp_path / 'mt_bench_results.json'
+    path.write_text(json.dumps(RESULTS, ensure_ascii=False, indent=2), encoding='utf-8')
+    return path
+
+
+def read_jsonl(path):
+    return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, 1 << 20])
+def test_json_records_stream_across_chunk_boundaries(chunk_size):
+    text = json.dumps(RESULTS, ensure_ascii=False, indent=2)
+    assert list(iter_json_records(io.StringIO(text), chunk_size)) == flattened()
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_rescore_writes_ordered_output(results_file, tmp_path, workers):
+    output = tmp_path / 'rescored.jsonl'
+    count, summaries = rescore(str(results_file), str(output), ('mt_bench', 'sentence_count'),
+                               workers=workers, batch_size=2)
+
+    records = read_jsonl(output)
+    assert count == len(records) == 4
+    assert [(r['model'], r['test_index']) for r in records] == [(r['model'], r['test_index']) for r in flattened()]
+    for record in records:
+        if record['response']:
+            assert record['rescored']['mt_bench'] == reference_score(record['response'], record['type'])
+        else:
+            assert 'rescored' not in record
+
+    assert summaries['gemma3:1b']['records'] == 2
+    assert summaries['gemma3:1b']['avg_previous_quality_score'] == 8
+    assert not (tmp_path / 'rescored.jsonl.partial').exists()
+
+
+def test_failed_rescore_keeps_previous_output(results_file, tmp_path, monkeypatch):
+    calls = []
+
+    def flaky_scorer(records):
+        calls.append(len(records))
+        if len(calls) > 1:
+            raise RuntimeError('scorer crashed')
+        return [0] * len(records)
+
+    monkeypatch.setitem(rescore_results.SCORERS, 'flaky', flaky_scorer)
+    output = tmp_path / 'rescored.jsonl'
+    output.write_text('previous run\n', encoding='utf-8')
+
+    with pytest.raises(RuntimeError):
+        rescore(str(results_file), str(output), ('flaky',), workers=1, batch_size=2)
+
+    assert output.read_text(encoding='utf-8') == 'previous run\n'
+    # The first batch was flushed before the crash and is a valid JSONL prefix
+    partial = read_jsonl(tmp_path / 'rescored.jsonl.partial')
+    assert [r['test_index'] for r in partial] == [0, 1]
+
+
+def test_unknown_scorer_fails_before_writing(results_file, tmp_path):
+    with pytest.raises(ValueError, match='Unknown scorer'):
+        rescore(str(results_file), str(tmp_path / 'out.jsonl'), ('nope',))
+    assert list(tmp_path.iterdir()) == [results_file]
@@ -0,0 +1,92 @@
+"""Response cache: record/replay round trips and what must never be stored"""
+
+import pytest
+
+from mock_ollama_server import MockOllamaConfig, MockOllamaServer
+from ollama_client import OllamaClient
+from response_cache import ResponseCache
+
+MODEL = 'gemma3:1b'
+
+
+@pytest.fixture
+def server():
+    with MockOllamaServer() as server:
+        yield server
+
+
+def cached_client(base_url, mode, directory, **kwargs):
+    client = OllamaClient(base_url)
+    client.cache = ResponseCache(mode, str(directory), **kwargs)
+    return client
+
+
+def test_record_then_replay(server, tmp_path):
+    recorder = cached_client(server.base_url, 'record', tmp_path)
+    recorded = recorder.chat(MODEL, 'こんにちは', max_tokens=16)
+    assert recorded['success'] and not recorded['cached']
+    assert recorder.cache.stats['stores'] == 1
+
+    # Replay never touches the server, even once it is gone
+    server.stop()
+    replayer = cached_client(server.base_url, 'replay', tmp_path)
+    replayed = replayer.chat(MODEL, 'こんにちは', max_tokens=16)
+    assert replayed['cached']
+    assert replayed['content'] == recorded['content']
+    assert replayed['usage'] == recorded['usage']
+
+    # Sampling parameters are part of the key
+    missed = replayer.chat(MODEL, 'こんにちは', max_tokens=32)
+    assert not missed['success'] and missed['status'] is None
+    assert 'replay mode' in missed['error']
+    assert replayer.cache.stats == {'hits': 1, 'misses': 1, 'stores': 0, 'evictions': 0}
+
+
+def test_auto_stores_on_miss_and_serves_hits(server, tmp_path):
+    client = cached_client(server.base_url, 'auto', tmp_path)
+    first = client.chat(MODEL, 'こんにちは')
+    second = client.chat(MODEL, 'こんにちは')
+
+    assert not first['cached'] and second['cached']
+    assert second['content'] == first['content']
+    assert client.cache.stats['hits'] == 1 and client.cache.stats['stores'] == 1
+
+
+def test_server_errors_are_not_cached(tmp_path):
+    with MockOllamaServer(MockOllamaConfig(error_rate=1.0)) as server:
+        client = cached_client(server.base_url, 'auto', tmp_path)
+        result = client.chat(MODEL, 'こんにちは')
+
+    assert not result['success'] and result['status'] == 500
+    assert client.cache.stats['stores'] == 0
+    assert list(client.cache._entries()) == []
+
+
+def test_only_2xx_responses_are_cached(tmp_path):
+    cache = ResponseCache('auto', str(tmp_path))
+    cache.digests[MODEL] = 'sha256:test'
+    messages = [{'role': 'user', 'content': 'こんにちは'}]
+
+    overloaded = {'success': True, 'status': 503, 'content': 'busy', 'timing': None}
+    transport = {'success': False, 'status': None, 'error': 'connection refused', 'timing': None}
+    for result in (overloaded, transport):
+        cache.fetch(None, 'chat', MODEL, messages, {}, lambda: dict(result))
+    assert cache.stats['stores'] == 0
+
+    ok = {'success': True, 'status': 200, 'content': 'はい', 'timing': None}
+    cache.fetch(None, 'chat', MODEL, messages, {}, lambda: dict(ok))
+    hit = cache.fetch(None, 'chat', MODEL, messages, {}, lambda: pytest.fail('should be a hit'))
+    assert hit['cached'] and hit['content'] == 'はい'
+
+
+def test_lru_eviction(tmp_path):
+    cache = ResponseCache('auto', str(tmp_path), max_bytes=400)
+    cache.digests[MODEL] = 'sha256:test'
+    for i in range(5):
+        messages = [{'role': 'user', 'content': f'question {i}'}]
+        cache.fetch(None, 'chat', MODEL, messages, {},
+                    lambda: {'success': True, 'status': 200, 'content': 'x' * 100, 'timing': None})
+
+    assert cache.stats['evictions'] > 0
+    assert cache.size <= 400
+    assert cache.size == sum(size for _, size, _ in cache._entries())
@@ -0,0 +1,111 @@
+"""Resuming a sweep after a crash left half a record at the end of the stream"""
+
+import json
+
+from result_stream import ResultStream, read_results, truncate_partial_line
+from results_store import ResultsStore
+from sweep_checkpoint import SweepCheckpoint
+from test_japanese_llm import LLMTester
+
+PROMPTS = [{'category': 'writing', 'prompt': 'a'}, {'category': 'math', 'prompt': 'b'}]
+
+
+def crash_mid_write(path, record):
+    """Write a record the way a killed process leaves it: cut off, no newline"""
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record)[:10])
+
+
+def test_append_drops_partial_last_line(tmp_path):
+    path = tmp_path / 'stream.jsonl'
+    with ResultStream(str(path)) as stream:
+        stream.write({'n': 1})
+        stream.write({'n': 2})
+    crash_mid_write(path, {'n': 3})
+
+    with ResultStream(str(path), append=True) as stream:
+        stream.write({'n': 3})
+
+    assert [r['n'] for r in read_results(str(path))] == [1, 2, 3]
+
+
+def test_truncate_without_newline(tmp_path):
+    path = tmp_path / 'stream.jsonl'
+    path.write_text('{"n": 1', encoding='utf-8')
+
+    assert truncate_partial_line(str(path)) == 7
+    assert path.read_text(encoding='utf-8') == ''
+
+
+def test_read_results_skips_corrupt_lines(tmp_path, capsys):
+    path = tmp_path / 'stream.jsonl'
+    path.write_text('{"n": 1}\n{"n": 2{"n": 3}\n{"n": 4}\n{"n": 5', encoding='utf-8')
+
+    assert [r['n'] for r in read_results(str(path))] == [1, 4]
+    assert 'line 2' in capsys.readouterr().out
+
+
+def test_sweep_resumes_after_truncated_line(tmp_path):
+    results_file = str(tmp_path / 'mt_bench_results.jsonl')
+    tester = LLMTester(base_url='http://127.0.0.1:9', results_file=results_file)
+    assert tester.start_sweep(PROMPTS, ['gemma3:1b']) == 0
+    tester.record_result('gemma3:1b', 0, {'success': True, 'response': 'ok'})
+    tester.result_stream.close()
+    tester.checkpoint.close()
+    crash_mid_write(results_file, {'model': 'gemma3:1b', 'test_index': 1, 'success': True})
+    crash_mid_write(tester.checkpoint.path, {'cell': ['gemma3:1b', 1, 0, tester.endpoints[0]]})
+
+    resumed = LLMTester(base_url='http://127.0.0.1:9', results_file=results_file)
+    assert resumed.start_sweep(PROMPTS, ['gemma3:1b'], resume=True) == 1
+    assert [cell[0] for cell in resumed.pending_cells('gemma3:1b', PROMPTS)] == [1]
+    resumed.record_result('gemma3:1b', 1, {'success': True, 'response': 'ok'})
+    resumed.result_stream.close()
+    resumed.checkpoint.close()
+
+    assert [r['test_index'] for r in read_results(results_file)] == [0, 1]
+    assert SweepCheckpoint(resumed.checkpoint.path)._load()[1] == resumed.checkpoint.done
+
+
+def recorded_runs(directory):
+    with ResultsStore(str(directory)) as store:
+        return [(run['run_id'], store.samples([run['run_id']])) for run in store.runs('mt_bench')]
+
+
+def finish_sweep(tester, cells):
+    for model, index in cells:
+        tester.record_result(model, index, {'category': PROMPTS[index]['category'], 'success': True,
+                                            'response': 'ok', 'response_time': 1.0})
+    tester.result_stream.close()
+    tester.checkpoint.close()
+    tester.save_run(tester.load_tests())
+
+
+def test_resumed_sweep_records_only_its_own_cells(tmp_path, monkeypatch):
+    monkeypatch.setenv('CHIRAI_RESULTS_DIR', str(tmp_path))
+    results_file = str(tmp_path / 'mt_bench_results.jsonl')
+    tester = LLMTester(base_url='http://127.0.0.1:9', results_file=results_file)
+    tester.start_sweep(PROMPTS, ['gemma3:1b'])
+    finish_sweep(tester, [('gemma3:1b', 0)])
+
+    resumed = LLMTester(base_url='http://127.0.0.1:9', results_file=results_file)
+    assert resumed.start_sweep(PROMPTS, ['gemma3:1b'], resume=True) == 1
+    finish_sweep(resumed, [('gemma3:1b', 1)])
+
+    runs = recorded_runs(tmp_path)
+    assert len(runs) == 2
+    assert [test for (_model, test, _metric) in runs[0][1]] == ['math'] * len(runs[0][1])
+
+
+def test_resuming_a_finished_sweep_records_no_run(tmp_path, monkeypatch):
+    monkeypatch.setenv('CHIRAI_RESULTS_DIR', str(tmp_path))
+    results_file = str(tmp_path / 'mt_bench_results.jsonl')
+    tester = LLMTester(base_url='http://127.0.0.1:9', results_file=results_file)
+    tester.start_sweep(PROMPTS, ['gemma3:1b'])
+    finish_sweep(tester, [('gemma3:1b', 0), ('gemma3:1b', 1)])
+
+    resumed = LLMTester(base_url='http://127.0.0.1:9', results_file=results_file)
+    assert resumed.start_sweep(PROMPTS, ['gemma3:1b'], resume=True) == 2
+    assert resumed.pending_cells('gemma3:1b', PROMPTS) == []
+    finish_sweep(resumed, [])
+
+    assert len(recorded_runs(tmp_path)) == 1
@@ -0,0 +1,26 @@
+"""The saturation search steps through exactly saturation_rates()"""
+
+from load_generator import LoadGenerator, saturation_rates
+
+LATENCY = {'p50': 0.1, 'p90': 0.1, 'p99': 0.1, 'p99_9': 0.1}
+
+
+def healthy(rate, duration, arrival='poisson'):
+    return {'target_rate': rate, 'offered_rate': rate, 'arrival': arrival, 'requests': 1, 'completed': 1,
+            'throughput': rate, 'error_rate': 0.0, 'latency': LATENCY, 'queue_delay': LATENCY}
+
+
+def test_unbroken_search_runs_every_rate(monkeypatch):
+    generator = LoadGenerator(base_url='http://127.0.0.1:9')
+    monkeypatch.setattr(generator, 'run', healthy)
+
+    result = generator.find_saturation(duration=1)
+
+    assert [step['target_rate'] for step in result['steps']] == saturation_rates()
+    assert result['sustainable_rate'] == saturation_rates()[-1]
+    assert result['saturation_rate'] is None
+
+
+def test_rates_follow_their_parameters():
+    assert saturation_rates(1.0, 8.0, 2.0) == [1.0, 2.0, 4.0, 8.0]
+    assert saturation_rates(4.0, 2.0) == []
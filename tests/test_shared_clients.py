@@ -0,0 +1,16 @@
+"""get_client shares one client per base URL and settings"""
+
+from ollama_client import get_client
+
+
+def test_defaults_share_a_client():
+    assert get_client() is get_client(max_connections=4, read_timeout=30.0)
+
+
+def test_different_settings_get_their_own_client():
+    default = get_client('http://127.0.0.1:9')
+    slow = get_client('http://127.0.0.1:9', read_timeout=600)
+
+    assert slow is not default
+    assert slow.read_timeout == 600
+    assert default.read_timeout == 30.0
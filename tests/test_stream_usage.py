@@ -0,0 +1,30 @@
+"""Streamed responses keep the server's token counts"""
+
+import pytest
+
+from mock_ollama_server import MockOllamaServer
+from ollama_client import OllamaClient
+from test_japanese_llm import LLMTester
+from token_accounting import TokenCounter
+
+
+@pytest.fixture
+def server():
+    with MockOllamaServer() as server:
+        yield server
+
+
+def test_stream_chat_reports_usage(server):
+    result = OllamaClient(server.base_url).stream_chat('gemma3:1b', 'こんにちは', max_tokens=16)
+
+    assert result['usage']['prompt_tokens'] > 0
+    assert result['stream']['completion_tokens'] == result['usage']['completion_tokens']
+
+
+def test_stream_records_use_server_counts(server, tmp_path):
+    tester = LLMTester(server.base_url, stream=True, results_file=str(tmp_path / 'stream.jsonl'))
+    response, stats = tester.send_stream_request('gemma3:1b', 'こんにちは')
+    usage = TokenCounter(directory=str(tmp_path), download=False).usage('gemma3:1b', 'こんにちは', response, stats)
+
+    assert usage['token_source'] == 'server'
+    assert usage['prompt_tokens'] == stats['prompt_tokens']
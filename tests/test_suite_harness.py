@@ -0,0 +1,83 @@
+"""Per-test timeouts, suite deadlines and cancellation of in-flight requests"""
+
+import threading
+import time
+
+import pytest
+
+from mock_ollama_server import MockOllamaConfig, MockOllamaServer
+from ollama_client import OllamaClient, is_cancelled
+from suite_harness import TIMEOUT, SuiteDeadline, execute_test, run_with_timeout
+
+
+@pytest.fixture
+def slow_server():
+    with MockOllamaServer(MockOllamaConfig(latency='fixed:5')) as server:
+        yield server
+
+
+def test_completed_and_failed_runs():
+    assert run_with_timeout(lambda: 42, timeout=1)['value'] == 42
+
+    error = RuntimeError('boom')
+
+    def fail():
+        raise error
+
+    run = run_with_timeout(fail, timeout=1)
+    assert run['outcome'] == 'error' and run['error'] is error
+
+
+def test_timeout_cancels_in_flight_request(slow_server):
+    client = OllamaClient(slow_server.base_url)
+    finished = threading.Event()
+    seen = {}
+
+    def test():
+        seen['thread'] = threading.get_ident()
+        seen['result'] = client.chat('gemma3:1b', 'こんにちは')
+        seen['cancelled'] = is_cancelled()
+        finished.set()
+
+    run = run_with_timeout(test, timeout=0.3)
+
+    assert run['outcome'] == TIMEOUT
+    assert run['cancelled'] == 1
+    # The blocked read is woken up rather than waiting out the 5s latency
+    assert finished.wait(2)
+    assert not seen['result']['success']
+    # The cancellation is released once the test thread is done
+    assert seen['cancelled'] is True
+    for _ in range(50):
+        if not is_cancelled(seen['thread']):
+            break
+        time.sleep(0.01)
+    assert not is_cancelled(seen['thread'])
+
+
+def test_execute_test_statuses():
+    passed = execute_test(lambda: {'success': True, 'message': 'ok', 'details': {'n': 1}}, timeout=1)
+    assert passed['status'] == 'passed' and passed['details'] == {'n': 1}
+
+    failed = execute_test(lambda: {'success': False, 'message': 'bad'}, timeout=1)
+    assert failed['status'] == 'failed' and failed['message'] == 'bad'
+
+    timed_out = execute_test(lambda: time.sleep(1), timeout=0.1)
+    assert timed_out['status'] == TIMEOUT and not timed_out['success']
+    assert timed_out['message'].startswith('Timed out after 0.1s')
+
+
+def test_suite_deadline_clips_and_skips():
+    deadline = SuiteDeadline(0.2)
+    assert deadline.budget(10) <= 0.2
+    assert deadline.budget(None) <= 0.2
+
+    result = execute_test(lambda: time.sleep(0.5), timeout=10, deadline=deadline)
+    assert result['status'] == TIMEOUT
+    assert result['message'] == 'Timed out after 0.2s'
+
+    skipped = execute_test(lambda: {'success': True}, timeout=10, deadline=deadline)
+    assert skipped['status'] == TIMEOUT and skipped['duration'] == 0.0
+    assert 'before start' in skipped['message']
+
+    assert SuiteDeadline().budget(5) == 5
@@ -0,0 +1,127 @@
+"""SuiteScheduler ordering: dependencies, resource groups and exclusive tests"""
+
+import threading
+import time
+
+import pytest
+
+from suite_scheduler import SuiteScheduler
+
+
+class Recorder:
+    """Test functions that log (name, start, end) and track how many run at once"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.intervals = {}
+        self.running = set()
+        self.overlaps = {}
+
+    def test(self, name, result=True, seconds=0.05):
+        def run():
+            with self.lock:
+                start = time.perf_counter()
+                self.overlaps[name] = set(self.running)
+                for other in self.running:
+                    self.overlaps[other].add(name)
+                self.running.add(name)
+            time.sleep(seconds)
+            with self.lock:
+                self.running.discard(name)
+                self.intervals[name] = (start, time.perf_counter())
+            return result
+        return run
+
+    def before(self, first, second):
+        return self.intervals[first][1] <= self.intervals[second][0]
+
+
+def test_dependencies_finish_first():
+    recorder = Recorder()
+    scheduler = SuiteScheduler(max_workers=4)
+    scheduler.add('load', recorder.test('load'))
+    scheduler.add('chat', recorder.test('chat'), depends_on=['load'])
+    scheduler.add('report', recorder.test('report'), depends_on=['chat', 'load'])
+
+    results = scheduler.run()
+
+    assert list(results) == ['load', 'chat', 'report']
+    assert recorder.before('load', 'chat') and recorder.before('chat', 'report')
+
+
+def test_failed_dependency_skips_dependents():
+    recorder = Recorder()
+    skipped = []
+    scheduler = SuiteScheduler(on_skip=lambda name, failed: skipped.append((name, failed)) or 'skipped')
+    scheduler.add('load', recorder.test('load', result=False))
+    scheduler.add('chat', recorder.test('chat'), depends_on=['load'])
+    scheduler.add('other', recorder.test('other'))
+
+    results = scheduler.run()
+
+    assert results == {'load': False, 'chat': 'skipped', 'other': True}
+    assert skipped == [('chat', ['load'])]
+    assert 'chat' not in recorder.intervals
+
+
+def test_resource_groups_limit_concurrency():
+    recorder = Recorder()
+    scheduler = SuiteScheduler(max_workers=4, resource_limits={'model:b': 2})
+    for i in range(3):
+        scheduler.add(f'a{i}', recorder.test(f'a{i}'), resources=['model:a'])
+        scheduler.add(f'b{i}', recorder.test(f'b{i}'), resources=['model:b'])
+
+    scheduler.run()
+
+    def peak(group):
+        names = [n for n in recorder.intervals if n.startswith(group)]
+        starts = [recorder.intervals[n][0] for n in names]
+        return max(sum(recorder.intervals[n][0] <= t < recorder.intervals[n][1] for n in names)
+                   for t in starts)
+
+    assert peak('a') == 1
+    assert peak('b') <= 2
+
+
+def test_exclusive_tests_run_alone_in_declaration_order():
+    recorder = Recorder()
+    scheduler = SuiteScheduler(max_workers=4, default_limit=4)
+    scheduler.add('warm1', recorder.test('warm1'))
+    scheduler.add('warm2', recorder.test('warm2'))
+    scheduler.add('latency', recorder.test('latency'), exclusive=True)
+    scheduler.add('after1', recorder.test('after1'))
+    scheduler.add('after2', recorder.test('after2'))
+
+    scheduler.run()
+
+    assert recorder.overlaps['latency'] == set()
+    assert all(recorder.before(name, 'latency') for name in ('warm1', 'warm2'))
+    assert all(recorder.before('latency', name) for name in ('after1', 'after2'))
+
+
+def test_exceptions_become_results():
+    error = RuntimeError('boom')
+
+    def fail():
+        raise error
+
+    scheduler = SuiteScheduler()
+    scheduler.add('fails', fail)
+
+    assert scheduler.run() == {'fails': error}
+
+
+def test_invalid_plans_are_rejected():
+    scheduler = SuiteScheduler()
+    scheduler.add('a', lambda: True, depends_on=['missing'])
+    with pytest.raises(ValueError, match='unknown'):
+        scheduler.run()
+
+    scheduler = SuiteScheduler()
+    scheduler.add('a', lambda: True, depends_on=['b'])
+    scheduler.add('b', lambda: True, depends_on=['a'])
+    with pytest.raises(ValueError, match='cycle'):
+        scheduler.run()
+
+    with pytest.raises(ValueError, match='Duplicate'):
+        scheduler.add('a', lambda: True)
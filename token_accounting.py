@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+🌸 ChirAI Token Accounting
+モデルファミリー別トークナイザー（ローカルキャッシュ）によるプロンプト・応答のトークン数計測
+"""
+
+import argparse
+import functools
+import os
+import sys
+import threading
+
+import requests
+
+from model_catalog import canonical_name, catalog_entries, load_catalog
+from results_store import results_dir
+
+try:
+    from tokenizers import Tokenizer
+except ImportError:  # optional: without it counts are per-family estimates
+    Tokenizer = None
+
+TOKENIZER_DIR = 'tokenizers'
+# Public Hugging Face repos whose tokenizer.json matches each Ollama model family
+TOKENIZER_REPOS = {
+    'gemma3': 'unsloth/gemma-3-1b-it',
+    'qwen3': 'Qwen/Qwen3-0.6B',
+    'qwen2.5': 'Qwen/Qwen2.5-3B-Instruct'
+}
+# Rough tokens per character (CJK, other) when a tokenizer cannot be loaded
+ESTIMATE_RATES = {
+    'gemma3': (0.8, 0.25),
+    'qwen3': (0.9, 0.25),
+    'qwen2.5': (0.9, 0.25)
+}
+DEFAULT_RATE = (1.0, 0.25)
+
+
+def family_of(model):
+    """Model family from the catalog (covers variant models), else from the name"""
+    try:
+        families = {canonical_name(e['name']): e.get('family') for e in catalog_entries(load_catalog())}
+    except (OSError, ValueError):
+        families = {}
+    family = families.get(canonical_name(model))
+    if family:
+        return family
+    base = model.rsplit('/', 1)[-1].split(':', 1)[0]
+    return next((f for f in sorted(TOKENIZER_REPOS, key=len, reverse=True) if base.startswith(f)), base)
+
+
+def prompt_text(prompt):
+    """A prompt string, or the concatenated contents of a message list"""
+    if isinstance(prompt, str):
+        return prompt
+    return '\n'.join(str(m.get('content', '')) for m in prompt or [])
+
+
+def estimate_tokens(text, family=None):
+    cjk_rate, other_rate = ESTIMATE_RATES.get(family, DEFAULT_RATE)
+    cjk = sum(1 for c in text if ord(c) >= 0x3000)
+    return round(cjk * cjk_rate + (len(text) - cjk) * other_rate)
+
+
+class TokenCounter:
+    """Count tokens with each family's own tokenizer, cached under <results dir>/tokenizers.
+
+    tokenizer.json is downloaded once per family and reused offline after
+    that. Without the optional `tokenizers` package, or when a download
+    fails, counts fall back to per-family estimates and say so in their
+    source.
+    """
+
+    def __init__(self, directory=None, download=True):
+        self.directory = directory or os.path.join(results_dir(), TOKENIZER_DIR)
+        self.download = download
+        self._tokenizers = {}
+        self._families = {}
+        self._lock = threading.Lock()
+        self._count = functools.lru_cache(maxsize=4096)(self._count_uncached)
+
+    def tokenizer_path(self, family):
+        return os.path.join(self.directory, family, 'tokenizer.json')
+
+    def fetch(self, family):
+        """Download a family's tokenizer.json into the cache; returns the path or None"""
+        repo = TOKENIZER_REPOS.get(family)
+        path = self.tokenizer_path(family)
+        if os.path.exists(path) or repo is None:
+            return path if os.path.exists(path) else None
+        try:
+            response = requests.get(f'https://huggingface.co/{repo}/resolve/main/tokenizer.json', timeout=60)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            print(f"⚠️  Tokenizer for {family} unavailable ({e}); using estimates")
+            return None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(response.content)
+        os.replace(tmp, path)
+        return path
+
+    def tokenizer(self, family):
+        """The family's tokenizer, or None (estimates) - resolved once per family"""
+        with self._lock:
+            if family not in self._tokenizers:
+                tokenizer = None
+                if Tokenizer is not None:
+                    path = self.fetch(family) if self.download else self.tokenizer_path(family)
+                    if path and os.path.exists(path):
+                        tokenizer = Tokenizer.from_file(path)
+                self._tokenizers[family] = tokenizer
+            return self._tokenizers[family]
+
+    def family(self, model):
+        if model not in self._families:
+            self._families[model] = family_of(model)
+        return self._families[model]
+
+    def _count_uncached(self, family, text):
+        tokenizer = self.tokenizer(family)
+        if tokenizer is None:
+            return estimate_tokens(text, family), 'estimate'
+        return len(tokenizer.encode(text, add_special_tokens=False).ids), 'tokenizer'
+
+    def count(self, text, model):
+        """(tokens, source) for a prompt string or message list; source is 'tokenizer' or 'estimate'"""
+        return self._count(self.family(model), prompt_text(text))
+
+    def usage(self, model, prompt, completion=None, server=None):
+        """Prompt and completion token counts for a result record.
+
+        server may hold Ollama's native counters (prompt_eval_count,
+        eval_count) or OpenAI-style usage (prompt_tokens, completion_tokens);
+        those are exact and include the chat template, so they win. Our own
+        count of the prompt text is kept as prompt_text_tokens either way.
+        """
+        server = server or {}
+        text_tokens, source = self.count(prompt, model)
+        prompt_tokens = server.get('prompt_eval_count') or server.get('prompt_tokens')
+        completion_tokens = server.get('eval_count') or server.get('completion_tokens')
+        usage = {
+            'prompt_text_tokens': text_tokens,
+            'prompt_tokens': prompt_tokens or text_tokens,
+            'token_source': 'server' if prompt_tokens else source
+        }
+        if completion is not None:
+            usage['completion_tokens'] = completion_tokens or self.count(completion, model)[0]
+        return usage
+
+    def fit(self, unit, target_tokens, model):
+        """Repeat unit until the text reaches target_tokens for this model; returns (text, tokens)"""
+        unit_tokens = max(1, self.count(unit, model)[0])
+        text = unit * max(1, -(-target_tokens // unit_tokens))
+        return text, self.count(text, model)[0]
+
+
+_shared_counter = None
+_shared_lock = threading.Lock()
+
+
+def get_token_counter():
+    """Process-wide counter so tokenizers are loaded once"""
+    global _shared_counter
+    with _shared_lock:
+        if _shared_counter is None:
+            _shared_counter = TokenCounter()
+        return _shared_counter
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count tokens per model family")
+    parser.add_argument('text', nargs='?', help='text to count (default: read stdin)')
+    parser.add_argument('--model', action='append', dest='models',
+                        help='model to count for, repeatable (default: gemma3:1b and qwen3)')
+    parser.add_argument('--fetch', action='store_true', help='download every known tokenizer into the cache')
+    args = parser.parse_args()
+
+    counter = get_token_counter()
+    if args.fetch:
+        if Tokenizer is None:
+            print("⚠️  The 'tokenizers' package is not installed; cached files will be used once it is")
+        for family in TOKENIZER_REPOS:
+            path = counter.fetch(family)
+            print(f"{'✅' if path else '❌'} {family}: {path or 'not cached'}")
+        if args.text is None:
+            return 0
+
+    text = args.text if args.text is not None else sys.stdin.read()
+    for model in args.models or ['gemma3:1b', 'jaahas/qwen3-abliterated:0.6b']:
+        tokens, source = counter.count(text, model)
+        print(f"{model} ({family_of(model)}): {tokens} tokens [{source}], "
+              f"{len(text) / tokens if tokens else 0:.2f} chars/token")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())